@@ -1,11 +1,19 @@
 # --*-- conding:utf-8 --*--
 # @Time : 2025/11/05 13:54
 # @Author : Xumh
-from flask_app.sync_bugs_app import app
+# 开发环境入口（Flask 内置服务器），生产环境使用 gunicorn：gunicorn -c gunicorn.conf.py wsgi:app
+import os
+
+from flask_app.sync_bugs_app import app, start_background_services
 
 if __name__ == "__main__":
+    debug = os.environ.get("FLASK_DEBUG", "1") == "1"
+    # debug 模式下只在实际处理请求的子进程中启动定时调度，重载监控进程不启动
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
     app.run(
         host="0.0.0.0",
-        port=5432,
-        debug=True
+        port=int(os.environ.get("PORT", 5432)),
+        debug=debug,
+        threaded=True
     )
@@ -0,0 +1,3 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/19 14:20
+# @Author : Xumh
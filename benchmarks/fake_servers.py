@@ -0,0 +1,1004 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/20 09:30
+# @Author : Xumh
+"""
+本地替身服务：在进程内模拟 PingCode、飞书项目和云效（OpenAPI + 网页接口）的接口，无需真实账号即可离线压测
+- 三个服务共享一份内存数据（FakeDataStore），飞书 bug 通过 PingCode编号 关联 PingCode 缺陷
+- 可配置延迟（latency + 随机 jitter）、错误率（返回 error_status）和限流（每秒请求数，超出返回 429）
+- 按路由模板统计请求数、状态码、处理耗时和响应字节数
+用法：
+    python -m benchmarks.fake_servers --latency 0.05 --error-rate 0.01 --rate-limit 50
+
+    with FakeServices(latency=0.02) as services:
+        services.patch_conf()  # 在导入 utils 下的客户端之前调用
+        from utils.feishu_project_utils import FeiShuProjectUtils
+        ...
+        print(services.stats())
+"""
+import argparse
+import importlib
+import itertools
+import json
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.load_test import percentile
+
+FAKE_PLUGIN_TOKEN = "fake-plugin-token"
+FAKE_IMAGE_TOKEN = "fake-image-token"
+FAKE_PROJECT_KEY = "fake_project"
+FAKE_PING_CODE_PROJECT_ID = "fake-pc-project"
+FAKE_PING_CODE_VIEW_ID = "fake-pc-view"
+FAKE_YUNXIAO_ORGANIZATION_ID = "fake-org"
+FAKE_YUNXIAO_PROJECT_ID = "fake-yx-project"
+FAKE_YUNXIAO_BUG_TYPE_ID = "fake-bug-type"
+
+# 飞书项目 bug 上与 PingCode 同步的字段（field_key -> field_alias）
+FEISHU_FIELD_ALIASES = {
+    "field_e2c852": "pingcode_id",
+    "field_9d59f3": "pingcode_status",
+    "field_7f6e66": "pingcode_comments",
+    "field_f18a13": "pingcode_url",
+}
+FEISHU_ENV_FIELD_KEY = "field_env_type"
+# 飞书接口单页最大数量
+FEISHU_MAX_PAGE_SIZE = 200
+
+# PingCode 缺陷状态 (state_id, 名称) 及对应的飞书工作流状态
+PING_CODE_STATES = [("st_new", "新提交"), ("st_doing", "处理中"), ("st_fixed", "已修复"), ("st_closed", "已关闭")]
+FEISHU_STATES = {"新提交": "新增", "处理中": "处理中", "已修复": "已解决", "已关闭": "已关闭"}
+PRIORITIES = ["最高", "较高", "普通", "较低"]
+SEVERITIES = ["致命", "严重", "一般", "轻微"]
+TEST_ENVS = ["Windows", "macOS", "Linux", "Android", "iOS"]
+
+# 1x1 PNG，图片/附件下载默认返回的内容
+PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d49444154789c6360f8cfc0f01f0005000201a5f1d0d20000000049454e44ae426082"
+)
+
+
+def options(texts, prefix, label_key="label", value_key="value"):
+    """生成下拉选项 [{label_key: 文本, value_key: 前缀+序号}]"""
+    return [{label_key: text, value_key: f"{prefix}{index}"} for index, text in enumerate(texts)]
+
+
+class FakeResponse:
+    def __init__(self, status=200, body=None, content_type=None, headers=None):
+        """
+        :param body: dict/list 按 JSON 返回，bytes 原样返回，None 为空响应
+        """
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+    def encode(self):
+        if self.body is None:
+            return b"", self.content_type or "text/plain"
+        if isinstance(self.body, bytes):
+            return self.body, self.content_type or "application/octet-stream"
+        return json.dumps(self.body, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+
+
+class FakeRequest:
+    def __init__(self, method, path, query, headers, body, params):
+        self.method = method
+        self.path = path
+        self.query = {key: values[0] for key, values in query.items()}
+        self.headers = headers
+        self.body = body
+        self.params = params  # 路由中的路径参数
+
+    @property
+    def json(self):
+        if not self.body or "json" not in (self.headers.get("Content-Type") or ""):
+            return {}
+        try:
+            return json.loads(self.body.decode("utf-8"))
+        except ValueError:
+            return {}
+
+
+class FakeDataStore:
+    """三个替身服务共享的内存数据，由压测数据生成器或测试代码填充"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._ids = itertools.count(10001)
+        # PingCode
+        self.pingcode_bugs = {}  # _id -> 缺陷
+        self.pingcode_comments = {}  # 缺陷 _id -> [评论]
+        self.pingcode_sprints = []  # [{"_id", "name"}]
+        self.pingcode_attachments = {}  # token -> bytes
+        self.images = {}  # 图片名称 -> bytes
+        self.pingcode_references = {
+            "members": [
+                {"uid": f"u{index}", "name": f"user{index}", "display_name": f"用户{index}"} for index in range(1, 11)
+            ],
+            "properties": [
+                {"key": "priority", "options": options(PRIORITIES, "pr", "text", "_id")},
+                {"key": "severity", "options": options(SEVERITIES, "sv", "text", "_id")},
+                {"key": "kehuduanxitongpingtai", "options": options(TEST_ENVS, "env", "text", "_id")},
+            ],
+        }
+        # 飞书项目
+        self.feishu_work_items = {}  # id -> {"id", "name", "work_item_type_key", "fields": {field_key: value}}
+        self.feishu_comments = {}  # 工作项 id -> [评论]
+        self.feishu_uploads = []  # 上传文件的大小（字节）
+        # 云效
+        self.yunxiao_members = [{"userId": f"yx-u{index}", "userName": f"用户{index}"} for index in range(1, 11)]
+        self.yunxiao_work_items = {}  # id -> 工作项
+        self.yunxiao_comments = {}  # identifier -> [评论]
+
+    def next_id(self):
+        return next(self._ids)
+
+    def add_pingcode_sprint(self, name):
+        with self.lock:
+            sprint = {"_id": f"pcs{self.next_id()}", "name": name}
+            self.pingcode_sprints.append(sprint)
+            return sprint["_id"]
+
+    def add_pingcode_bug(self, identifier, title, sprint_id=None, state_id="st_new", description="", **fields):
+        """
+        添加 PingCode 缺陷
+        :param identifier: 编号数字部分，如 123（对应 SYYXX-123）
+        :param fields: 其他缺陷字段，如 priority、properties、assignee、created_at
+        :return: 缺陷
+        """
+        with self.lock:
+            _id = f"pcb{self.next_id()}"
+            bug = {
+                "_id": _id,
+                "identifier": identifier,
+                "short_id": f"s{_id}",
+                "title": title,
+                "state_id": state_id,
+                "sprint_id": sprint_id,
+                "description": description,
+                "created_by": "u1",
+                "updated_by": "u1",
+                "created_at": int(time.time()) - 86400,
+                "updated_at": int(time.time()),
+                "properties": {},
+                "attachments": [],
+            }
+            bug.update(fields)
+            self.pingcode_bugs[_id] = bug
+            self.pingcode_comments.setdefault(_id, [])
+            return bug
+
+    def add_pingcode_comment(self, bug_id, text, created_by="u1", attachments=None):
+        with self.lock:
+            comment = {
+                "_id": f"pcc{self.next_id()}",
+                "created_by": created_by,
+                "created_at": int(time.time()),
+                "content": [{"type": "paragraph", "children": [{"text": text}]}],
+                "attachments": attachments or [],
+                "is_deleted": False,
+            }
+            self.pingcode_comments.setdefault(bug_id, []).append(comment)
+            return comment
+
+    def add_pingcode_attachment(self, title, content=PNG_BYTES):
+        """添加附件，返回缺陷/评论中引用的附件信息"""
+        with self.lock:
+            token = f"att{self.next_id()}"
+            self.pingcode_attachments[token] = content
+            ext = title.rsplit(".", 1)[-1] if "." in title else ""
+            return {"token": token, "title": title, "addition": {"ext": ext, "size": len(content)}}
+
+    def add_image(self, name, content=PNG_BYTES):
+        with self.lock:
+            self.images[name] = content
+
+    def add_feishu_work_item(self, name, work_item_type_key="issue", **fields):
+        """
+        添加飞书工作项
+        :param fields: field_key -> 字段值
+        :return: 工作项 id
+        """
+        with self.lock:
+            work_item_id = self.next_id()
+            self.feishu_work_items[work_item_id] = {
+                "id": work_item_id,
+                "name": name,
+                "work_item_type_key": work_item_type_key,
+                "fields": dict(fields),
+            }
+            return work_item_id
+
+    def find_pingcode_bug(self, key):
+        """按 _id 或 short_id 查找缺陷"""
+        bug = self.pingcode_bugs.get(key)
+        if bug is None:
+            bug = next((b for b in self.pingcode_bugs.values() if b["short_id"] == key), None)
+        return bug
+
+
+class FakeServer:
+    """
+    替身服务基类：ThreadingHTTPServer 监听 127.0.0.1 的随机端口，在后台线程中处理请求
+    子类在 routes() 中返回 [(method, 路由模板, 处理函数)]，路由模板中的 {name} 为路径参数
+    """
+
+    name = "fake"
+
+    def __init__(
+        self, store=None, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, rate_limit=None, seed=None
+    ):
+        """
+        :param store: 共享的 FakeDataStore
+        :param latency: 每个请求的固定延迟（秒）
+        :param jitter: 额外的随机延迟上限（秒）
+        :param error_rate: 随机返回错误的比例（0-1）
+        :param error_status: 注入错误时返回的状态码，5xx 会触发客户端重试
+        :param rate_limit: 每秒最多处理的请求数，超出返回 429，None 表示不限流
+        :param seed: 随机数种子，固定后错误注入和延迟可复现
+        """
+        self.store = store or FakeDataStore()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._bucket_tokens = float(rate_limit or 0)
+        self._bucket_time = time.monotonic()
+        self._bucket_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self._routes = [
+            (method, template, re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", template) + "$"), func)
+            for method, template, func in self.routes()
+        ]
+        self._httpd = None
+        self._thread = None
+
+    def routes(self):
+        return []
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def configure(self, **behavior):
+        """运行中修改延迟、错误率、限流等配置"""
+        for key, value in behavior.items():
+            if not hasattr(self, key):
+                raise AttributeError(f"未知配置: {key}")
+            setattr(self, key, value)
+        if "rate_limit" in behavior:
+            with self._bucket_lock:
+                self._bucket_tokens = float(self.rate_limit or 0)
+                self._bucket_time = time.monotonic()
+
+    def start(self):
+        if self._httpd is not None:
+            return self
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 保持连接，与真实服务一样复用客户端连接池
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                server.dispatch(self)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name=f"{self.name}-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _take_token(self):
+        """令牌桶限流：容量与每秒请求数相同"""
+        if not self.rate_limit:
+            return True
+        with self._bucket_lock:
+            now = time.monotonic()
+            self._bucket_tokens = min(
+                float(self.rate_limit), self._bucket_tokens + (now - self._bucket_time) * self.rate_limit
+            )
+            self._bucket_time = now
+            if self._bucket_tokens < 1:
+                return False
+            self._bucket_tokens -= 1
+            return True
+
+    def _match(self, method, path):
+        path_matched = False
+        for route_method, template, pattern, func in self._routes:
+            match = pattern.match(path)
+            if match:
+                path_matched = True
+                if route_method == method:
+                    return template, func, match.groupdict()
+        return None, None, 405 if path_matched else 404
+
+    def dispatch(self, handler):
+        start = time.perf_counter()
+        split = urlsplit(handler.path)
+        body = handler.rfile.read(int(handler.headers.get("Content-Length") or 0))
+        template, func, params = self._match(handler.command, split.path)
+
+        with self._random_lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            inject_error = self.error_rate and self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+
+        if func is None:
+            response = FakeResponse(params, {"message": f"{handler.command} {split.path} 未实现"})
+            template = "unmatched"
+        elif not self._take_token():
+            response = FakeResponse(429, {"code": 429, "message": "Too Many Requests"}, headers={"Retry-After": "1"})
+        elif inject_error:
+            response = FakeResponse(self.error_status, {"code": self.error_status, "message": "injected error"})
+        else:
+            request = FakeRequest(
+                handler.command, split.path, parse_qs(split.query), handler.headers, body, params
+            )
+            try:
+                response = func(request)
+            except Exception as e:
+                response = FakeResponse(500, {"code": 500, "message": f"{e.__class__.__name__}: {e}"})
+            if not isinstance(response, FakeResponse):
+                response = FakeResponse(200, response)
+
+        payload, content_type = response.encode()
+        try:
+            handler.send_response(response.status)
+            handler.send_header("Content-Type", content_type)
+            handler.send_header("Content-Length", str(len(payload)))
+            for key, value in response.headers.items():
+                handler.send_header(key, value)
+            handler.end_headers()
+            if handler.command != "HEAD":
+                handler.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self._record(f"{handler.command} {template}", response.status, time.perf_counter() - start, len(body), payload)
+
+    def _record(self, route, status, elapsed, request_bytes, payload):
+        with self._stats_lock:
+            stats = self._stats.setdefault(
+                route, {"count": 0, "status": Counter(), "latencies": [], "request_bytes": 0, "response_bytes": 0}
+            )
+            stats["count"] += 1
+            stats["status"][status] += 1
+            stats["latencies"].append(elapsed)
+            stats["request_bytes"] += request_bytes
+            stats["response_bytes"] += len(payload)
+
+    def stats(self):
+        """按路由模板汇总：请求数、状态码分布、p50/p95 耗时（毫秒）、请求/响应字节数"""
+        with self._stats_lock:
+            return {
+                route: {
+                    "count": stats["count"],
+                    "status": {str(code): count for code, count in sorted(stats["status"].items())},
+                    "p50_ms": round(percentile(stats["latencies"], 50) * 1000, 2),
+                    "p95_ms": round(percentile(stats["latencies"], 95) * 1000, 2),
+                    "request_bytes": stats["request_bytes"],
+                    "response_bytes": stats["response_bytes"],
+                }
+                for route, stats in sorted(self._stats.items())
+            }
+
+    def request_count(self):
+        with self._stats_lock:
+            return sum(stats["count"] for stats in self._stats.values())
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {}
+
+
+def paginate(items, page_index, page_size):
+    """page_index 从 0 开始"""
+    start = page_index * page_size
+    return items[start : start + page_size]
+
+
+class FakePingCodeServer(FakeServer):
+    """PingCode 替身：缺陷视图查询、缺陷详情、评论、迭代、修改迭代、图片 token、附件/图片下载"""
+
+    name = "pingcode"
+
+    def routes(self):
+        return [
+            ("POST", "/api/agile/projects/{project_id}/defect/views/{view_id}/content", self.view_content),
+            ("GET", "/api/agile/work-items/{work_item_id}/comments", self.get_comments),
+            ("GET", "/api/agile/work-items/{work_item_id}", self.get_work_item),
+            ("PUT", "/api/agile/work-items/{work_item_id}/iteration", self.put_iteration),
+            ("GET", "/api/agile/projects/{project_id}/sprint/sprints-by-status", self.get_sprints),
+            ("GET", "/api/typhon/secret/file/public-image-token", self.public_image_token),
+            ("GET", "/file/download-url", self.download),
+            ("GET", "/images/{name}", self.get_image),
+        ]
+
+    @staticmethod
+    def _match_condition(bug, condition):
+        key, operation, value = condition.get("property_key"), condition.get("operation"), condition.get("value")
+        if key == "identifier":
+            return str(bug["identifier"]) == str(value)
+        if key == "title":
+            return str(value) in bug["title"] if operation == 7 else bug["title"] == value
+        if key == "iteration":
+            return bug.get("sprint_id") in (value if isinstance(value, list) else [value])
+        return True
+
+    def view_content(self, request):
+        data = request.json
+        conditions = (data.get("criteria") or {}).get("conditions") or []
+        page_index, page_size = int(data.get("pi", 0)), int(data.get("ps", 50))
+        with self.store.lock:
+            bugs = [
+                bug
+                for bug in self.store.pingcode_bugs.values()
+                if all(self._match_condition(bug, condition) for condition in conditions)
+            ]
+            page = [dict(bug) for bug in paginate(bugs, page_index, page_size)]
+        return {
+            "code": 200,
+            "data": {
+                "value": page,
+                "references": self.store.pingcode_references,
+                "count": len(bugs),
+                "page_index": page_index,
+                "page_size": page_size,
+                "page_count": (len(bugs) + page_size - 1) // page_size if page_size else 0,
+            },
+        }
+
+    def get_comments(self, request):
+        with self.store.lock:
+            if request.params["work_item_id"] not in self.store.pingcode_bugs:
+                return FakeResponse(404, {"code": 404, "message": "work item not found"})
+            comments = list(self.store.pingcode_comments.get(request.params["work_item_id"], []))
+        references = {"users": self.store.pingcode_references["members"]}
+        return {"code": 200, "data": {"value": comments, "references": references}}
+
+    def get_work_item(self, request):
+        with self.store.lock:
+            bug = self.store.find_pingcode_bug(request.params["work_item_id"])
+            if bug is None:
+                return FakeResponse(404, {"code": 404, "message": "work item not found"})
+            comments = [dict(comment) for comment in self.store.pingcode_comments.get(bug["_id"], [])]
+            value = dict(bug, comments=comments)
+        references = dict(self.store.pingcode_references, attachments=bug.get("attachments", []))
+        return {"code": 200, "data": {"value": value, "references": references}}
+
+    def put_iteration(self, request):
+        sprint_id = request.json.get("sprint_id")
+        with self.store.lock:
+            bug = self.store.pingcode_bugs.get(request.params["work_item_id"])
+            if bug is None:
+                return FakeResponse(404, {"code": 404, "message": "work item not found"})
+            bug["sprint_id"] = sprint_id
+            bug["updated_at"] = int(time.time())
+        return {"code": 200, "data": {"value": {"_id": bug["_id"], "sprint_id": sprint_id}}}
+
+    def get_sprints(self, request):
+        search = request.query.get("search")
+        with self.store.lock:
+            sprints = [dict(s) for s in self.store.pingcode_sprints if not search or search in s["name"]]
+        return {"code": 200, "data": {"value": sprints}}
+
+    def public_image_token(self, request):
+        return {"code": 200, "data": {"value": FAKE_IMAGE_TOKEN}}
+
+    def download(self, request):
+        content = self.store.pingcode_attachments.get(request.query.get("token"))
+        if content is None:
+            return FakeResponse(404, {"code": 404, "message": "attachment not found"})
+        return FakeResponse(200, content, content_type="image/png")
+
+    def get_image(self, request):
+        if request.query.get("token") != FAKE_IMAGE_TOKEN:
+            return FakeResponse(403, {"code": 403, "message": "invalid image token"})
+        content = self.store.images.get(request.params["name"], PNG_BYTES)
+        return FakeResponse(200, content, content_type="image/png")
+
+
+class FakeFeishuServer(FakeServer):
+    """
+    飞书项目替身：plugin_token、工作项过滤/复杂条件搜索（分页）、创建/更新、创建元数据、工作流、评论、文件上传
+    除获取 plugin_token 外，请求需带 X-PLUGIN-TOKEN
+    """
+
+    name = "feishu"
+
+    def routes(self):
+        prefix = "/open_api/{project_key}"
+        return [
+            ("POST", "/open_api/authen/plugin_token", self.plugin_token),
+            ("GET", prefix + "/work_item/all-types", self.all_types),
+            ("POST", prefix + "/field/all", self.all_fields),
+            ("POST", prefix + "/file/upload", self.upload_file),
+            ("POST", prefix + "/work_item/create", self.create_work_item),
+            ("POST", prefix + "/work_item/filter", self.filter_work_items),
+            ("GET", prefix + "/work_item/{work_item_type_key}/meta", self.create_meta),
+            ("POST", prefix + "/work_item/{work_item_type_key}/search/params", self.search_params),
+            ("POST", prefix + "/work_item/{work_item_type_key}/query", self.query_work_items),
+            ("POST", prefix + "/work_item/{work_item_type_key}/{work_item_id}", self.update_work_item),
+            ("PUT", prefix + "/work_item/{work_item_type_key}/{work_item_id}", self.update_work_item),
+            ("POST", prefix + "/work_item/{work_item_type_key}/{work_item_id}/file/upload", self.add_attachment),
+            ("POST", prefix + "/work_item/{work_item_type_key}/{work_item_id}/workflow/query", self.workflow),
+            ("POST", prefix + "/workflow/{work_item_type_key}/{work_item_id}/node/state_change", self.state_change),
+            ("POST", prefix + "/work_item/{work_item_type_key}/{work_item_id}/comment/create", self.create_comment),
+            ("GET", prefix + "/work_item/{work_item_type_key}/{work_item_id}/comments", self.get_comments),
+        ]
+
+    def dispatch(self, handler):
+        is_token_request = urlsplit(handler.path).path == "/open_api/authen/plugin_token"
+        if not is_token_request and handler.headers.get("X-PLUGIN-TOKEN") != FAKE_PLUGIN_TOKEN:
+            handler.rfile.read(int(handler.headers.get("Content-Length") or 0))
+            payload = json.dumps({"err_code": 10022, "err_msg": "plugin token invalid"}).encode("utf-8")
+            handler.send_response(401)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(payload)))
+            handler.end_headers()
+            handler.wfile.write(payload)
+            self._record(f"{handler.command} unauthorized", 401, 0.0, 0, payload)
+            return
+        super().dispatch(handler)
+
+    @staticmethod
+    def _ok(data=None, **extra):
+        return dict({"err_code": 0, "err_msg": "", "data": data}, **extra)
+
+    def _get_item(self, request):
+        try:
+            return self.store.feishu_work_items.get(int(request.params["work_item_id"]))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _field_value(value):
+        # 富文本（多行文本）字段读取时返回文本
+        return json.dumps(value, ensure_ascii=False) if isinstance(value, list) else value
+
+    def _format_item(self, item, field_keys=None):
+        fields = [
+            {"field_key": key, "field_alias": FEISHU_FIELD_ALIASES.get(key, key), "field_value": value}
+            for key, value in item["fields"].items()
+            if field_keys is None or key in field_keys
+        ]
+        return {
+            "id": item["id"],
+            "name": item["name"],
+            "work_item_type_key": item["work_item_type_key"],
+            "fields": fields,
+        }
+
+    @staticmethod
+    def _page(data):
+        page_num = max(int(data.get("page_num") or 1), 1)
+        page_size = min(int(data.get("page_size") or 50), FEISHU_MAX_PAGE_SIZE)
+        return page_num, page_size
+
+    def plugin_token(self, request):
+        return {"data": {"token": FAKE_PLUGIN_TOKEN, "expire_time": 7200}, "error": {"code": 0, "msg": "success"}}
+
+    def all_types(self, request):
+        return self._ok([{"type_key": "issue", "name": "缺陷"}, {"type_key": "sprint", "name": "迭代"}])
+
+    def all_fields(self, request):
+        fields = [
+            {"field_key": key, "field_alias": alias, "field_name": alias} for key, alias in FEISHU_FIELD_ALIASES.items()
+        ]
+        return self._ok(fields)
+
+    def upload_file(self, request):
+        with self.store.lock:
+            self.store.feishu_uploads.append(len(request.body))
+            file_id = self.store.next_id()
+        host = request.headers.get("Host")
+        return self._ok([f"http://{host}/files/{file_id}.png"])
+
+    def add_attachment(self, request):
+        with self.store.lock:
+            if self._get_item(request) is None:
+                return self._ok(err_code=30005, err_msg="work item not found")
+            self.store.feishu_uploads.append(len(request.body))
+        return self._ok({})
+
+    def create_meta(self, request):
+        return self._ok(
+            [
+                {"field_key": "priority", "field_name": "优先级", "options": options(PRIORITIES, "p")},
+                {"field_key": "severity", "field_name": "严重程度", "options": options(SEVERITIES, "s")},
+                {"field_key": "field_f18a13", "field_name": "PingCode_URL"},
+                {"field_key": "field_e2c852", "field_name": "PingCode编号"},
+                {"field_key": FEISHU_ENV_FIELD_KEY, "field_name": "环境类型", "options": options(TEST_ENVS, "e")},
+            ]
+        )
+
+    def create_work_item(self, request):
+        data = request.json
+        if not data.get("name"):
+            return self._ok(err_code=20006, err_msg="name is required")
+        fields = {pair["field_key"]: pair.get("field_value") for pair in data.get("field_value_pairs", [])}
+        fields.setdefault("work_item_status", "新增")
+        work_item_id = self.store.add_feishu_work_item(data["name"], data.get("work_item_type_key", "issue"), **fields)
+        return self._ok(work_item_id)
+
+    def update_work_item(self, request):
+        with self.store.lock:
+            item = self._get_item(request)
+            if item is None:
+                return self._ok(err_code=30005, err_msg="work item not found")
+            for field in request.json.get("update_fields", []):
+                item["fields"][field["field_key"]] = self._field_value(field.get("field_value"))
+        return self._ok({})
+
+    def query_work_items(self, request):
+        ids = set(request.json.get("work_item_ids") or [])
+        with self.store.lock:
+            work_items = self.store.feishu_work_items
+            items = [self._format_item(work_items[item_id]) for item_id in ids if item_id in work_items]
+        return self._ok(items)
+
+    def filter_work_items(self, request):
+        data = request.json
+        type_keys = data.get("work_item_type_keys") or []
+        name = data.get("work_item_name")
+        page_num, page_size = self._page(data)
+        with self.store.lock:
+            items = [
+                self._format_item(item)
+                for item in self.store.feishu_work_items.values()
+                if (not type_keys or item["work_item_type_key"] in type_keys) and (not name or name in item["name"])
+            ]
+        page = items[(page_num - 1) * page_size : page_num * page_size]
+        return self._ok(page, pagination={"total": len(items), "page_num": page_num, "page_size": page_size})
+
+    @staticmethod
+    def _match_param(item, param):
+        value = item["fields"].get(param.get("param_key"))
+        expected = param.get("value")
+        operator = param.get("operator")
+        values = [str(v) for v in (value if isinstance(value, list) else [value]) if v not in (None, "")]
+        expected_values = [str(v) for v in (expected if isinstance(expected, list) else [expected])]
+        if operator == "IS NOT NULL":
+            return bool(values)
+        if operator == "IS NULL":
+            return not values
+        if operator == "=":
+            return str(value) == str(expected)
+        if operator == "HAS ANY OF":
+            return bool(set(values) & set(expected_values))
+        if operator == "HAS NONE OF":
+            return not set(values) & set(expected_values)
+        return True
+
+    def search_params(self, request):
+        data = request.json
+        group = data.get("search_group") or {}
+        params = group.get("search_params") or []
+        combine = any if group.get("conjunction") == "OR" else all
+        page_num, page_size = self._page(data)
+        type_key = request.params["work_item_type_key"]
+        with self.store.lock:
+            items = [
+                self._format_item(item, data.get("fields"))
+                for item in self.store.feishu_work_items.values()
+                if item["work_item_type_key"] == type_key
+                and (not params or combine(self._match_param(item, param) for param in params))
+            ]
+        page = items[(page_num - 1) * page_size : page_num * page_size]
+        return self._ok(page, pagination={"total": len(items), "page_num": page_num, "page_size": page_size})
+
+    def workflow(self, request):
+        states = list(dict.fromkeys(["新增"] + list(FEISHU_STATES.values())))
+        nodes = [{"id": f"state_{index}", "name": name} for index, name in enumerate(states)]
+        connections = [
+            {"source_state_key": source["id"], "target_state_key": target["id"], "transition_id": index}
+            for index, (source, target) in enumerate(itertools.permutations(nodes, 2), start=1)
+        ]
+        return self._ok({"state_flow_nodes": nodes, "connections": connections})
+
+    def state_change(self, request):
+        with self.store.lock:
+            item = self._get_item(request)
+            if item is None:
+                return self._ok(err_code=30005, err_msg="work item not found")
+            item["fields"]["transition_id"] = request.json.get("transition_id")
+        return self._ok({})
+
+    def create_comment(self, request):
+        with self.store.lock:
+            item = self._get_item(request)
+            if item is None:
+                return self._ok(err_code=30005, err_msg="work item not found")
+            comment_id = self.store.next_id()
+            self.store.feishu_comments.setdefault(item["id"], []).append({"id": comment_id, **request.json})
+        return self._ok(comment_id)
+
+    def get_comments(self, request):
+        page_num, page_size = self._page(request.query)
+        with self.store.lock:
+            item = self._get_item(request)
+            comments = list(self.store.feishu_comments.get(item["id"], [])) if item else []
+        page = comments[(page_num - 1) * page_size : page_num * page_size]
+        return self._ok(page, pagination={"total": len(comments), "page_num": page_num, "page_size": page_size})
+
+
+class FakeYunxiaoServer(FakeServer):
+    """云效替身：OpenAPI（成员、工作项类型/字段、工作项创建/搜索/更新）和迁移脚本使用的网页接口（创建缺陷、评论）"""
+
+    name = "yunxiao"
+
+    def routes(self):
+        org = "/oapi/v1/projex/organizations/{organization_id}"
+        project = org + "/projects/{project_id}"
+        return [
+            ("GET", project + "/members", self.members),
+            ("GET", project + "/workitemTypes", self.work_item_types),
+            ("GET", project + "/workitemTypes/{work_item_type_id}/fields", self.work_item_fields),
+            ("POST", org + "/workitems", self.create_work_item),
+            ("POST", org + "/workitems:search", self.search_work_items),
+            ("PUT", org + "/workitems/{work_item_id}", self.update_work_item),
+            ("POST", "/projex/api/workitem/workitem", self.web_create_bug),
+            ("POST", "/projex/api/workitem/workitem/{identifier}/comment", self.web_create_comment),
+        ]
+
+    def members(self, request):
+        return list(self.store.yunxiao_members)
+
+    def work_item_types(self, request):
+        return [{"id": FAKE_YUNXIAO_BUG_TYPE_ID, "name": "缺陷", "categoryId": "Bug"}]
+
+    def work_item_fields(self, request):
+        return [
+            {"id": "priority", "name": "优先级", "options": options(PRIORITIES, "p", "value", "id")},
+            {"id": "seriousLevel", "name": "严重程度", "options": options(SEVERITIES, "s", "value", "id")},
+            {"id": "env_type", "name": "环境类型", "options": options(TEST_ENVS, "e", "value", "id")},
+        ]
+
+    def _add_work_item(self, data):
+        with self.store.lock:
+            work_item_id = f"yxw{self.store.next_id()}"
+            work_item = dict(data, id=work_item_id, identifier=f"BUG-{len(self.store.yunxiao_work_items) + 1}")
+            self.store.yunxiao_work_items[work_item_id] = work_item
+            return work_item
+
+    def create_work_item(self, request):
+        if not request.json.get("subject"):
+            return FakeResponse(400, {"errorCode": "InvalidParameter", "errorMessage": "subject is required"})
+        return {"id": self._add_work_item(request.json)["id"]}
+
+    def search_work_items(self, request):
+        data = request.json
+        page, per_page = max(int(data.get("page") or 1), 1), min(int(data.get("perPage") or 20), 200)
+        with self.store.lock:
+            items = list(self.store.yunxiao_work_items.values())
+        return FakeResponse(
+            200, paginate(items, page - 1, per_page), headers={"x-total": str(len(items)), "x-page": str(page)}
+        )
+
+    def update_work_item(self, request):
+        with self.store.lock:
+            work_item = self.store.yunxiao_work_items.get(request.params["work_item_id"])
+            if work_item is None:
+                return FakeResponse(404, {"errorCode": "NotFound", "errorMessage": "workitem not found"})
+            work_item.update(request.json)
+        return FakeResponse(204)
+
+    def web_create_bug(self, request):
+        data = json.loads(request.body.decode("utf-8") or "{}")
+        if not data.get("subject") or not data.get("csrfToken"):
+            return {"code": 400, "errorMsg": "subject/csrfToken is required"}
+        work_item = self._add_work_item(data)
+        return {"code": 200, "result": {"identifier": work_item["identifier"], "id": work_item["id"]}}
+
+    def web_create_comment(self, request):
+        data = json.loads(request.body.decode("utf-8") or "{}")
+        with self.store.lock:
+            self.store.yunxiao_comments.setdefault(request.params["identifier"], []).append(data)
+        return {"code": 200, "result": {"id": self.store.next_id()}}
+
+
+class FakeServices:
+    """PingCode、飞书项目、云效三个替身服务，共享一份数据"""
+
+    def __init__(self, store=None, **behavior):
+        """
+        :param store: FakeDataStore，默认新建
+        :param behavior: 延迟、错误率、限流等配置，见 FakeServer
+        """
+        self.store = store or FakeDataStore()
+        self.pingcode = FakePingCodeServer(self.store, **behavior)
+        self.feishu = FakeFeishuServer(self.store, **behavior)
+        self.yunxiao = FakeYunxiaoServer(self.store, **behavior)
+
+    @property
+    def servers(self):
+        return {"pingcode": self.pingcode, "feishu": self.feishu, "yunxiao": self.yunxiao}
+
+    def start(self):
+        for server in self.servers.values():
+            server.start()
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def configure(self, **behavior):
+        for server in self.servers.values():
+            server.configure(**behavior)
+
+    def stats(self):
+        return {name: server.stats() for name, server in self.servers.items()}
+
+    def reset_stats(self):
+        for server in self.servers.values():
+            server.reset_stats()
+
+    def conf_values(self):
+        """各 conf 模块中需要指向替身服务的配置"""
+        return {
+            "conf.global_conf": {},
+            "conf.ping_code_conf": {
+                "COOKIE": "fake-cookie",
+                "PING_CODE_BASE_URL": self.pingcode.url,
+                "PING_CODE_VIEWS_ID": FAKE_PING_CODE_VIEW_ID,
+                "PING_CODE_PROJECT_ID": FAKE_PING_CODE_PROJECT_ID,
+                "PING_CODE_BUG_STATUS": dict(PING_CODE_STATES),
+                "PING_CODE_BUG_STATUS_RES": [{"_id": _id, "name": name} for _id, name in PING_CODE_STATES],
+            },
+            "conf.feishu_conf": {
+                "FEISHU_PROJECT_URL": self.feishu.url,
+                "PROJECT_KEY": FAKE_PROJECT_KEY,
+                "PLUGIN_ID": "fake-plugin",
+                "PLUGIN_SECRET": "fake-secret",
+                "USER_KEY": "fake-user",
+                "STATUS_PING_CODE_TO_FEISHU": dict(FEISHU_STATES),
+            },
+            "conf.yunxiao_conf": {
+                "YUNXIAO_API_URL": self.yunxiao.url,
+                "x_yunxiao_token": "fake-yunxiao-token",
+                "organization_id": FAKE_YUNXIAO_ORGANIZATION_ID,
+                "project_id": FAKE_YUNXIAO_PROJECT_ID,
+            },
+            "conf.yunxiao_web_conf": {
+                "APIPOST_CSRF_TOKEN": "fake-csrf-token",
+                "COOKIE": "fake-cookie",
+                "PRIORITY_MAP": {text: f"p{i}" for i, text in enumerate(PRIORITIES + ["一般"])},
+                "SERIOUS_LEVEL_MAP": {text: f"s{i}" for i, text in enumerate(SEVERITIES)},
+                "STATUS_MAP": {name: f"yx-{_id}" for _id, name in PING_CODE_STATES},
+                "DEFAULT_STATUS_ID": "yx-st_new",
+                "ASSIGNEE_MAP": {m["userName"]: m["userId"] for m in self.store.yunxiao_members},
+                "USER_ID": "yx-u1",
+                "WORKITEM_TYPE_ID": FAKE_YUNXIAO_BUG_TYPE_ID,
+                "PROJECT_SPACE_ID": FAKE_YUNXIAO_PROJECT_ID,
+                "ORGANIZATION_ID": FAKE_YUNXIAO_ORGANIZATION_ID,
+                "TENANT_ID": "fake-tenant",
+                "PROJECT_ID": FAKE_YUNXIAO_PROJECT_ID,
+                "CREATE_BUG_URL": f"{self.yunxiao.url}/projex/api/workitem/workitem?_input_charset=utf-8",
+            },
+        }
+
+    def patch_conf(self):
+        """
+        将 conf 下的服务地址、账号等配置指向替身服务（没有 conf 时创建），之后导入的客户端默认连接替身服务；
+        已导入的 utils 模块中引用的配置同时替换。服务需已启动
+        """
+        global_defaults = {
+            "REQUEST_TIMEOUT": 30,
+            "PROJECT_PATH": Path(tempfile.gettempdir()) / "autopingcode-benchmark",
+        }
+        for module_name, values in self.conf_values().items():
+            module = _import_or_create(module_name)
+            if module_name == "conf.global_conf":
+                values = {key: value for key, value in global_defaults.items() if not hasattr(module, key)}
+            for key, value in values.items():
+                setattr(module, key, value)
+            for consumer in CONF_CONSUMERS.get(module_name, []):
+                consumer_module = sys.modules.get(consumer)
+                if consumer_module is None:
+                    continue
+                for key, value in values.items():
+                    if hasattr(consumer_module, key):
+                        setattr(consumer_module, key, value)
+
+        # PingCode 附件下载地址不在 conf 中
+        ping_code_utils = importlib.import_module("utils.ping_code_utils")
+        ping_code_utils.PING_CODE_ATLAS_URL = self.pingcode.url
+
+
+# 通过 from conf.xxx import 引用配置的模块
+CONF_CONSUMERS = {
+    "conf.global_conf": ["utils.request_utils"],
+    "conf.ping_code_conf": ["utils.ping_code_utils"],
+    "conf.feishu_conf": ["utils.feishu_project_utils", "utils.feishu_project_api_utils"],
+    "conf.yunxiao_conf": ["utils.yunxiao_utils"],
+}
+
+
+def _import_or_create(module_name):
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        pass
+    package_name, _, child_name = module_name.rpartition(".")
+    try:
+        package = importlib.import_module(package_name)
+    except ImportError:
+        package = types.ModuleType(package_name)
+        package.__path__ = []
+        sys.modules[package_name] = package
+    module = types.ModuleType(module_name)
+    sys.modules[module_name] = module
+    setattr(package, child_name, module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动 PingCode/飞书项目/云效本地替身服务")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外的随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回错误的比例（0-1）")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit", type=float, default=None, help="每秒最多处理的请求数")
+    args = parser.parse_args()
+
+    services = FakeServices(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate_limit=args.rate_limit,
+    ).start()
+    print(json.dumps({name: server.url for name, server in services.servers.items()}, indent=2))
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        print(json.dumps(services.stats(), ensure_ascii=False, indent=2))
+    finally:
+        services.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/19 14:20
+# @Author : Xumh
+"""
+接口压测：并发请求只读接口（任务状态、队列指标），统计吞吐量和延迟
+用法：
+    python -m benchmarks.load_test --base-url http://127.0.0.1:5432 --concurrency 32 --duration 10
+
+实测（1 核机器，压测客户端与服务同机，32 并发 15 秒，两次结果，外部服务使用 benchmarks.fake_servers 替身）：
+    Flask 内置服务器单进程（threaded，debug 关闭）：462 / 428 rps，p50 70 / 74 ms
+    gunicorn 2 worker x 16 线程（gunicorn.conf.py 默认配置）：638 / 508 rps，p50 44 / 55 ms
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_PATHS = [
+    "/api/v1/feishu_pingcode/queues",
+    "/api/v1/feishu_pingcode/tasks/load-test-missing-task",
+]
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_load_test(base_url, paths=None, concurrency=32, duration=10):
+    """
+    :param base_url: 服务地址
+    :param paths: 轮流请求的接口路径
+    :param concurrency: 并发线程数
+    :param duration: 压测时长（秒）
+    :return: {"requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms"}
+    """
+    paths = paths or DEFAULT_PATHS
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_index):
+        session = requests.Session()
+        local_latencies = []
+        local_errors = 0
+        count = worker_index
+        while time.perf_counter() < deadline:
+            path = paths[count % len(paths)]
+            count += 1
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url.rstrip("/") + path, timeout=30)
+                # 404 为预期的“任务不存在”响应
+                if response.status_code >= 500:
+                    local_errors += 1
+            except requests.RequestException:
+                local_errors += 1
+            local_latencies.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "duration": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="接口压测")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5432")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--path", action="append", dest="paths", help="请求路径，可重复指定")
+    args = parser.parse_args()
+    result = run_load_test(args.base_url, args.paths, args.concurrency, args.duration)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
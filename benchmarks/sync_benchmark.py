@@ -0,0 +1,360 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/20 11:00
+# @Author : Xumh
+"""
+同步热点路径基准测试：生成模拟项目数据，在本地替身服务（benchmarks.fake_servers）上运行
+update_bug_info_from_ping_code、update_ping_code_sprint_bug、import_ping_code_bugs 和云效迁移，
+统计耗时、各接口请求数、p50/p95 延迟和内存峰值，输出 JSON 便于不同提交之间对比
+用法：
+    python -m benchmarks.sync_benchmark --bugs 200 --comments 5 --images 2 --output bench.json
+    python -m benchmarks.sync_benchmark --scenario update_bug_info --latency 0.02 --baseline bench.json
+注意：内存峰值（tracemalloc）包含同一进程中替身服务的分配
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import logging
+import random
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.fake_servers import FEISHU_STATES, PING_CODE_STATES, PNG_BYTES, FakeServices
+from utils.profiling import collect_trace
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MIGRATION_SCRIPT = PROJECT_ROOT / "pingcode迁移云效脚本.py"
+SPRINT_NAME = "Benchmark Sprint"
+OTHER_SPRINT_NAME = "Benchmark Backlog"
+PING_CODE_ID_PREFIX = "SYYXX-"
+SCENARIOS = ["update_bug_info", "sprint_sync", "import_ping_code_bugs", "yunxiao_migration"]
+
+WORDS = "登录 页面 报错 保存 失败 虚拟机 配置 网络 超时 文件 上传 下载 同步 刷新 显示 异常 按钮 无响应 数据 丢失".split()
+
+
+def sentence(rng, min_words=6, max_words=20):
+    return "".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+
+def generate_project(
+    store,
+    image_base_url,
+    bugs=200,
+    comments=5,
+    images=2,
+    attachments=1,
+    members=200,
+    description_bytes=2000,
+    image_bytes=20 * 1024,
+    in_sprint_ratio=0.5,
+    stale_ratio=0.5,
+    seed=0,
+):
+    """
+    生成模拟项目：PingCode 缺陷（描述、图片、附件、评论）以及关联的飞书 bug
+    :param store: FakeDataStore
+    :param image_base_url: 描述中图片地址的前缀（PingCode 替身服务地址）
+    :param bugs: 缺陷数量
+    :param comments: 每个缺陷的评论数
+    :param images: 每个缺陷描述中的图片数
+    :param attachments: 每个缺陷的附件数（第一条评论也带同样数量的附件）
+    :param members: 项目成员数，决定每次查询返回的 references 大小
+    :param description_bytes: 描述文本的大致长度
+    :param image_bytes: 图片/附件大小
+    :param in_sprint_ratio: 已在目标迭代中的缺陷比例（sprint 同步时可跳过）
+    :param stale_ratio: 飞书 bug 状态与 PingCode 不一致的比例（需要更新）
+    :param seed: 随机数种子
+    :return: 数据规模
+    """
+    rng = random.Random(seed)
+    image_content = PNG_BYTES + bytes(max(image_bytes - len(PNG_BYTES), 0))
+    references = store.pingcode_references
+    references["members"] = [
+        {"uid": f"u{index}", "name": f"user{index}", "display_name": f"用户{index}"} for index in range(1, members + 1)
+    ]
+    properties = {prop["key"]: prop["options"] for prop in references["properties"]}
+
+    sprint_id = store.add_pingcode_sprint(SPRINT_NAME)
+    other_sprint_id = store.add_pingcode_sprint(OTHER_SPRINT_NAME)
+    feishu_sprint_id = store.add_feishu_work_item(SPRINT_NAME, "sprint")
+    store.add_feishu_work_item(OTHER_SPRINT_NAME, "sprint")
+
+    for index in range(bugs):
+        identifier = 1000 + index
+        paragraphs = []
+        while sum(len(p) for p in paragraphs) < description_bytes // 3:
+            paragraphs.append(f"<p>{sentence(rng)}</p>")
+        for image_index in range(images):
+            image_name = f"bench-{identifier}-{image_index}.png"
+            store.add_image(image_name, image_content)
+            paragraphs.append(f'<img src="{image_base_url}/images/{image_name}" alt="{image_name}">')
+        state_id, state_name = rng.choice(PING_CODE_STATES)
+        bug = store.add_pingcode_bug(
+            identifier,
+            f"{sentence(rng, 3, 8)}-{identifier}",
+            sprint_id=sprint_id if rng.random() < in_sprint_ratio else other_sprint_id,
+            state_id=state_id,
+            description="".join(paragraphs),
+            priority=rng.choice(properties["priority"])["_id"],
+            properties={
+                "severity": rng.choice(properties["severity"])["_id"],
+                "kehuduanxitongpingtai": [rng.choice(properties["kehuduanxitongpingtai"])["_id"]],
+            },
+            assignee=f"u{rng.randint(1, members)}",
+            attachments=[
+                store.add_pingcode_attachment(f"attachment-{identifier}-{n}.png", image_content)
+                for n in range(attachments)
+            ],
+        )
+        for comment_index in range(comments):
+            comment_attachments = bug["attachments"] if comment_index == 0 else []
+            store.add_pingcode_comment(
+                bug["_id"], sentence(rng), created_by=f"u{rng.randint(1, members)}", attachments=comment_attachments
+            )
+
+        if rng.random() < stale_ratio:
+            feishu_status = rng.choice([name for _, name in PING_CODE_STATES if name != state_name])
+        else:
+            feishu_status = state_name
+        store.add_feishu_work_item(
+            bug["title"],
+            "issue",
+            field_e2c852=f"{PING_CODE_ID_PREFIX}{identifier}",
+            field_9d59f3=feishu_status,
+            field_7f6e66="",
+            field_f18a13="",
+            planning_sprint=[feishu_sprint_id],
+            work_item_status=FEISHU_STATES.get(feishu_status, "新增"),
+        )
+
+    return {
+        "bugs": bugs,
+        "comments": comments,
+        "images": images,
+        "attachments": attachments,
+        "members": members,
+        "description_bytes": description_bytes,
+        "image_bytes": image_bytes,
+    }
+
+
+def pingcode_search_data(page_size):
+    return {"addon_setting_id": "6847a64c4c9434fbbce54bcf", "criteria": {"conditions": []}, "pi": 0, "ps": page_size}
+
+
+def summarize_result(result):
+    """任务结果只保留数量，避免输出过大"""
+    if isinstance(result, dict):
+        return {key: len(value) if isinstance(value, (list, dict)) else value for key, value in result.items()}
+    return result
+
+
+def run_update_bug_info(services, project):
+    from utils.feishu_project_utils import FeiShuProjectUtils
+
+    return FeiShuProjectUtils().update_bug_info_from_ping_code()
+
+
+def run_sprint_sync(services, project):
+    from utils.feishu_project_utils import FeiShuProjectUtils
+    from utils.sprint_registry import get_sprint_registry
+
+    # 每个场景的数据不同，清空上一次缓存的 sprint id
+    get_sprint_registry().invalidate()
+    return FeiShuProjectUtils().update_ping_code_sprint_bug(SPRINT_NAME)
+
+
+def run_import_ping_code_bugs(services, project):
+    from utils.feishu_project_api_utils import PingCodeToFeishuUtils
+
+    client = PingCodeToFeishuUtils()
+    client.set_ping_code_client()
+    search_data = pingcode_search_data(50)
+    imported = 0
+    while True:
+        count = client.import_ping_code_bugs(search_data)
+        if not count:
+            return {"imported": imported}
+        imported += count
+        search_data["pi"] += 1
+
+
+def load_migration_script():
+    spec = importlib.util.spec_from_file_location("pingcode_to_yunxiao", MIGRATION_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_yunxiao_migration(services, project):
+    from utils.ping_code_utils import PingCodeClient
+
+    migration = load_migration_script()
+    migration.BUG_SYNC_WAIT = migration.COMMENT_INTERVAL = 0
+    # 迁移流程逐条打印进度，基准测试中不输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        bugs = PingCodeClient().format_bug_info_for_yunxiao(pingcode_search_data(project["bugs"]))
+        success_count, fail_list = migration.batch_create_bugs(bugs)
+    return {"count": len(bugs), "success": success_count, "error": len(fail_list)}
+
+
+SCENARIO_FUNCS = {
+    "update_bug_info": run_update_bug_info,
+    "sprint_sync": run_sprint_sync,
+    "import_ping_code_bugs": run_import_ping_code_bugs,
+    "yunxiao_migration": run_yunxiao_migration,
+}
+
+
+def run_scenario(name, project_params, behavior, seed=0):
+    """
+    在新的替身服务和模拟数据上运行一个场景
+    :return: {"wall_time_s", "peak_memory_mb", "requests", "endpoints", "phases", "result", "error"}
+    """
+    with FakeServices(seed=seed, **behavior) as services:
+        services.patch_conf()
+        project = generate_project(services.store, services.pingcode.url, seed=seed, **project_params)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with collect_trace() as tracer:
+            try:
+                result = SCENARIO_FUNCS[name](services, project)
+                error = None
+            except Exception as e:
+                result, error = None, f"{e.__class__.__name__}: {e}"
+        wall_time = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        endpoints = services.stats()
+        return {
+            "wall_time_s": round(wall_time, 3),
+            "peak_memory_mb": round(peak_memory / 1024 / 1024, 2),
+            "requests": sum(server.request_count() for server in services.servers.values()),
+            "endpoints": {server: routes for server, routes in endpoints.items() if routes},
+            "phases": tracer.summary()["phases"],
+            "result": summarize_result(result),
+            "error": error,
+        }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(scenarios=None, project_params=None, behavior=None, keep_sleeps=False, seed=0):
+    """
+    :param scenarios: 场景列表，默认全部
+    :param project_params: generate_project 的参数
+    :param behavior: 替身服务的延迟、错误率、限流配置
+    :param keep_sleeps: 是否保留代码中为避免限流设置的固定等待（导入评论间隔等）
+    :return: 基准测试结果
+    """
+    project_params = project_params or {}
+    behavior = behavior or {}
+    scenarios = scenarios or SCENARIOS
+    # 创建替身服务后才能导入依赖 conf 的模块
+    with FakeServices() as services:
+        services.patch_conf()
+    from utils import feishu_project_api_utils
+    from utils.log_utils import logger
+
+    if not keep_sleeps:
+        feishu_project_api_utils.COMMENT_CREATE_INTERVAL = 0
+    log_level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        results = {name: run_scenario(name, project_params, behavior, seed) for name in scenarios}
+    finally:
+        logger.setLevel(log_level)
+        from utils.write_buffer import stop_write_buffer
+
+        stop_write_buffer()
+
+    return {
+        "revision": git_revision(),
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "project": project_params,
+        "behavior": behavior,
+        "keep_sleeps": keep_sleeps,
+        "seed": seed,
+        "scenarios": results,
+    }
+
+
+def compare(baseline, current):
+    """与基准结果对比耗时、请求数和内存峰值，返回 {场景: {指标: [基准, 当前, 变化比例]}}"""
+    comparison = {}
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        comparison[name] = {
+            key: [base[key], result[key], round(result[key] / base[key] - 1, 3) if base[key] else None]
+            for key in ("wall_time_s", "requests", "peak_memory_mb")
+        }
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同步热点路径基准测试")
+    parser.add_argument("--scenario", action="append", dest="scenarios", choices=SCENARIOS, help="可重复指定")
+    parser.add_argument("--bugs", type=int, default=200)
+    parser.add_argument("--comments", type=int, default=5, help="每个缺陷的评论数")
+    parser.add_argument("--images", type=int, default=2, help="每个缺陷描述中的图片数")
+    parser.add_argument("--attachments", type=int, default=1, help="每个缺陷的附件数")
+    parser.add_argument("--members", type=int, default=200, help="项目成员数（references 大小）")
+    parser.add_argument("--description-bytes", type=int, default=2000)
+    parser.add_argument("--image-bytes", type=int, default=20 * 1024)
+    parser.add_argument("--latency", type=float, default=0.0, help="替身服务每个请求的延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--keep-sleeps", action="store_true", help="保留代码中的固定等待")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果写入 JSON 文件")
+    parser.add_argument("--baseline", help="对比的基准结果 JSON 文件")
+    args = parser.parse_args()
+
+    result = run_benchmark(
+        args.scenarios,
+        project_params={
+            "bugs": args.bugs,
+            "comments": args.comments,
+            "images": args.images,
+            "attachments": args.attachments,
+            "members": args.members,
+            "description_bytes": args.description_bytes,
+            "image_bytes": args.image_bytes,
+        },
+        behavior={
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "rate_limit": args.rate_limit,
+        },
+        keep_sleeps=args.keep_sleeps,
+        seed=args.seed,
+    )
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            result["comparison"] = compare(json.load(f), result)
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
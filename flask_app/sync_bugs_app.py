@@ -1,12 +1,25 @@
 # sync_bugs_app.py
-import sqlite3
-
-from flask import Flask
+import functools
+import hmac
+import json
+import os
+import queue
+import re
+import time
+
+from flask import Flask, Response, request, stream_with_context
 from flask_cors import CORS
 from flask_restx import Api, Resource, fields
+from jsonpath import jsonpath  # noqa
 
+from utils.coalescing_queue import CoalescingQueue
 from utils.feishu_project_utils import FeiShuProjectUtils
+from utils.log_utils import logger
+from utils.request_metrics import dump_request_metrics, load_request_metrics, start_request_metrics_dump
+from utils.scheduler import Scheduler
+from utils.sprint_registry import SprintNotFoundError, get_sprint_registry
 from utils.thread_utils import ThreadUtils
+from utils.write_buffer import stop_write_buffer
 
 # 创建 Flask 应用
 app = Flask(__name__, static_folder="static")
@@ -29,6 +42,17 @@ def smart_monitor():
     return app.send_static_file("smart_report.html")
 
 
+@app.route("/metrics")
+def metrics():
+    """
+    以 Prometheus 文本格式导出外部接口请求统计（按 host、method、路由模板聚合）
+    gunicorn 多 worker 部署时各 worker 的统计汇总后导出（不区分 worker），抓取请求落到任一 worker 结果一致，
+    计数不会回退；其他 worker 的统计最多滞后 METRICS_DUMP_INTERVAL 秒
+    """
+    dump_request_metrics()
+    return Response(load_request_metrics().to_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 # 创建 RESTX API 实例
 api = Api(
     app,
@@ -43,8 +67,191 @@ api = Api(
 feishu_ns = api.namespace("feishu_pingcode", description="飞书项目相关操作")
 device_info_ns = api.namespace("device_info", description="设备信息 数据相关操作")
 
-# 创建线程工具实例
-thread_utils = ThreadUtils(max_workers=2)
+# 创建线程工具实例（保留最近 200 个任务 7 天，超过 256KB 的结果压缩落盘）
+# 全量同步走 bulk 队列，sprint 同步等交互任务走 interactive 队列，
+# NAS SMART 采集等 I/O 型设备探测走 device_probe 队列（主要在等待 SSH，线程数可以多一些），互不阻塞
+thread_utils = ThreadUtils(
+    max_workers=1,
+    max_tasks=200,
+    task_ttl=7 * 24 * 3600,
+    compact_result_bytes=256 * 1024,
+    queues={"bulk": 1, "interactive": 2, "device_probe": 8},
+)
+
+
+def update_bug_info_task(progress_callback=None, checkpoint=None):
+    """异步任务：从 PingCode 更新飞书项目 bug 信息"""
+    feishu_client = FeiShuProjectUtils()
+    return feishu_client.update_bug_info_from_ping_code(progress_callback=progress_callback, checkpoint=checkpoint)
+
+
+def sync_sprint_bugs_task(sprint_name, progress_callback=None, checkpoint=None):
+    """异步任务：同步飞书项目 sprint 下的 bug 到 PingCode"""
+    feishu_client = FeiShuProjectUtils()
+    return feishu_client.update_ping_code_sprint_bug(
+        sprint_name, progress_callback=progress_callback, checkpoint=checkpoint
+    )
+
+
+def sync_sprints_bugs_task(sprint_names, progress_callback=None, checkpoint=None):
+    """异步任务：在一个任务中同步多个 sprint 下的 bug 到 PingCode"""
+    feishu_client = FeiShuProjectUtils()
+    return feishu_client.update_ping_code_sprints_bugs(
+        sprint_names, progress_callback=progress_callback, checkpoint=checkpoint
+    )
+
+
+def sync_ping_code_bugs_task(pc_bug_ids, progress_callback=None, checkpoint=None):
+    """异步任务：按 PingCode 编号同步飞书项目 bug 的状态和评论（webhook 增量更新）"""
+    feishu_client = FeiShuProjectUtils()
+    return feishu_client.sync_bugs_by_ping_code_ids(
+        pc_bug_ids, progress_callback=progress_callback, checkpoint=checkpoint
+    )
+
+
+def reconcile_task(dry_run=False, progress_callback=None):
+    """异步任务：飞书项目与 PingCode 双向对账"""
+    from utils.reconcile_utils import Reconciler
+
+    return Reconciler().run(dry_run=dry_run, progress_callback=progress_callback)
+
+
+def fetch_smart_task(hosts=None, max_workers=None, timeout=None, progress_callback=None):
+    """
+    异步任务：采集 NAS 的 SMART 信息并入库
+    :param hosts: [{"nas_ip", "nas_user", "nas_password"}]，默认使用 NAS 清单（conf/nas_conf.py）
+    """
+    from utils.nas_utils import DEFAULT_FLEET_WORKERS, DEFAULT_HOST_TIMEOUT, collect_fleet_smart
+
+    return collect_fleet_smart(
+        hosts,
+        max_workers=max_workers or DEFAULT_FLEET_WORKERS,
+        timeout=timeout or DEFAULT_HOST_TIMEOUT,
+        progress_callback=progress_callback,
+    )
+
+
+# 注册任务类型，服务重启后可恢复被中断的任务
+thread_utils.register_task("update_bug_info", update_bug_info_task, queue_name="bulk")
+thread_utils.register_task("sync_sprint_bugs", sync_sprint_bugs_task, queue_name="interactive")
+thread_utils.register_task("sync_sprints_bugs", sync_sprints_bugs_task, queue_name="interactive")
+thread_utils.register_task("sync_ping_code_bugs", sync_ping_code_bugs_task, queue_name="interactive")
+thread_utils.register_task("reconcile", reconcile_task, queue_name="bulk")
+thread_utils.register_task("fetch_smart", fetch_smart_task, queue_name="device_probe")
+
+
+def submit_smart_task(hosts=None, max_workers=None, timeout=None, dedup_key=None):
+    """
+    提交 SMART 采集任务
+    请求中带了 NAS 列表（含密码）时不注册任务类型，参数绑定在任务函数上，避免密码写入任务存储；
+    这类任务服务重启后不恢复，重新提交即可；使用 NAS 清单时按注册类型提交，可恢复
+    """
+    if hosts is None:
+        return thread_utils.submit_task(
+            "fetch_smart", max_workers=max_workers, timeout=timeout, dedup_key=dedup_key
+        )
+    return thread_utils.submit_task(
+        functools.partial(fetch_smart_task, hosts, max_workers=max_workers, timeout=timeout),
+        dedup_key=dedup_key,
+        queue_name="device_probe",
+    )
+
+
+# 默认定时任务，可在 conf/schedule_conf.py 中通过 SCHEDULES 覆盖，如同步指定 sprint：
+#   {"name": "sync_sprint_bugs:Sprint 1", "kind": "sync_sprint_bugs", "args": ["Sprint 1"], "interval": 1800}
+DEFAULT_SCHEDULES = [
+    # PingCode 变更通过 webhook 增量同步，每晚双向对账一次（替代 bug 信息和 sprint 的全量同步）
+    {"name": "reconcile", "kind": "reconcile", "cron": "0 2 * * *", "jitter": 300},
+    # 每天凌晨采集 NAS 清单的 SMART 信息，与手动批量采集共用去重键
+    {"name": "fetch_smart", "kind": "fetch_smart", "cron": "0 3 * * *", "jitter": 600,
+     "dedup_key": "fetch_smart:inventory"},
+]
+
+
+def load_schedules():
+    """读取定时任务配置 conf/schedule_conf.py 中的 SCHEDULES，未配置时使用默认定时任务"""
+    try:
+        from conf.schedule_conf import SCHEDULES
+    except ImportError:
+        return DEFAULT_SCHEDULES
+    return list(SCHEDULES)
+
+
+scheduler = Scheduler(thread_utils, load_schedules())
+
+# webhook 合并窗口（秒）：同一 bug 在窗口内的多次变更事件只同步一次
+WEBHOOK_COALESCE_WINDOW = int(os.environ.get("WEBHOOK_COALESCE_WINDOW", 10))
+# webhook 校验令牌，配置后请求需在 X-Webhook-Token 请求头或 token 参数中携带；未配置时不校验，启动时告警
+PINGCODE_WEBHOOK_TOKEN = os.environ.get("PINGCODE_WEBHOOK_TOKEN")
+# 工作项编号（项目标识-序号，如 SYYXX-123），事件中的项目 identifier（如 SYYXX）等不匹配
+WEBHOOK_BUG_ID_PATTERN = re.compile(r"^[A-Z][A-Z0-9]*-\d+$")
+
+
+def submit_webhook_bugs(batch):
+    """合并窗口结束后，将本批 PingCode 编号作为一个同步任务提交"""
+    pc_bug_ids = sorted(batch)
+    task_id = thread_utils.submit_task("sync_ping_code_bugs", pc_bug_ids)
+    logger.info(f"webhook 同步任务已提交: {task_id}，PingCode 编号: {pc_bug_ids}")
+
+
+webhook_queue = CoalescingQueue(submit_webhook_bugs, window=WEBHOOK_COALESCE_WINDOW, name="pingcode-webhook")
+
+_tasks_recovered = False
+
+
+def start_background_services():
+    """
+    启动实例心跳（恢复已退出实例中断的任务）、请求统计定期写入、sprint 注册表后台刷新和定时调度，重复调用无副作用
+    设置环境变量 SCHEDULER_ENABLED=0 可关闭定时调度
+    """
+    if not PINGCODE_WEBHOOK_TOKEN:
+        logger.warning("未配置 PINGCODE_WEBHOOK_TOKEN，PingCode webhook 接口不校验请求来源")
+    thread_utils.start_heartbeat()
+    start_request_metrics_dump()
+    get_sprint_registry().start()
+    if os.environ.get("SCHEDULER_ENABLED", "1") == "1":
+        scheduler.start()
+
+
+def stop_background_services():
+    """
+    停止定时调度、提交排队中的 webhook 事件，并中断未完成任务（保留断点），由其他实例继续执行；
+    最后发出写缓冲中剩余的飞书更新，并写入本进程的请求统计供 /metrics 汇总
+    """
+    scheduler.stop()
+    get_sprint_registry().stop()
+    webhook_queue.stop(flush=True)
+    thread_utils.shutdown(wait=True, interrupt=True)
+    # 中断的任务已提交到写缓冲的更新仍需发出
+    stop_write_buffer()
+    dump_request_metrics()
+
+
+@app.before_request
+def recover_interrupted_tasks():
+    """
+    首个请求时启动后台服务（debug 模式下重载监控进程不处理请求，避免重复恢复），
+    并执行 SMART 数据库迁移；gunicorn 部署时后台服务由 post_worker_init 钩子提前启动
+    """
+    global _tasks_recovered
+    if _tasks_recovered:
+        return
+    _tasks_recovered = True
+    try:
+        start_background_services()
+    except Exception as e:
+        logger.error(f"启动后台服务失败: {e}")
+    try:
+        # SMART 数据库建表/迁移（进程内只执行一次）
+        from conf.global_conf import PROJECT_PATH
+        from utils.nas_utils import init_db
+
+        smart_db_path = PROJECT_PATH / "data" / "nas_smart.db"
+        if smart_db_path.exists():
+            init_db(smart_db_path)
+    except Exception as e:
+        logger.error(f"SMART 数据库初始化失败: {e}")
+
 
 # 定义响应码常量
 SUCCESS_CODE = 0  # 全部成功
@@ -66,6 +273,15 @@ sprint_request_model = api.model(
     "SprintRequest", {"sprint_name": fields.String(required=True, description="Sprint 名称", example="Sprint 1")}
 )
 
+sprints_request_model = api.model(
+    "SprintsRequest",
+    {
+        "sprint_names": fields.List(
+            fields.String, required=True, description="Sprint 名称列表", example=["Sprint 1", "Sprint 2"]
+        )
+    },
+)
+
 smart_request_model = api.model(
     "SmartRequest",
     {
@@ -75,6 +291,17 @@ smart_request_model = api.model(
     },
 )
 
+smart_batch_request_model = api.model(
+    "SmartBatchRequest",
+    {
+        "hosts": fields.List(
+            fields.Nested(smart_request_model), required=False, description="NAS 列表，不传则使用 NAS 清单（conf/nas_conf.py）"
+        ),
+        "max_workers": fields.Integer(required=False, description="最大并发数", example=16),
+        "timeout": fields.Integer(required=False, description="单台 NAS 超时（秒）", example=60),
+    },
+)
+
 
 def process_result(result):
     """处理方法调用结果，生成统一响应格式"""
@@ -82,8 +309,9 @@ def process_result(result):
     success_count = len(result.get("success", []))
     total_count = result.get("count", 0)
 
-    # 构造统一格式的返回数据
+    # 构造统一格式的返回数据，保留结果中的其他统计信息（如对账差异）
     response_data = {"count": total_count, "success": result.get("success", []), "error": result.get("error", [])}
+    response_data.update({key: value for key, value in result.items() if key not in response_data})
 
     # 判断响应码
     if error_count == 0:
@@ -128,6 +356,7 @@ class UpdateSprintBugs(Resource):
     @api.doc("sync_sprint_bugs_to_pingcode")
     @api.response(200, "操作完成", response_model)
     @api.response(400, "请求参数错误", response_model)
+    @api.response(404, "飞书项目或 PingCode 中找不到该 sprint", response_model)
     @api.response(500, "服务器内部错误", response_model)
     def post(self, sprint_name):
         """
@@ -146,13 +375,20 @@ class UpdateSprintBugs(Resource):
             # 处理结果
             return process_result(result)
 
+        except SprintNotFoundError as e:
+            return {"code": PARAM_ERROR_CODE, "message": str(e), "data": {}}, 404
         except Exception as e:
             return handle_exception(e)
 
 
+def profile_requested():
+    """请求参数 profile=1 时任务记录完整 trace（span 明细），可通过 /tasks/<id>/profile 查看"""
+    return request.args.get("profile", "0") in ("1", "true")
+
+
 @feishu_ns.route("/bugs/update/async")
 class AsyncUpdateBugInfo(Resource):
-    @api.doc("async_update_bug_info")
+    @api.doc("async_update_bug_info", params={"profile": "记录完整 trace（1/0）"})
     @api.response(202, "任务已提交")
     @api.response(500, "服务器内部错误", response_model)
     def post(self):
@@ -160,13 +396,10 @@ class AsyncUpdateBugInfo(Resource):
         异步从 PingCode 获取 bug 数据并更新飞书项目中的 bug 信息
         """
         try:
-
-            def update_task(progress_callback=None):
-                feishu_client = FeiShuProjectUtils()
-                return feishu_client.update_bug_info_from_ping_code(progress_callback=progress_callback)
-
-            # 提交异步任务
-            task_id = thread_utils.submit_task(update_task)
+            # 提交异步任务，已有相同任务在执行时复用其 task_id
+            task_id = thread_utils.submit_task(
+                "update_bug_info", dedup_key="update_bug_info", profile=profile_requested()
+            )
 
             return {
                 "code": SUCCESS_CODE,
@@ -181,7 +414,7 @@ class AsyncUpdateBugInfo(Resource):
 @feishu_ns.route("/sprints/<string:sprint_name>/sync-bugs/async")
 @api.param("sprint_name", "Sprint 名称")
 class AsyncUpdateSprintBugs(Resource):
-    @api.doc("async_sync_sprint_bugs_to_pingcode")
+    @api.doc("async_sync_sprint_bugs_to_pingcode", params={"profile": "记录完整 trace（1/0）"})
     @api.response(202, "任务已提交")
     @api.response(400, "请求参数错误", response_model)
     @api.response(500, "服务器内部错误", response_model)
@@ -193,12 +426,13 @@ class AsyncUpdateSprintBugs(Resource):
             if not sprint_name:
                 return {"code": PARAM_ERROR_CODE, "message": "缺少必要参数: sprint_name", "data": {}}, 400
 
-            def sync_task(sprint_name, progress_callback=None):
-                feishu_client = FeiShuProjectUtils()
-                return feishu_client.update_ping_code_sprint_bug(sprint_name, progress_callback=progress_callback)
-
-            # 提交异步任务
-            task_id = thread_utils.submit_task(sync_task, sprint_name)
+            # 提交异步任务，同一 sprint 已有同步任务在执行时复用其 task_id
+            task_id = thread_utils.submit_task(
+                "sync_sprint_bugs",
+                sprint_name,
+                dedup_key=f"sync_sprint_bugs:{sprint_name}",
+                profile=profile_requested(),
+            )
 
             return {
                 "code": SUCCESS_CODE,
@@ -214,6 +448,142 @@ class AsyncUpdateSprintBugs(Resource):
             return handle_exception(e)
 
 
+@feishu_ns.route("/sprints/sync-bugs/async")
+class AsyncUpdateSprintsBugs(Resource):
+    @api.doc("async_sync_sprints_bugs_to_pingcode", params={"profile": "记录完整 trace（1/0）"})
+    @api.expect(sprints_request_model)
+    @api.response(202, "任务已提交")
+    @api.response(400, "请求参数错误", response_model)
+    @api.response(500, "服务器内部错误", response_model)
+    def post(self):
+        """
+        异步批量同步多个 sprint 下的 bug 到 PingCode，所有 sprint 在同一个任务中依次同步并复用客户端连接
+        """
+        try:
+            sprint_names = (request.get_json(silent=True) or {}).get("sprint_names")
+            if not isinstance(sprint_names, list) or not all(isinstance(name, str) and name for name in sprint_names):
+                return {"code": PARAM_ERROR_CODE, "message": "sprint_names 需为非空的 Sprint 名称列表", "data": {}}, 400
+            sprint_names = list(dict.fromkeys(sprint_names))
+            if not sprint_names:
+                return {"code": PARAM_ERROR_CODE, "message": "缺少必要参数: sprint_names", "data": {}}, 400
+
+            # 相同的 sprint 集合已有同步任务在执行时复用其 task_id
+            task_id = thread_utils.submit_task(
+                "sync_sprints_bugs",
+                sprint_names,
+                dedup_key="sync_sprints_bugs:" + ",".join(sorted(sprint_names)),
+                profile=profile_requested(),
+            )
+
+            return {
+                "code": SUCCESS_CODE,
+                "message": "任务已提交",
+                "data": {
+                    "task_id": task_id,
+                    "sprint_names": sprint_names,
+                    "message": f"{len(sprint_names)} 个 Sprint 的Bugs同步任务已提交，请稍后查询任务状态",
+                },
+            }, 202
+
+        except Exception as e:
+            return handle_exception(e)
+
+
+@feishu_ns.route("/sprints")
+class SprintList(Resource):
+    @api.doc("get_sprints", params={"refresh": "是否立即重新拉取（1/0）"})
+    @api.response(200, "查询成功", response_model)
+    @api.response(500, "服务器内部错误", response_model)
+    def get(self):
+        """
+        查询 sprint 注册表：sprint 名称与飞书 sprint id、PingCode 迭代 _id 的对应关系
+        """
+        try:
+            registry = get_sprint_registry()
+            if request.args.get("refresh", "0") in ("1", "true") or registry.refreshed_time is None:
+                registry.refresh()
+
+            return {
+                "code": SUCCESS_CODE,
+                "message": "查询成功",
+                "data": {"refreshed_time": registry.refreshed_time, "sprints": registry.list()},
+            }, 200
+
+        except Exception as e:
+            return handle_exception(e)
+
+
+def extract_webhook_bug_ids(payload):
+    """
+    从 PingCode webhook 事件中提取工作项编号（identifier，如 SYYXX-123），支持单个事件或事件列表
+    事件中项目等对象也带有 identifier 字段，只保留符合工作项编号格式的值
+    """
+    identifiers = jsonpath(payload, "$..identifier") or []
+    identifiers = (i.strip() for i in identifiers if isinstance(i, str))
+    return list(dict.fromkeys(i for i in identifiers if WEBHOOK_BUG_ID_PATTERN.match(i)))
+
+
+@feishu_ns.route("/webhooks/pingcode")
+class PingCodeWebhook(Resource):
+    @api.doc("pingcode_webhook")
+    @api.response(202, "事件已接收")
+    @api.response(200, "事件中没有工作项编号，已忽略", response_model)
+    @api.response(401, "校验令牌错误", response_model)
+    def post(self):
+        """
+        接收 PingCode 工作项变更事件，按编号合并后增量同步对应飞书 bug 的状态和评论
+        """
+        try:
+            if PINGCODE_WEBHOOK_TOKEN:
+                token = request.headers.get("X-Webhook-Token") or request.args.get("token") or ""
+                if not hmac.compare_digest(token, PINGCODE_WEBHOOK_TOKEN):
+                    return {"code": PARAM_ERROR_CODE, "message": "校验令牌错误", "data": {}}, 401
+
+            pc_bug_ids = extract_webhook_bug_ids(request.get_json(silent=True) or {})
+            if not pc_bug_ids:
+                return {"code": SUCCESS_CODE, "message": "事件中没有工作项编号，已忽略", "data": {}}, 200
+
+            for pc_bug_id in pc_bug_ids:
+                webhook_queue.put(pc_bug_id)
+
+            return {
+                "code": SUCCESS_CODE,
+                "message": "事件已接收",
+                "data": {"pc_bug_ids": pc_bug_ids, "queue": webhook_queue.stats()},
+            }, 202
+
+        except Exception as e:
+            return handle_exception(e)
+
+
+@feishu_ns.route("/reconcile/async")
+class AsyncReconcile(Resource):
+    @api.doc("async_reconcile", params={"dry_run": "只计算差异不写入（1/0）", "profile": "记录完整 trace（1/0）"})
+    @api.response(202, "任务已提交")
+    @api.response(500, "服务器内部错误", response_model)
+    def post(self):
+        """
+        异步执行飞书项目与 PingCode 双向对账：状态、评论、链接以 PingCode 为准，迭代以飞书 sprint 为准
+        """
+        try:
+            dry_run = request.args.get("dry_run", "0") in ("1", "true")
+            task_id = thread_utils.submit_task(
+                "reconcile",
+                dry_run=dry_run,
+                dedup_key="reconcile:dry_run" if dry_run else "reconcile",
+                profile=profile_requested(),
+            )
+
+            return {
+                "code": SUCCESS_CODE,
+                "message": "任务已提交",
+                "data": {"task_id": task_id, "dry_run": dry_run, "message": "对账任务已提交，请稍后查询任务状态"},
+            }, 202
+
+        except Exception as e:
+            return handle_exception(e)
+
+
 @feishu_ns.route("/tasks/<string:task_id>")
 @api.param("task_id", "任务ID")
 class TaskStatus(Resource):
@@ -236,6 +606,86 @@ class TaskStatus(Resource):
             return handle_exception(e)
 
 
+# SSE 心跳间隔（秒），防止代理断开空闲连接
+SSE_KEEPALIVE_INTERVAL = 15
+# 任务由其他 worker 执行时，轮询任务存储的间隔（秒）
+SSE_POLL_INTERVAL = 1
+# 任务结束状态
+TASK_FINISHED_STATUSES = ["completed", "failed", "cancelled"]
+
+
+def format_sse(event, data):
+    """格式化 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@feishu_ns.route("/tasks/<string:task_id>/events")
+@api.param("task_id", "任务ID")
+class TaskEvents(Resource):
+    @api.doc("get_task_events")
+    @api.produces(["text/event-stream"])
+    @api.response(200, "任务事件流（SSE）")
+    @api.response(404, "任务不存在", response_model)
+    def get(self, task_id):
+        """
+        以 Server-Sent Events 推送异步任务进度
+        事件类型: progress-进度/状态变化，item-单个 bug 处理结果（success/error），done-任务结束
+        """
+        # 先订阅再取快照，避免订阅前任务结束导致漏掉 done 事件
+        event_queue = thread_utils.subscribe(task_id)
+        task_info = thread_utils.get_task_status(task_id)
+        if task_info is None:
+            thread_utils.unsubscribe(task_id, event_queue)
+            return {"code": ERROR_CODE, "message": "任务不存在", "data": {}}, 404
+
+        def poll_stream():
+            """任务由其他 worker 执行时无法订阅事件，轮询任务存储推送进度"""
+            last_info = task_info
+            idle_seconds = 0
+            while True:
+                time.sleep(SSE_POLL_INTERVAL)
+                info = thread_utils.get_task_status(task_id)
+                if info is None or info["status"] in TASK_FINISHED_STATUSES:
+                    yield format_sse("done", info or last_info)
+                    return
+                if info != last_info:
+                    last_info = info
+                    idle_seconds = 0
+                    yield format_sse("progress", info)
+                    continue
+                idle_seconds += SSE_POLL_INTERVAL
+                if idle_seconds >= SSE_KEEPALIVE_INTERVAL:
+                    idle_seconds = 0
+                    yield ": keep-alive\n\n"
+
+        def event_stream():
+            try:
+                if task_info["status"] in TASK_FINISHED_STATUSES:
+                    yield format_sse("done", task_info)
+                    return
+                yield format_sse("progress", task_info)
+                if not thread_utils.is_local_task(task_id):
+                    yield from poll_stream()
+                    return
+                while True:
+                    try:
+                        event = event_queue.get(timeout=SSE_KEEPALIVE_INTERVAL)
+                    except queue.Empty:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield format_sse(event["event"], event["data"])
+                    if event["event"] == "done":
+                        return
+            finally:
+                thread_utils.unsubscribe(task_id, event_queue)
+
+        return Response(
+            stream_with_context(event_stream()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
 @feishu_ns.route("/tasks/<string:task_id>/result")
 @api.param("task_id", "任务ID")
 class TaskResult(Resource):
@@ -259,6 +709,11 @@ class TaskResult(Resource):
                 return processed_result
             elif task_result["status"] == "failed":
                 return {"code": ERROR_CODE, "message": "任务执行失败", "data": {"error": task_result["error"]}}, 200
+            elif task_result["status"] == "cancelled":
+                # 返回取消前已完成部分的结果
+                processed_result, status_code = process_result(task_result["result"] or {})
+                processed_result["message"] = f"任务已取消，{processed_result['message']}"
+                return processed_result, status_code
             else:
                 return {
                     "code": PARAM_ERROR_CODE,
@@ -270,79 +725,280 @@ class TaskResult(Resource):
             return handle_exception(e)
 
 
+@feishu_ns.route("/tasks/<string:task_id>/profile")
+@api.param("task_id", "任务ID")
+class TaskProfile(Resource):
+    @api.doc("get_task_profile")
+    @api.response(200, "获取任务性能数据成功", response_model)
+    @api.response(404, "任务不存在", response_model)
+    @api.response(400, "任务尚未执行", response_model)
+    def get(self, task_id):
+        """
+        查询异步任务各阶段耗时：phases 为按阶段（PingCode 查询、评论获取、HTML 转换、飞书更新等）汇总的次数和耗时，
+        提交任务时带 profile=1 参数的，spans 中为完整 trace（parent 为上层 span 的 id）
+        """
+        try:
+            if thread_utils.get_task_status(task_id) is None:
+                return {"code": ERROR_CODE, "message": "任务不存在", "data": {}}, 404
+
+            profile = thread_utils.get_task_profile(task_id)
+            if profile is None:
+                return {"code": PARAM_ERROR_CODE, "message": "任务尚未执行，暂无性能数据", "data": {}}, 400
+
+            return {"code": SUCCESS_CODE, "message": "任务性能数据查询成功", "data": profile}, 200
+
+        except Exception as e:
+            return handle_exception(e)
+
+
+@feishu_ns.route("/queues")
+class TaskQueues(Resource):
+    @api.doc("get_task_queues")
+    @api.response(200, "获取队列状态成功", response_model)
+    def get(self):
+        """
+        查询任务队列状态：并发上限、运行中数量、排队深度及等待时长
+        """
+        try:
+            return {"code": SUCCESS_CODE, "message": "队列状态查询成功", "data": thread_utils.get_queue_stats()}, 200
+        except Exception as e:
+            return handle_exception(e)
+
+
+def control_task(task_id, action, action_name):
+    """取消/暂停/恢复任务的统一处理"""
+    try:
+        applied = action(task_id)
+        if applied is None:
+            return {"code": ERROR_CODE, "message": "任务不存在", "data": {}}, 404
+        task_info = thread_utils.get_task_status(task_id)
+        if not applied:
+            return {"code": PARAM_ERROR_CODE, "message": f"任务当前状态无法{action_name}", "data": task_info}, 400
+        return {"code": SUCCESS_CODE, "message": f"已请求{action_name}任务", "data": task_info}, 200
+
+    except Exception as e:
+        return handle_exception(e)
+
+
+@feishu_ns.route("/tasks/<string:task_id>/cancel")
+@api.param("task_id", "任务ID")
+class CancelTask(Resource):
+    @api.doc("cancel_task")
+    @api.response(200, "已请求取消", response_model)
+    @api.response(400, "任务已结束", response_model)
+    @api.response(404, "任务不存在", response_model)
+    def post(self, task_id):
+        """
+        取消异步任务，运行中的任务在处理完当前 bug 后停止并保留已完成部分的结果
+        """
+        return control_task(task_id, thread_utils.cancel_task, "取消")
+
+
+@feishu_ns.route("/tasks/<string:task_id>/pause")
+@api.param("task_id", "任务ID")
+class PauseTask(Resource):
+    @api.doc("pause_task")
+    @api.response(200, "已请求暂停", response_model)
+    @api.response(400, "任务已结束", response_model)
+    @api.response(404, "任务不存在", response_model)
+    def post(self, task_id):
+        """
+        暂停异步任务，运行中的任务在处理完当前 bug 后暂停
+        """
+        return control_task(task_id, thread_utils.pause_task, "暂停")
+
+
+@feishu_ns.route("/tasks/<string:task_id>/resume")
+@api.param("task_id", "任务ID")
+class ResumeTask(Resource):
+    @api.doc("resume_task")
+    @api.response(200, "已恢复", response_model)
+    @api.response(400, "任务已结束", response_model)
+    @api.response(404, "任务不存在", response_model)
+    def post(self, task_id):
+        """
+        恢复已暂停的异步任务
+        """
+        return control_task(task_id, thread_utils.resume_task, "恢复")
+
+
+@feishu_ns.route("/schedules")
+class Schedules(Resource):
+    @api.doc("get_schedules")
+    @api.response(200, "获取定时任务成功", response_model)
+    def get(self):
+        """
+        查询定时任务：执行计划、是否启用、下次运行时间、上次运行的任务/状态/耗时及跳过次数
+        """
+        try:
+            data = {"leader": scheduler.is_leader, "schedules": scheduler.get_schedules()}
+            return {"code": SUCCESS_CODE, "message": "定时任务查询成功", "data": data}, 200
+        except Exception as e:
+            return handle_exception(e)
+
+
+@feishu_ns.route("/schedules/<string:name>/run")
+@api.param("name", "定时任务名称")
+class RunSchedule(Resource):
+    @api.doc("run_schedule")
+    @api.response(202, "任务已提交")
+    @api.response(404, "定时任务不存在", response_model)
+    def post(self, name):
+        """
+        立即运行定时任务（不影响下次运行时间），上次运行尚未结束时返回该任务
+        """
+        try:
+            task_id = scheduler.run_now(name)
+            if task_id is None:
+                return {"code": ERROR_CODE, "message": "定时任务不存在", "data": {}}, 404
+            return {
+                "code": SUCCESS_CODE,
+                "message": "任务已提交",
+                "data": {"task_id": task_id, "message": f"定时任务 '{name}' 已提交，请稍后查询任务状态"},
+            }, 202
+        except Exception as e:
+            return handle_exception(e)
+
+
+def control_schedule(name, enabled, action_name):
+    """暂停/启用定时任务的统一处理"""
+    try:
+        if not scheduler.set_enabled(name, enabled):
+            return {"code": ERROR_CODE, "message": "定时任务不存在", "data": {}}, 404
+        return {"code": SUCCESS_CODE, "message": f"定时任务已{action_name}", "data": {"name": name}}, 200
+    except Exception as e:
+        return handle_exception(e)
+
+
+@feishu_ns.route("/schedules/<string:name>/pause")
+@api.param("name", "定时任务名称")
+class PauseSchedule(Resource):
+    @api.doc("pause_schedule")
+    @api.response(200, "已暂停", response_model)
+    @api.response(404, "定时任务不存在", response_model)
+    def post(self, name):
+        """
+        暂停定时任务（所有 worker 生效），不影响已提交的任务
+        """
+        return control_schedule(name, False, "暂停")
+
+
+@feishu_ns.route("/schedules/<string:name>/resume")
+@api.param("name", "定时任务名称")
+class ResumeSchedule(Resource):
+    @api.doc("resume_schedule")
+    @api.response(200, "已启用", response_model)
+    @api.response(404, "定时任务不存在", response_model)
+    def post(self, name):
+        """
+        重新启用已暂停的定时任务
+        """
+        return control_schedule(name, True, "启用")
+
+
 @device_info_ns.route("/smart-data")
 class SmartData(Resource):
-    @api.doc("get_smart_data")
-    @api.response(200, "获取数据成功")
+    @api.doc(
+        "get_smart_data",
+        params={
+            "nas_ip": "NAS IP地址",
+            "device": "设备，如 /dev/nvme0n1",
+            "start_time": "开始时间（北京时间），如 2025-11-05 00:00:00",
+            "end_time": "结束时间（北京时间），如 2025-11-06 00:00:00",
+            "cursor": "分页游标，取上一页返回的 next_cursor",
+            "limit": "每页条数，默认 100，最大 1000",
+        },
+    )
+    @api.response(200, "获取数据成功", response_model)
+    @api.response(400, "请求参数错误", response_model)
     def get(self):
-        """获取所有SMART数据记录"""
+        """按时间倒序分页获取SMART数据记录"""
         try:
-            # Using pathlib and PROJECT_PATH global variable
             from conf.global_conf import PROJECT_PATH
-            from datetime import datetime, timedelta
+            from utils.nas_utils import DEFAULT_PAGE_SIZE, query_smart_records
 
             db_path = PROJECT_PATH / "data" / "nas_smart.db"
 
             if not db_path.exists():
-                return {"code": ERROR_CODE, "message": f"数据库文件未找到: {db_path}", "data": []}, 404
-
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-
-            # Query all records, ordered by timestamp descending
-            cursor.execute(
-                """
-                SELECT id, nas_ip, device, timestamp, data_units_read_gb, data_units_written_gb 
-                FROM smart_records 
-                ORDER BY timestamp DESC
-                """
-            )
+                return {"code": ERROR_CODE, "message": f"数据库文件未找到: {db_path}", "data": {}}, 404
+
+            args = request.args
+            try:
+                limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+                page = query_smart_records(
+                    db_path,
+                    nas_ip=args.get("nas_ip"),
+                    device=args.get("device"),
+                    start_time=args.get("start_time"),
+                    end_time=args.get("end_time"),
+                    cursor=args.get("cursor"),
+                    limit=limit,
+                )
+            except ValueError as e:
+                return {"code": PARAM_ERROR_CODE, "message": f"请求参数错误: {e}", "data": {}}, 400
+
+            return {"code": SUCCESS_CODE, "message": "数据获取成功", "data": page}, 200
 
-            rows = cursor.fetchall()
-            conn.close()
+        except Exception as e:
+            return handle_exception(e)
 
-            # Convert to dictionary list with formatted timestamps
-            columns = ["id", "nas_ip", "device", "timestamp", "data_units_read_gb", "data_units_written_gb"]
-            smart_data = []
 
-            for row in rows:
-                # Format timestamp to a more readable format with timezone adjustment
-                raw_timestamp = row[3]
-                if raw_timestamp:
-                    try:
-                        # Parse the ISO timestamp and add 8 hours for China timezone
-                        dt = datetime.fromisoformat(raw_timestamp.replace("Z", "+00:00"))
-                        # Add 8 hours for China timezone (UTC+8)
-                        china_time = dt + timedelta(hours=8)
-                        formatted_timestamp = china_time.strftime("%Y-%m-%d %H:%M:%S")
-                    except Exception as e:
-                        formatted_timestamp = raw_timestamp
-                else:
-                    formatted_timestamp = "N/A"
-
-                row_data = list(row)
-                row_data[3] = formatted_timestamp
-                smart_data.append(dict(zip(columns, row_data)))
-
-            return {"code": SUCCESS_CODE, "message": "数据获取成功", "data": smart_data}, 200
+@device_info_ns.route("/smart-series")
+class SmartSeries(Resource):
+    @api.doc(
+        "get_smart_series",
+        params={
+            "nas_ip": "NAS IP地址",
+            "device": "设备，如 /dev/nvme0n1",
+            "start_time": "开始时间（北京时间），如 2025-11-05 00:00:00",
+            "end_time": "结束时间（北京时间），如 2025-11-06 00:00:00",
+            "resolution": "粒度: auto（默认，按时间范围选择）/raw/hour/day",
+        },
+    )
+    @api.response(200, "获取数据成功", response_model)
+    @api.response(400, "请求参数错误", response_model)
+    def get(self):
+        """获取读写量时间序列（按时间范围自动降采样为小时/天汇总）"""
+        try:
+            from conf.global_conf import PROJECT_PATH
+            from utils.nas_utils import query_smart_series
+
+            db_path = PROJECT_PATH / "data" / "nas_smart.db"
+
+            if not db_path.exists():
+                return {"code": ERROR_CODE, "message": f"数据库文件未找到: {db_path}", "data": {}}, 404
+
+            args = request.args
+            try:
+                series = query_smart_series(
+                    db_path,
+                    nas_ip=args.get("nas_ip"),
+                    device=args.get("device"),
+                    start_time=args.get("start_time"),
+                    end_time=args.get("end_time"),
+                    resolution=args.get("resolution", "auto"),
+                )
+            except ValueError as e:
+                return {"code": PARAM_ERROR_CODE, "message": f"请求参数错误: {e}", "data": {}}, 400
+
+            return {"code": SUCCESS_CODE, "message": "数据获取成功", "data": series}, 200
 
         except Exception as e:
             return handle_exception(e)
 
 
-
 @device_info_ns.route("/fetch-smart")
 class FetchSmart(Resource):
     @api.doc("fetch_smart_data")
     @api.expect(smart_request_model)
-    @api.response(200, "获取成功", response_model)
+    @api.response(202, "任务已提交")
     @api.response(400, "请求参数错误", response_model)
     @api.response(500, "服务器内部错误", response_model)
     def post(self):
-        """获取NAS SMART信息并存储到数据库"""
+        """异步获取NAS SMART信息并存储到数据库，结果通过任务接口查询"""
         try:
             # 获取请求数据
-            data = api.payload
+            data = api.payload or {}
             nas_ip = data.get("nas_ip")
             nas_user = data.get("nas_user")
             nas_password = data.get("nas_password")
@@ -351,19 +1007,58 @@ class FetchSmart(Resource):
             if not nas_ip or not nas_user:
                 return {"code": PARAM_ERROR_CODE, "message": "缺少必要参数: nas_ip 或 nas_user", "data": {}}, 400
 
-            # 调用获取和存储SMART信息的函数
-            from utils.nas_utils import fetch_and_store_smart_json
+            # 提交到 device_probe 队列，同一台 NAS 已有采集任务在执行时复用其 task_id
+            host = {"nas_ip": nas_ip, "nas_user": nas_user, "nas_password": nas_password}
+            task_id = submit_smart_task([host], max_workers=1, dedup_key=f"fetch_smart:{nas_ip}")
 
-            record_id = fetch_and_store_smart_json(nas_ip, nas_user, nas_password)
+            return {
+                "code": SUCCESS_CODE,
+                "message": "任务已提交",
+                "data": {
+                    "task_id": task_id,
+                    "nas_ip": nas_ip,
+                    "message": f"NAS {nas_ip} 的SMART采集任务已提交，请稍后查询任务状态",
+                },
+            }, 202
 
-            if record_id:
-                return {
-                    "code": SUCCESS_CODE,
-                    "message": "成功获取并存储SMART信息",
-                    "data": {"record_id": record_id},
-                }, 200
-            else:
-                return {"code": ERROR_CODE, "message": "获取SMART信息失败", "data": {}}, 200
+        except Exception as e:
+            return handle_exception(e)
+
+
+@device_info_ns.route("/fetch-smart/batch")
+class FetchSmartBatch(Resource):
+    @api.doc("fetch_smart_data_batch")
+    @api.expect(smart_batch_request_model)
+    @api.response(202, "任务已提交")
+    @api.response(400, "请求参数错误", response_model)
+    @api.response(500, "服务器内部错误", response_model)
+    def post(self):
+        """异步并发采集多台 NAS 的 SMART 信息并存储到数据库，结果通过任务接口查询"""
+        try:
+            from utils.nas_utils import load_nas_inventory
+
+            data = api.payload or {}
+            hosts = data.get("hosts")
+            if hosts is not None and (not isinstance(hosts, list) or any(not isinstance(h, dict) for h in hosts)):
+                return {"code": PARAM_ERROR_CODE, "message": "hosts 需为 NAS 信息对象列表", "data": {}}, 400
+            if hosts is not None and any(not host.get("nas_ip") for host in hosts):
+                return {"code": PARAM_ERROR_CODE, "message": "缺少必要参数: nas_ip", "data": {}}, 400
+            if not (load_nas_inventory() if hosts is None else hosts):
+                return {"code": PARAM_ERROR_CODE, "message": "NAS 列表为空，请传入 hosts 或配置 NAS 清单", "data": {}}, 400
+
+            # 采集 NAS 清单时去重，避免重复点击同时启动多轮采集
+            task_id = submit_smart_task(
+                hosts,
+                max_workers=data.get("max_workers"),
+                timeout=data.get("timeout"),
+                dedup_key="fetch_smart:inventory" if hosts is None else None,
+            )
+
+            return {
+                "code": SUCCESS_CODE,
+                "message": "任务已提交",
+                "data": {"task_id": task_id, "message": "SMART批量采集任务已提交，请稍后查询任务状态"},
+            }, 202
 
         except Exception as e:
             return handle_exception(e)
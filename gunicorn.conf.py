@@ -0,0 +1,43 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/19 14:20
+# @Author : Xumh
+# gunicorn 配置：多进程 + 线程 worker，所有 worker 共享 data/tasks.db 中的任务状态
+# 启动：gunicorn -c gunicorn.conf.py wsgi:app
+import os
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', 5432)}")
+# gthread：每个 worker 多线程处理请求，SSE 长连接只占用一个线程
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_WORKERS", 2))
+threads = int(os.environ.get("WEB_THREADS", 16))
+# 同步接口会串行调用 PingCode/飞书接口，耗时较长
+timeout = int(os.environ.get("WEB_TIMEOUT", 300))
+# 关闭 worker 时等待当前条目处理完成的时间，超时后未完成任务由其他 worker 接管
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+# 不预加载应用：任务线程需在各 worker 进程内创建
+preload_app = False
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """master 启动时清空上次运行的请求统计文件，/metrics 汇总各 worker 的统计，计数从 0 开始"""
+    from utils.request_metrics import clear_request_metrics
+
+    clear_request_metrics()
+
+
+def post_worker_init(worker):
+    """worker 启动后开始心跳并接管已退出 worker 遗留的任务，启动定时调度（各 worker 通过租约选出一个触发任务）"""
+    from wsgi import start_background_services
+
+    start_background_services()
+
+
+def worker_exit(server, worker):
+    """worker 退出时释放调度租约，中断未完成任务并保留断点，由其他 worker 继续执行"""
+    from wsgi import stop_background_services
+
+    stop_background_services()
@@ -1,6 +1,7 @@
 import requests
 import json
 import time
+from urllib.parse import urlsplit
 from urllib3.exceptions import InsecureRequestWarning
 from bs4 import BeautifulSoup
 
@@ -20,9 +21,19 @@ from conf.yunxiao_web_conf import (
     PROJECT_ID,
     CREATE_BUG_URL,
 )
+from utils.profiling import collect_trace, span, traced
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
+# 云效网页接口地址，评论接口与创建缺陷接口在同一域名下
+YUNXIAO_WEB_URL = "{0.scheme}://{0.netloc}".format(urlsplit(CREATE_BUG_URL))
+# 创建缺陷后等待云效同步数据的时间（秒）
+BUG_SYNC_WAIT = 5
+# 两条评论之间的间隔（秒）
+COMMENT_INTERVAL = 1
+# 完整 trace（各阶段 span 明细）的输出文件，为空时只打印分阶段耗时汇总
+PROFILE_OUTPUT = ""
+
 
 # -------------------------- 工具函数 --------------------------
 def get_csrf_token_from_cookie():
@@ -41,6 +52,7 @@ def get_csrf_token_from_cookie():
                 return None
 
 
+@traced("html.convert")
 def build_bug_description(html_str):
     if html_str.startswith("p>"):
         html_str = "<" + html_str
@@ -129,6 +141,7 @@ def parse_comments(comments_list):
 
 
 # -------------------------- 创建Bug函数 --------------------------
+@traced("yunxiao.create")
 def create_single_bug(bug_dict, max_retry=2):
     bug_title = bug_dict.get("title", "")
     if not bug_title:
@@ -259,6 +272,7 @@ def create_single_bug(bug_dict, max_retry=2):
                 return None
 
 
+@traced("yunxiao.comment")
 def create_single_comment(bug_identifier, comment_text="", comment_user_id=USER_ID, max_retry=3, retry_delay=3):
     if not bug_identifier or not comment_text:
         print(f"❌ 跳过添加评论（ID/内容为空）")
@@ -269,7 +283,7 @@ def create_single_comment(bug_identifier, comment_text="", comment_user_id=USER_
         print(f"❌ 缺少CSRF Token")
         return False
     COMMENT_URL = (
-        f"https://devops.aliyun.com/projex/api/workitem/workitem/{bug_identifier}/comment?_input_charset=utf-8"
+        f"{YUNXIAO_WEB_URL}/projex/api/workitem/workitem/{bug_identifier}/comment?_input_charset=utf-8"
     )
     comment_data = {
         "content": json.dumps(comment_content, ensure_ascii=False),
@@ -342,8 +356,9 @@ def batch_create_bugs(bugs_list, retry_tag="首次"):
             continue
 
         success_count += 1
-        print(f"[{idx}/{total_count}] ⏳ 等待5秒（同步云效数据）...")
-        time.sleep(5)
+        print(f"[{idx}/{total_count}] ⏳ 等待{BUG_SYNC_WAIT}秒（同步云效数据）...")
+        with span("throttle"):
+            time.sleep(BUG_SYNC_WAIT)
 
         comments_list = bug_dict.get("comments", [])
         parsed_comments = parse_comments(comments_list)
@@ -354,7 +369,8 @@ def batch_create_bugs(bugs_list, retry_tag="首次"):
                 print(f"[{idx}/{total_count}] 评论{comment_idx} 原始内容：{comment_content}")
                 # 直接传入原始内容，评论人ID用默认（或你想匹配的话也可以，但内容绝对不修改）
                 create_single_comment(bug_identifier, comment_content, USER_ID)
-                time.sleep(1)
+                with span("throttle"):
+                    time.sleep(COMMENT_INTERVAL)
         else:
             print(f"[{idx}/{total_count}] 📝 无评论")
 
@@ -369,8 +385,20 @@ def batch_create_bugs(bugs_list, retry_tag="首次"):
     return success_count, fail_list
 
 
-# -------------------------- 执行入口 --------------------------
-if __name__ == "__main__":
+def print_profile(tracer):
+    """打印分阶段耗时汇总，配置了 PROFILE_OUTPUT 时写入完整 trace"""
+    profile = tracer.summary()
+    print(f"\n⏱ 分阶段耗时（总耗时 {profile['total_ms'] / 1000:.1f}s）：")
+    for name, phase in profile["phases"].items():
+        print(f"   {name}: {phase['count']}次，共{phase['total_ms'] / 1000:.2f}s，平均{phase['avg_ms']:.0f}ms")
+    if PROFILE_OUTPUT:
+        with open(PROFILE_OUTPUT, "w", encoding="utf-8") as f:
+            json.dump(tracer.dump(), f, ensure_ascii=False, indent=2)
+        print(f"   完整 trace 已写入：{PROFILE_OUTPUT}")
+
+
+def main():
+    """从 PingCode 获取 Bug 数据并批量创建到云效，失败的 Bug 重试一次"""
     if PROJECT_ID == "替换为你的云效项目ID" or not COOKIE:
         print("❌ 请填写PROJECT_ID和Cookie")
         exit()
@@ -474,3 +502,11 @@ if __name__ == "__main__":
         print("❌ 缺少PingCodeClient模块，请确保utils/ping_code_utils.py存在且可导入")
     except Exception as e:
         print(f"❌ 执行异常：{str(e)}")
+
+
+# -------------------------- 执行入口 --------------------------
+if __name__ == "__main__":
+    # 统计各阶段耗时（PingCode 查询、HTML 转换、云效创建、评论、等待）
+    with collect_trace(keep_spans=bool(PROFILE_OUTPUT)) as tracer:
+        main()
+    print_profile(tracer)
@@ -0,0 +1,76 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/22 17:30
+# @Author : Xumh
+import threading
+import time
+import unittest
+
+from utils.coalescing_queue import CoalescingQueue
+
+
+class CoalescingQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.flushed = threading.Event()
+
+    def flush_func(self, batch):
+        self.batches.append(dict(batch))
+        self.flushed.set()
+
+    def make_queue(self, window=0.2, **kwargs):
+        coalescing_queue = CoalescingQueue(self.flush_func, window=window, **kwargs)
+        self.addCleanup(coalescing_queue.stop)
+        return coalescing_queue
+
+    def flushed_keys(self):
+        return [key for batch in self.batches for key in batch]
+
+    def test_repeated_key_within_window_fires_once(self):
+        coalescing_queue = self.make_queue()
+        self.assertTrue(coalescing_queue.put("bug-1", 1))
+        self.assertFalse(coalescing_queue.put("bug-1", 2))
+        self.assertFalse(coalescing_queue.put("bug-1", 3))
+
+        self.assertTrue(self.flushed.wait(5))
+        time.sleep(0.3)
+        self.assertEqual(self.batches, [{"bug-1": 3}])
+        self.assertEqual(coalescing_queue.stats()["submitted_count"], 3)
+        self.assertEqual(coalescing_queue.stats()["flushed_count"], 1)
+
+    def test_different_keys_fire_independently(self):
+        coalescing_queue = self.make_queue()
+        coalescing_queue.put("bug-1", 1)
+        coalescing_queue.put("bug-2", 2)
+        coalescing_queue.put("bug-1", 3)
+
+        deadline = time.monotonic() + 5
+        while len(self.flushed_keys()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.3)
+        self.assertEqual(sorted(self.flushed_keys()), ["bug-1", "bug-2"])
+        flushed_values = {key: value for batch in self.batches for key, value in batch.items()}
+        self.assertEqual(flushed_values, {"bug-1": 3, "bug-2": 2})
+
+    def test_key_fires_again_after_window(self):
+        coalescing_queue = self.make_queue(window=0.1)
+        coalescing_queue.put("bug-1", 1)
+        self.assertTrue(self.flushed.wait(5))
+        self.flushed.clear()
+        coalescing_queue.put("bug-1", 2)
+        self.assertTrue(self.flushed.wait(5))
+        self.assertEqual(self.batches, [{"bug-1": 1}, {"bug-1": 2}])
+
+    def test_merge_func_and_stop_flush(self):
+        coalescing_queue = self.make_queue(window=60, merge_func=lambda old, new: old + new)
+        coalescing_queue.put("bug-1", [1])
+        coalescing_queue.put("bug-1", [2])
+        coalescing_queue.put("bug-2", [3])
+        self.assertEqual(self.batches, [])
+
+        coalescing_queue.stop(flush=True)
+        self.assertEqual(self.batches, [{"bug-1": [1, 2], "bug-2": [3]}])
+        self.assertEqual(coalescing_queue.pending_count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/21 15:00
+# @Author : Xumh
+import unittest
+from unittest import mock
+
+from benchmarks.fake_servers import FakeServices
+from benchmarks.sync_benchmark import SPRINT_NAME, generate_project
+from utils import write_buffer
+from utils.sprint_registry import get_sprint_registry
+from utils.thread_utils import TaskCancelledError
+
+
+class ResumeFromCheckpointTest(unittest.TestCase):
+    """恢复时飞书 bug 列表顺序变化，断点按已处理的工作项 id 过滤，不漏处理也不重复处理"""
+
+    def setUp(self):
+        self.services = FakeServices(seed=1).start()
+        self.services.patch_conf()
+        generate_project(
+            self.services.store, self.services.pingcode.url, bugs=20, comments=1, images=0, attachments=0,
+            in_sprint_ratio=0.0, stale_ratio=1.0, seed=1,
+        )
+        get_sprint_registry().invalidate()
+        # 缩短写缓冲合并窗口，处理过程中即有更新完成，断点能够推进
+        buffer = write_buffer.WorkItemWriteBuffer(window=0.01)
+        patcher = mock.patch.object(write_buffer, "_write_buffer", buffer)
+        patcher.start()
+        self.addCleanup(buffer.stop)
+        self.addCleanup(patcher.stop)
+        from utils.feishu_project_utils import FeiShuProjectUtils
+
+        self.client = FeiShuProjectUtils()
+
+    def tearDown(self):
+        self.services.stop()
+
+    def reverse_feishu_items(self):
+        store = self.services.store
+        with store.lock:
+            store.feishu_work_items = dict(reversed(list(store.feishu_work_items.items())))
+
+    @staticmethod
+    def interrupting_callback(after, checkpoint):
+        """处理 after 个 bug 后抛出取消，checkpoint 中保存最近一次上报的断点"""
+
+        def progress_callback(percentage=0, current=None, total=None, message="", result=None):
+            if result is None:
+                return
+            checkpoint.update(index=current, result=result)
+            if current >= after:
+                raise TaskCancelledError("cancel")
+
+        return progress_callback
+
+    def test_sprint_sync_resumes_by_work_item_id(self):
+        checkpoint = {}
+        with self.assertRaises(TaskCancelledError):
+            self.client.update_ping_code_sprint_bug(
+                SPRINT_NAME, progress_callback=self.interrupting_callback(5, checkpoint)
+            )
+        self.assertEqual(len(checkpoint["result"]["processed_ids"]), 5)
+
+        self.reverse_feishu_items()
+        result = self.client.update_ping_code_sprint_bug(SPRINT_NAME, checkpoint=checkpoint)
+
+        moved = [next(iter(item)) for item in result["success"]]
+        self.assertEqual(len(moved), 20)
+        self.assertEqual(len(set(moved)), 20)
+        self.assertEqual(result["skipped"], [])
+        self.assertNotIn("processed_ids", result)
+
+    def test_bug_info_resumes_by_work_item_id(self):
+        checkpoint = {}
+        with self.assertRaises(TaskCancelledError):
+            self.client.update_bug_info_from_ping_code(progress_callback=self.interrupting_callback(5, checkpoint))
+        processed = len(checkpoint["result"]["processed_ids"])
+        self.assertGreaterEqual(processed, 5)
+
+        self.reverse_feishu_items()
+        result = self.client.update_bug_info_from_ping_code(checkpoint=checkpoint)
+        self.assertEqual(result["error"], [])
+        self.assertNotIn("processed_ids", result)
+
+        # 恢复后没有遗漏：再全量同步一次不应再有需要更新的 bug
+        result = self.client.update_bug_info_from_ping_code()
+        self.assertEqual(result["success"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
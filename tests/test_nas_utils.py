@@ -0,0 +1,132 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/21 10:00
+# @Author : Xumh
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from utils import nas_utils
+
+
+class QuerySmartRecordsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp_dir.name) / "nas_smart.db"
+        nas_utils.init_db(self.db_path)
+
+    def tearDown(self):
+        nas_utils.smart_db(self.db_path).close()
+        self.tmp_dir.cleanup()
+
+    def save(self, timestamp):
+        smart_dict = {"smart_status": {"passed": True}}
+        return nas_utils.save_smart_records(self.db_path, [("10.0.0.1", "/dev/sda", smart_dict, timestamp)], "full")[0]
+
+    def query_all(self, limit):
+        ids, cursor = [], None
+        while True:
+            page = nas_utils.query_smart_records(self.db_path, cursor=cursor, limit=limit)
+            ids.extend(item["id"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                return ids, page
+
+    def test_same_second_rows_across_page_boundary(self):
+        # 同一秒内的两条记录，按秒级展示时间排序时顺序与按原始时间相反
+        newest = self.save("2026-01-01T10:00:00.500000Z")
+        second = self.save("2026-01-01T10:00:00.200000Z")
+        oldest = self.save("2026-01-01T09:00:00.000000Z")
+
+        ids, _ = self.query_all(limit=1)
+        self.assertEqual(ids, [newest, second, oldest])
+
+    def test_timestamp_formatted_for_display(self):
+        self.save("2026-01-01T10:00:00.500000Z")
+
+        page = nas_utils.query_smart_records(self.db_path)
+        self.assertEqual(page["items"][0]["timestamp"], "2026-01-01 18:00:00")
+
+    def test_order_uses_index(self):
+        plan = nas_utils.smart_db(self.db_path).execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM smart_records ORDER BY timestamp DESC, id DESC LIMIT 10"
+        ).fetchall()
+        self.assertFalse(any("TEMP B-TREE" in row["detail"] for row in plan))
+
+
+class FetchNasSmartTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp_dir.name) / "nas_smart.db"
+        nas_utils.init_db(self.db_path)
+        nas_utils.save_cached_device(self.db_path, "10.0.0.1", "/dev/sda")
+
+    def tearDown(self):
+        nas_utils.smart_db(self.db_path).close()
+        self.tmp_dir.cleanup()
+
+    def fetch(self, cached_error):
+        calls = []
+        clock = [100.0]
+
+        def run_smart_script(nas_ip, nas_user, nas_password=None, timeout=60, device=None):
+            calls.append((device, timeout))
+            if device:
+                # 缓存设备的采集耗尽分配的超时
+                clock[0] += timeout
+                raise cached_error
+            return "/dev/sdb", {"device": {"name": "/dev/sdb"}}
+
+        with mock.patch.object(nas_utils, "run_smart_script", side_effect=run_smart_script), \
+                mock.patch.object(nas_utils.time, "monotonic", side_effect=lambda: clock[0]):
+            result = nas_utils.fetch_nas_smart("10.0.0.1", "admin", timeout=10, db_path=self.db_path)
+        return result, calls
+
+    def test_cached_attempt_shares_deadline(self):
+        _, calls = self.fetch(nas_utils.NasSmartError("超时"))
+        (cached_device, cached_timeout), (detect_device, detect_timeout) = calls
+        self.assertEqual(cached_device, "/dev/sda")
+        self.assertLessEqual(cached_timeout, 10 * nas_utils.CACHED_DEVICE_TIMEOUT_SHARE)
+        self.assertIsNone(detect_device)
+        self.assertLessEqual(cached_timeout + detect_timeout, 10)
+
+    def test_transport_error_keeps_cache(self):
+        with mock.patch.object(nas_utils, "invalidate_cached_device") as invalidate:
+            self.fetch(nas_utils.NasSmartError("SSH 连接失败"))
+        invalidate.assert_not_called()
+
+    def test_invalid_device_invalidates_cache(self):
+        with mock.patch.object(nas_utils, "invalidate_cached_device") as invalidate:
+            (device, _), _ = self.fetch(nas_utils.NasSmartError("smartctl 执行失败", device_invalid=True))
+        invalidate.assert_called_once_with(self.db_path, "10.0.0.1")
+        self.assertEqual(device, "/dev/sdb")
+
+
+class CollectFleetSmartTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp_dir.name) / "nas_smart.db"
+        nas_utils.init_db(self.db_path)
+
+    def tearDown(self):
+        nas_utils.smart_db(self.db_path).close()
+        self.tmp_dir.cleanup()
+
+    def test_missing_or_empty_user_defaults_to_root(self):
+        hosts = [
+            {"nas_ip": "10.0.0.1"},
+            {"nas_ip": "10.0.0.2", "nas_user": None},
+            {"nas_ip": "10.0.0.3", "nas_user": ""},
+            {"nas_ip": "10.0.0.4", "nas_user": "admin"},
+        ]
+        with mock.patch.object(
+            nas_utils, "fetch_nas_smart", return_value=("/dev/sda", {"smart_status": {"passed": True}})
+        ) as fetch_nas_smart:
+            result = nas_utils.collect_fleet_smart(hosts, max_workers=1, db_path=self.db_path)
+        users = {call.args[0]: call.args[1] for call in fetch_nas_smart.call_args_list}
+        self.assertEqual(users, {"10.0.0.1": "root", "10.0.0.2": "root", "10.0.0.3": "root", "10.0.0.4": "admin"})
+        self.assertEqual(len(result["success"]), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/22 14:10
+# @Author : Xumh
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.fake_servers import FakeServices
+from benchmarks.sync_benchmark import generate_project
+from utils.sprint_registry import get_sprint_registry
+
+
+class StubPingCodeClient:
+    """只提供 compute_diff 用到的方法"""
+
+    @staticmethod
+    def get_bug_url(short_id):
+        return f"https://pingcode.example/bugs/{short_id}"
+
+    @staticmethod
+    def format_comment_data(comment_data, old_comment_data=""):
+        return []
+
+
+def fs_row(status="处理中", url="https://pingcode.example/bugs/1", sprint_id="fs-sprint-2"):
+    return {
+        "work_item_id": "1001",
+        "name": "bug",
+        "pc_bug_id": "SYYXX-1",
+        "status": status,
+        "comments": "",
+        "url": url,
+        "sprint_id": sprint_id,
+        "snapshot_time": "2026-10-22T10:00:00",
+    }
+
+
+def pc_row(status="已修复", sprint_id="pc-sprint-1"):
+    return {
+        "pc_bug_id": "SYYXX-1",
+        "item_id": "pc-item-1",
+        "short_id": "1",
+        "status": status,
+        "sprint_id": sprint_id,
+        "updated_at": "1",
+        "comments_json": None,
+        "snapshot_time": "2026-10-22T10:00:00",
+    }
+
+
+SPRINT_MAP = {"fs-sprint-1": "pc-sprint-1", "fs-sprint-2": "pc-sprint-2"}
+
+
+class ReconcilerTest(unittest.TestCase):
+    def setUp(self):
+        self.services = FakeServices(seed=1).start()
+        self.addCleanup(self.services.stop)
+        self.services.patch_conf()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = Path(self.tmp_dir.name) / "reconcile.db"
+        from utils import reconcile_utils
+
+        self.reconcile_utils = reconcile_utils
+
+    def make_reconciler(self, field_owners=None):
+        return self.reconcile_utils.Reconciler(
+            feishu_client=object(), pcc=StubPingCodeClient(), db_path=self.db_path, field_owners=field_owners
+        )
+
+    def test_direction_and_winner_follow_field_owners(self):
+        reconciler = self.make_reconciler()
+        prev_fs = {"1001": fs_row(status="待处理", sprint_id="fs-sprint-1")}
+        prev_pc = {"SYYXX-1": pc_row(status="待处理", sprint_id="pc-sprint-0")}
+        diff = reconciler.compute_diff({"1001": fs_row()}, {"SYYXX-1": pc_row()}, prev_fs, prev_pc, SPRINT_MAP)
+
+        self.assertEqual(len(diff["feishu"]), 1)
+        self.assertEqual(diff["feishu"][0]["fields"], ["status"])
+        self.assertEqual(
+            diff["feishu"][0]["update_fields"],
+            [{"field_key": self.reconcile_utils.FEISHU_FIELD_KEYS["status"], "field_value": "已修复"}],
+        )
+        self.assertEqual(diff["feishu"][0]["snapshot"], {"status": "已修复"})
+        self.assertEqual(len(diff["pingcode"]), 1)
+        self.assertEqual(diff["pingcode"][0]["request_data"], {"sprint_id": "pc-sprint-2"})
+        self.assertEqual(
+            diff["conflicts"],
+            [
+                {"pc_bug_id": "SYYXX-1", "field": "status", "winner": "pingcode"},
+                {"pc_bug_id": "SYYXX-1", "field": "sprint", "winner": "feishu"},
+            ],
+        )
+
+    def test_fields_missing_from_owners_are_not_synced(self):
+        reconciler = self.make_reconciler(field_owners={"url": "pingcode"})
+        diff = reconciler.compute_diff({"1001": fs_row(url="")}, {"SYYXX-1": pc_row()}, {}, {}, SPRINT_MAP)
+        self.assertEqual(diff["pingcode"], [])
+        self.assertEqual(diff["feishu"][0]["fields"], ["url"])
+
+    def test_unsupported_owner_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.make_reconciler(field_owners={"status": "feishu"})
+        with self.assertRaises(ValueError):
+            self.make_reconciler(field_owners={"sprint": "yunxiao"})
+
+    def test_empty_snapshot_clears_previous_rows(self):
+        reconciler = self.make_reconciler()
+        reconciler._save_snapshot("feishu_bugs", {"1001": fs_row()})
+        self.assertEqual(list(reconciler._load_snapshot("feishu_bugs", "work_item_id")), ["1001"])
+        reconciler._save_snapshot("feishu_bugs", {})
+        self.assertEqual(reconciler._load_snapshot("feishu_bugs", "work_item_id"), {})
+
+    def test_second_run_has_no_diff(self):
+        generate_project(
+            self.services.store, self.services.pingcode.url, bugs=10, comments=1, images=0, attachments=0,
+            in_sprint_ratio=0.5, stale_ratio=1.0, seed=1,
+        )
+        get_sprint_registry().invalidate()
+        reconciler = self.reconcile_utils.Reconciler(db_path=self.db_path)
+        result = reconciler.run()
+        self.assertEqual(result["error"], [])
+        self.assertTrue(result["success"])
+
+        result = reconciler.run()
+        self.assertEqual(result["success"], [])
+        self.assertEqual(result["diff"], {field: 0 for field in self.reconcile_utils.FIELD_OWNERS})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/22 16:20
+# @Author : Xumh
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+from utils.scheduler import CronExpression, Scheduler
+from utils.task_store import MemoryTaskStore
+from utils.thread_utils import ThreadUtils
+
+
+class CronExpressionTest(unittest.TestCase):
+    def test_parse_fields(self):
+        cron = CronExpression("*/15 8-10,20 1 * 1-5")
+        self.assertEqual(cron.minutes, {0, 15, 30, 45})
+        self.assertEqual(cron.hours, {8, 9, 10, 20})
+        self.assertEqual(cron.days, {1})
+        self.assertEqual(cron.months, set(range(1, 13)))
+        self.assertEqual(cron.weekdays, {1, 2, 3, 4, 5})
+        self.assertTrue(cron.any_day is False and cron.any_weekday is False)
+
+    def test_parse_step_from_start_and_sunday_alias(self):
+        cron = CronExpression("5/20 0-12/6 * 1,6-7 7")
+        self.assertEqual(cron.minutes, {5, 25, 45})
+        self.assertEqual(cron.hours, {0, 6, 12})
+        self.assertEqual(cron.months, {1, 6, 7})
+        self.assertEqual(cron.weekdays, {0})
+
+    def test_invalid_expressions(self):
+        for expr in ["* * * *", "60 * * * *", "5-1 * * * *", "*/0 * * * *", "* * 0 * *", "a * * * *"]:
+            with self.subTest(expr=expr), self.assertRaises(ValueError):
+                CronExpression(expr)
+
+    def test_next_time_crosses_month_and_year(self):
+        self.assertEqual(
+            CronExpression("0 9 1 * *").next_time(datetime(2026, 1, 31, 10, 0)), datetime(2026, 2, 1, 9, 0)
+        )
+        self.assertEqual(
+            CronExpression("0 0 1 1 *").next_time(datetime(2026, 12, 31, 23, 59, 30)), datetime(2027, 1, 1, 0, 0)
+        )
+        self.assertEqual(CronExpression("0 0 29 2 *").next_time(datetime(2026, 3, 1)), datetime(2028, 2, 29, 0, 0))
+
+    def test_next_time_crosses_weekday(self):
+        # 2026-10-23 为周五，下一个周一为 10-26
+        self.assertEqual(
+            CronExpression("30 8 * * 1").next_time(datetime(2026, 10, 23, 12, 0)), datetime(2026, 10, 26, 8, 30)
+        )
+        # 触发时间本身不包含在内
+        self.assertEqual(
+            CronExpression("30 8 * * 1").next_time(datetime(2026, 10, 26, 8, 30)), datetime(2026, 11, 2, 8, 30)
+        )
+
+    def test_day_and_weekday_either_matches(self):
+        cron = CronExpression("0 0 13 * 5")
+        # 周五（10-23、10-30）或 13 日（11-13 同为周五）
+        self.assertEqual(cron.next_time(datetime(2026, 10, 19, 12, 0)), datetime(2026, 10, 23))
+        self.assertEqual(cron.next_time(datetime(2026, 10, 24)), datetime(2026, 10, 30))
+        self.assertEqual(CronExpression("0 0 13 * *").next_time(datetime(2026, 10, 14)), datetime(2026, 11, 13))
+
+
+class SchedulerLeaseTest(unittest.TestCase):
+    """多个实例共享任务存储，只有持有租约的实例触发定时任务"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.task_store = MemoryTaskStore()
+        self.calls = []
+        self.calls_lock = threading.Lock()
+        self.now = datetime(2026, 10, 22, 9, 0)
+
+    def sync_task(self):
+        with self.calls_lock:
+            self.calls.append(1)
+        return {}
+
+    def make_scheduler(self):
+        thread_utils = ThreadUtils(
+            task_store=self.task_store, result_dir=self.tmp_dir.name, profile_dir=self.tmp_dir.name
+        )
+        thread_utils.register_task("sync", self.sync_task)
+        self.addCleanup(thread_utils.shutdown)
+        return Scheduler(
+            thread_utils, schedules=[{"name": "sync", "kind": "sync", "interval": 60}], tick_interval=60
+        )
+
+    def test_only_leader_runs_job(self):
+        schedulers = [self.make_scheduler() for _ in range(2)]
+        barrier = threading.Barrier(len(schedulers))
+        submitted = {scheduler.owner: [] for scheduler in schedulers}
+
+        def tick(scheduler, now):
+            barrier.wait()
+            submitted[scheduler.owner] += scheduler.tick(now)
+
+        # 第一次检查只计算下次运行时间，到期后的第二次检查提交任务
+        for now in (self.now, self.now + timedelta(seconds=61)):
+            threads = [threading.Thread(target=tick, args=(scheduler, now)) for scheduler in schedulers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        leaders = [scheduler for scheduler in schedulers if scheduler.is_leader]
+        self.assertEqual(len(leaders), 1)
+        self.assertEqual(sorted(len(task_ids) for task_ids in submitted.values()), [0, 1])
+        self.assertEqual(len(submitted[leaders[0].owner]), 1)
+        for scheduler in schedulers:
+            scheduler.thread_utils.shutdown()
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.task_store.get_schedules()["sync"]["state"]["run_count"], 1)
+
+    def test_follower_takes_over_after_release_or_expiry(self):
+        leader, follower = self.make_scheduler(), self.make_scheduler()
+        self.assertTrue(leader._acquire_leadership(self.now))
+        self.assertFalse(follower._acquire_leadership(self.now))
+
+        # 租约过期前主实例未续期，其他实例仍不能接管
+        before_expiry = self.now + timedelta(seconds=leader.lease_ttl - 1)
+        self.assertFalse(follower._acquire_leadership(before_expiry))
+        after_expiry = self.now + timedelta(seconds=leader.lease_ttl + 1)
+        self.assertTrue(follower._acquire_leadership(after_expiry))
+        self.assertFalse(leader._acquire_leadership(after_expiry))
+
+        # 主实例退出时释放租约，其他实例立即接管
+        follower.stop()
+        self.assertTrue(leader._acquire_leadership(after_expiry))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/22 10:30
+# @Author : Xumh
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from utils.task_store import MemoryTaskStore, SqliteTaskStore
+from utils.thread_utils import ThreadUtils
+
+
+def make_record(task_id, owner, dedup_key="sync:sprint", status="pending"):
+    return {"task_id": task_id, "dedup_key": dedup_key, "status": status, "owner": owner}
+
+
+class InsertDedupTest(unittest.TestCase):
+    """去重键在任务存储中原子认领，并发提交时只有一个任务写入"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = Path(self.tmp_dir.name) / "tasks.db"
+        self.now = datetime.now()
+        self.live_since = (self.now - timedelta(seconds=30)).isoformat()
+
+    def concurrent_insert(self, stores):
+        """每个存储（模拟一个进程）同时提交相同去重键的任务，返回 {task_id: insert_dedup 返回值}"""
+        barrier = threading.Barrier(len(stores))
+        results = {}
+
+        def submit(index, store):
+            owner = f"owner-{index}"
+            store.heartbeat(owner, self.now.isoformat())
+            barrier.wait()
+            results[f"task-{index}"] = store.insert_dedup(make_record(f"task-{index}", owner), self.live_since)
+
+        threads = [threading.Thread(target=submit, args=(i, store)) for i, store in enumerate(stores)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def assert_single_winner(self, results, store):
+        winners = [task_id for task_id, existing in results.items() if existing is None]
+        self.assertEqual(len(winners), 1)
+        self.assertEqual({existing for existing in results.values() if existing}, set(winners))
+        self.assertEqual([r["task_id"] for r in store.find_active("sync:sprint")], winners)
+
+    def test_sqlite_concurrent_insert_has_single_winner(self):
+        stores = [SqliteTaskStore(self.db_path) for _ in range(8)]
+        self.assert_single_winner(self.concurrent_insert(stores), stores[0])
+
+    def test_memory_concurrent_insert_has_single_winner(self):
+        store = MemoryTaskStore()
+        self.assert_single_winner(self.concurrent_insert([store] * 8), store)
+
+    def test_dead_owner_and_finished_tasks_do_not_block(self):
+        for store in (MemoryTaskStore(), SqliteTaskStore(self.db_path)):
+            store.heartbeat("dead", (self.now - timedelta(minutes=5)).isoformat())
+            store.heartbeat("live", self.now.isoformat())
+            store.save(make_record("stale", "dead"))
+            store.save(make_record("done", "live", status="completed"))
+            self.assertIsNone(store.insert_dedup(make_record("new", "live"), self.live_since))
+            self.assertEqual(store.insert_dedup(make_record("again", "other"), self.live_since), "new")
+            self.assertIsNone(store.get("again"))
+
+
+class SubmitDedupTest(unittest.TestCase):
+    """多个实例共享任务库时，相同去重键的任务只执行一个，其他实例返回该任务的 task_id"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.calls = []
+
+    def make_thread_utils(self):
+        thread_utils = ThreadUtils(
+            task_store=SqliteTaskStore(Path(self.tmp_dir.name) / "tasks.db"),
+            result_dir=self.tmp_dir.name,
+            profile_dir=self.tmp_dir.name,
+        )
+        thread_utils.register_task("sync", self.blocking_task)
+        thread_utils._heartbeat()
+        self.addCleanup(thread_utils.shutdown)
+        return thread_utils
+
+    def blocking_task(self, progress_callback=None):
+        self.calls.append(1)
+        self.release.wait(10)
+        return {}
+
+    def test_concurrent_submit_returns_winner_task_id(self):
+        instances = [self.make_thread_utils() for _ in range(4)]
+        barrier = threading.Barrier(len(instances))
+        task_ids = []
+
+        def submit(thread_utils):
+            barrier.wait()
+            task_ids.append(thread_utils.submit_task("sync", dedup_key="sync:sprint"))
+
+        threads = [threading.Thread(target=submit, args=(thread_utils,)) for thread_utils in instances]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(task_ids), 4)
+        self.assertEqual(len(set(task_ids)), 1)
+        self.assertEqual(sum(task_ids[0] in thread_utils.tasks for thread_utils in instances), 1)
+        self.release.set()
+        for thread_utils in instances:
+            thread_utils.shutdown()
+        self.assertEqual(len(self.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
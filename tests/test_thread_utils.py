@@ -0,0 +1,138 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/22 18:10
+# @Author : Xumh
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from utils.task_store import SqliteTaskStore
+from utils.thread_utils import ThreadUtils
+
+TOTAL_ITEMS = 100
+
+
+def wait_until(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TaskStoreRoundTripTest(unittest.TestCase):
+    """多个实例（或重启前后的实例）通过同一个 SQLite 任务库恢复任务、传递控制请求"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = Path(self.tmp_dir.name) / "tasks.db"
+        self.started_from = []
+        self.item_delay = 0.01
+
+    def steps_task(self, total, progress_callback=None, checkpoint=None):
+        """逐条处理 total 个条目，断点中保存已处理的条目"""
+        start = checkpoint["index"] if checkpoint else 0
+        done = list(checkpoint["result"]["done"]) if checkpoint else []
+        self.started_from.append(start)
+        for index in range(start, total):
+            time.sleep(self.item_delay)
+            done.append(index)
+            progress_callback(current=index + 1, total=total, result={"done": list(done)})
+        return {"done": done}
+
+    def make_thread_utils(self):
+        """模拟一个实例（进程）：独立的任务库连接"""
+        thread_utils = ThreadUtils(
+            task_store=SqliteTaskStore(self.db_path), result_dir=self.tmp_dir.name, profile_dir=self.tmp_dir.name
+        )
+        thread_utils.register_task("steps", self.steps_task)
+        thread_utils._heartbeat()
+        self.addCleanup(thread_utils.shutdown, wait=False, interrupt=True)
+        return thread_utils
+
+    def interrupted_task(self):
+        """提交任务，处理一部分后模拟实例退出（中断并保留断点）"""
+        thread_utils = self.make_thread_utils()
+        task_id = thread_utils.submit_task("steps", total=TOTAL_ITEMS)
+        self.assertTrue(wait_until(lambda: (thread_utils.get_task_status(task_id)["current"] or 0) >= 10))
+        thread_utils.shutdown(wait=True, interrupt=True)
+        return thread_utils, task_id
+
+    def test_restart_resumes_from_checkpoint(self):
+        old_instance, task_id = self.interrupted_task()
+        record = old_instance.task_store.get(task_id)
+        self.assertEqual(record["status"], "pending")
+        self.assertEqual(record["owner"], old_instance.instance_id)
+        checkpoint_index = record["current"]
+        self.assertEqual(record["result"]["done"], list(range(checkpoint_index)))
+
+        new_instance = self.make_thread_utils()
+        self.assertEqual(new_instance.resume_interrupted_tasks(), [task_id])
+        self.assertTrue(wait_until(lambda: new_instance.get_task_status(task_id)["status"] == "completed"))
+
+        record = new_instance.task_store.get(task_id)
+        self.assertEqual(record["owner"], new_instance.instance_id)
+        self.assertEqual(self.started_from, [0, checkpoint_index])
+        self.assertEqual(record["result"]["done"], list(range(TOTAL_ITEMS)))
+
+    def test_only_one_instance_claims_task_of_dead_owner(self):
+        _, task_id = self.interrupted_task()
+        instances = [self.make_thread_utils() for _ in range(4)]
+        barrier = threading.Barrier(len(instances))
+        resumed = []
+
+        def resume(thread_utils):
+            barrier.wait()
+            resumed.extend(thread_utils.resume_interrupted_tasks())
+
+        threads = [threading.Thread(target=resume, args=(thread_utils,)) for thread_utils in instances]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(resumed, [task_id])
+        owners = [thread_utils for thread_utils in instances if thread_utils.is_local_task(task_id)]
+        self.assertEqual(len(owners), 1)
+        self.assertEqual(owners[0].task_store.get(task_id)["owner"], owners[0].instance_id)
+
+    def test_live_owner_tasks_are_not_claimed(self):
+        owner = self.make_thread_utils()
+        task_id = owner.submit_task("steps", total=TOTAL_ITEMS)
+        other = self.make_thread_utils()
+        self.assertEqual(other.resume_interrupted_tasks(), [])
+        self.assertFalse(other.is_local_task(task_id))
+        owner.cancel_task(task_id)
+
+    def test_pause_resume_cancel_round_trip_through_store(self):
+        self.item_delay = 0.05
+        owner, other = self.make_thread_utils(), self.make_thread_utils()
+        task_id = owner.submit_task("steps", total=TOTAL_ITEMS)
+        self.assertTrue(wait_until(lambda: owner.get_task_status(task_id)["status"] == "running"))
+        self.assertFalse(other.is_local_task(task_id))
+
+        # 其他实例的控制请求写入任务库，由执行任务的实例在条目之间读取
+        self.assertTrue(other.pause_task(task_id))
+        self.assertTrue(wait_until(lambda: other.get_task_status(task_id)["status"] == "paused"))
+        paused_at = other.get_task_status(task_id)["current"]
+        time.sleep(0.3)
+        self.assertEqual(owner.get_task_status(task_id)["current"], paused_at)
+        self.assertIsNone(other.task_store.get_control(task_id))
+
+        self.assertTrue(other.resume_task(task_id))
+        self.assertTrue(wait_until(lambda: other.get_task_status(task_id)["status"] == "running"))
+        self.assertTrue(wait_until(lambda: (owner.get_task_status(task_id)["current"] or 0) > paused_at))
+
+        self.assertTrue(other.cancel_task(task_id))
+        self.assertTrue(wait_until(lambda: other.get_task_status(task_id)["status"] == "cancelled"))
+        result = other.get_task_result(task_id)["result"]
+        self.assertLess(len(result["done"]), TOTAL_ITEMS)
+        self.assertEqual(result["done"], list(range(len(result["done"]))))
+        self.assertFalse(other.cancel_task(task_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/22 17:00
+# @Author : Xumh
+import threading
+import unittest
+
+from utils.write_buffer import WorkItemWriteBuffer
+
+
+class RecordingClient:
+    """记录 update_work_item 请求的飞书客户端替身"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def update_work_item(self, work_item_type_key, work_item_id, request_data):
+        with self.lock:
+            self.requests.append((work_item_type_key, work_item_id, request_data))
+        if self.error:
+            raise self.error
+        return {"err_code": 0, "work_item_id": work_item_id}
+
+
+def field(key, value):
+    return {"field_key": key, "field_value": value}
+
+
+class WorkItemWriteBufferTest(unittest.TestCase):
+    def make_buffer(self, window):
+        buffer = WorkItemWriteBuffer(window=window)
+        self.addCleanup(buffer.stop)
+        return buffer
+
+    def test_updates_within_window_merge_into_one_request(self):
+        client = RecordingClient()
+        buffer = self.make_buffer(window=0.2)
+        first = buffer.update(client, "issue", 1, {"update_fields": [field("status", "处理中"), field("url", "u1")]})
+        second = buffer.update(client, "issue", 1, {"update_fields": [field("status", "已修复")]})
+
+        self.assertEqual(first.result(timeout=5), {"err_code": 0, "work_item_id": 1})
+        self.assertEqual(second.result(timeout=5), first.result())
+        merged_fields = [field("status", "已修复"), field("url", "u1")]
+        self.assertEqual(client.requests, [("issue", 1, {"update_fields": merged_fields})])
+        self.assertEqual(buffer.stats()["request_count"], 1)
+        self.assertEqual(buffer.stats()["submitted_count"], 2)
+
+    def test_different_work_items_are_sent_separately(self):
+        client = RecordingClient()
+        buffer = self.make_buffer(window=0.2)
+        futures = [
+            buffer.update(client, "issue", work_item_id, {"update_fields": [field("status", "处理中")]})
+            for work_item_id in (1, 2)
+        ]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(sorted(request[1] for request in client.requests), [1, 2])
+
+    def test_failed_flush_fails_all_merged_futures(self):
+        client = RecordingClient(error=ConnectionError("飞书接口不可用"))
+        buffer = self.make_buffer(window=0.2)
+        futures = [
+            buffer.update(client, "issue", 1, {"update_fields": [field("status", status)]})
+            for status in ("处理中", "已修复")
+        ]
+        for future in futures:
+            with self.assertRaises(ConnectionError):
+                future.result(timeout=5)
+        self.assertEqual(len(client.requests), 1)
+
+    def test_stop_flushes_pending_updates(self):
+        client = RecordingClient()
+        buffer = WorkItemWriteBuffer(window=60)
+        future = buffer.update(client, "issue", 1, {"update_fields": [field("status", "已修复")]})
+        self.assertFalse(future.done())
+
+        buffer.stop()
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), {"err_code": 0, "work_item_id": 1})
+        self.assertEqual(len(client.requests), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
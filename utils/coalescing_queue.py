@@ -0,0 +1,122 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/19 21:00
+# @Author : Xumh
+import threading
+import time
+
+from utils.log_utils import logger
+
+
+class CoalescingQueue:
+    """
+    合并队列：同一个键在合并窗口内的多次提交合并为一条，窗口结束后批量交给 flush_func 处理
+    用于 webhook 事件去抖（同一 bug 短时间内多次变更只同步一次）等场景
+    """
+
+    def __init__(self, flush_func, window=5, max_batch=100, merge_func=None, name="coalescing-queue"):
+        """
+        :param flush_func: 批量处理函数 flush_func({key: value})，异常只记录日志
+        :param window: 合并窗口（秒），从键第一次提交开始计算
+        :param max_batch: 单次 flush 的最大键数量
+        :param merge_func: 合并函数 merge_func(旧值, 新值) -> 合并后的值，默认保留新值
+        :param name: 后台线程名称
+        """
+        self.flush_func = flush_func
+        self.window = window
+        self.max_batch = max_batch
+        self.merge_func = merge_func or (lambda old, new: new)
+        self.name = name
+        self._pending = {}  # key -> [首次提交时间, 合并后的值]
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.submitted_count = 0  # 提交次数
+        self.flushed_count = 0  # 合并后实际处理的键数量
+
+    def put(self, key, value=None):
+        """
+        提交一个键，窗口内的重复提交与之前的值合并
+        :return: 是否为新键（False 表示已与排队中的提交合并）
+        """
+        with self._cond:
+            self._start()
+            self.submitted_count += 1
+            if key in self._pending:
+                entry = self._pending[key]
+                entry[1] = self.merge_func(entry[1], value)
+                return False
+            self._pending[key] = [time.monotonic(), value]
+            self._cond.notify()
+            return True
+
+    def _start(self):
+        if self._thread is None and not self._stopping:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _take_due(self, force=False):
+        """取出窗口已结束的键（按提交先后，最多 max_batch 个）"""
+        now = time.monotonic()
+        due = [key for key, (first_seen, _) in self._pending.items() if force or now - first_seen >= self.window]
+        return {key: self._pending.pop(key)[1] for key in due[: self.max_batch]}
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        self.flushed_count += len(batch)
+        try:
+            self.flush_func(batch)
+        except Exception as e:
+            logger.error(f"{self.name} 批量处理失败（{len(batch)} 项）: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    batch = self._take_due()
+                    if batch:
+                        break
+                    if self._pending:
+                        oldest = min(first_seen for first_seen, _ in self._pending.values())
+                        self._cond.wait(max(0.0, oldest + self.window - time.monotonic()))
+                    else:
+                        self._cond.wait()
+                else:
+                    return
+            self._flush(batch)
+
+    def flush(self):
+        """立即处理所有排队中的键（不等待窗口结束）"""
+        while True:
+            with self._cond:
+                batch = self._take_due(force=True)
+            if not batch:
+                return
+            self._flush(batch)
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "name": self.name,
+                "window": self.window,
+                "pending": len(self._pending),
+                "submitted_count": self.submitted_count,
+                "flushed_count": self.flushed_count,
+            }
+
+    def stop(self, flush=True):
+        """
+        停止后台线程
+        :param flush: 是否处理完剩余的键
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if flush:
+            self.flush()
@@ -11,10 +11,14 @@ from conf.feishu_conf import (
     STATUS_PING_CODE_TO_FEISHU,
 )
 from utils.ping_code_utils import PingCodeClient
+from utils.profiling import span, traced
 from utils.request_utils import RetryableRequest
 from utils.log_utils import logger
 from utils.utils import Utils
 
+# 导入 PingCode 评论时两次创建评论之间的间隔（秒），避免触发飞书接口限流
+COMMENT_CREATE_INTERVAL = 1
+
 
 class BaseClient:
     def __init__(self, base_url: str):
@@ -79,6 +83,7 @@ class FileClient(BaseClient):
         if user_key:
             self.headers["X-USER-KEY"] = user_key
 
+    @traced("feishu.upload")
     def add_attachment(
         self,
         project_key: str,
@@ -105,6 +110,7 @@ class FileClient(BaseClient):
 
         return res
 
+    @traced("feishu.upload")
     def upload_file(self, project_key: str, file_path: str = "", file_bytes: bytes = None, file_name: str = "") -> Dict:
         """上传文件"""
         path = f"/open_api/{project_key}/file/upload"
@@ -254,6 +260,7 @@ class WorkItemClient(BaseClient):
         payload = {"work_item_ids": work_item_ids}
         return self._request("POST", path, headers=self.headers, json=payload)
 
+    @traced("feishu.create")
     def create(self, project_key: str, payload: Dict) -> Dict:
         """创建工作项"""
         path = f"/open_api/{project_key}/work_item/create"
@@ -269,6 +276,7 @@ class WorkItemClient(BaseClient):
         path = f"/open_api/{project_key}/work_item/{work_item_type_key}/{work_item_id}"
         return self._request("DELETE", path, headers=self.headers, json={})
 
+    @traced("feishu.workflow")
     def get_workflow(
         self, project_key: str, work_item_type_key: str, work_item_id: int, flow_type: int = 1, _payload: Dict = None
     ) -> Dict:
@@ -320,6 +328,7 @@ class WorkItemClient(BaseClient):
         path = f"/open_api/{project_key}/workflow/{work_item_type_key}/{work_item_id}/node/{node_id}/operate"
         return self._request("POST", path, headers=self.headers, json=payload)
 
+    @traced("feishu.state_change")
     def state_change(self, project_key: str, work_item_type_key: str, work_item_id: int, payload: Dict) -> Dict:
         """状态流转"""
         path = f"/open_api/{project_key}/workflow/{work_item_type_key}/{work_item_id}/node/state_change"
@@ -332,6 +341,7 @@ class WorkItemClient(BaseClient):
         params = {"node_id": node_id}
         return self._request("GET", path, headers=self.headers, params=params)
 
+    @traced("feishu.meta")
     def get_create_meta(self, project_key, work_item_type_key="issue"):
         """获取创建工作项元数据"""
         path = f"/open_api/{project_key}/work_item/{work_item_type_key}/meta"
@@ -363,6 +373,7 @@ class CommentClient(BaseClient):
         if user_key:
             self.headers["X-USER-KEY"] = user_key
 
+    @traced("feishu.comment")
     def create_comment(self, project_key: str, work_item_id: int, content, work_item_type_key: str = "issue") -> Dict:
         """添加评论"""
         path = f"/open_api/{project_key}/work_item/{work_item_type_key}/{work_item_id}/comment/create"
@@ -461,6 +472,7 @@ class PingCodeToFeishuUtils(FeishuProjectApiUtils):
                     text_parts.append(f"@{name}")
         return "".join(text_parts)
 
+    @traced("html.convert")
     def html_to_feishu_rich_text(
         self, html_str, assignee=None, created_by=None, created_at=None, updated_by=None, update_at=None, bug_url=None
     ):
@@ -545,6 +557,7 @@ class PingCodeToFeishuUtils(FeishuProjectApiUtils):
             text = self.extract_text_from_children(children)
             return self.format_rich_paragraph(_text=text, _type="text", is_line_attrs=is_line_attrs)
 
+    @traced("comment.convert")
     def add_ping_code_comment(self, comment_info):
         """添加PingCode的评论"""
         if comment_info.get("is_deleted") or comment_info.get("content") is None:
@@ -693,7 +706,8 @@ class PingCodeToFeishuUtils(FeishuProjectApiUtils):
                 if not rich_text:
                     continue
                 self.comment.create_comment(self.project_key, create_id, rich_text)
-                time.sleep(1)
+                with span("throttle"):
+                    time.sleep(COMMENT_CREATE_INTERVAL)
 
             # 状态
             ping_code_state_name = pc_bug.get("state_name", "新提交")
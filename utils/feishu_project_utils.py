@@ -1,10 +1,16 @@
+from collections import deque
+from concurrent.futures import wait as wait_futures
 from pathlib import Path
 
 from conf.feishu_conf import FEISHU_PROJECT_URL, PROJECT_KEY, PLUGIN_ID, PLUGIN_SECRET, USER_KEY
 from utils.log_utils import logger
 from utils.ping_code_utils import PingCodeClient
+from utils.profiling import span, traced
 from utils.request_utils import RetryableRequest
+from utils.sprint_registry import SprintNotFoundError, get_sprint_registry
+from utils.thread_utils import TaskCancelledError
 from utils.utils import Utils
+from utils.write_buffer import get_write_buffer
 
 
 class FeiShuProjectUtils:
@@ -104,6 +110,7 @@ class FeiShuProjectUtils:
 
         return self._get_response_data(res)
 
+    @traced("feishu.create")
     def create_work_item(self, _data):
         """
         创建工作项
@@ -113,6 +120,7 @@ class FeiShuProjectUtils:
         res = self.client.post(url=url, headers=self.headers, json=_data)
         return self._get_response_data(res)
 
+    @traced("feishu.update")
     def update_work_item(self, work_item_type_key, work_item_id, request_data):
         """
         更新工作项
@@ -126,6 +134,14 @@ class FeiShuProjectUtils:
         # logger.info(f"更新数据：{request_data}")
         return self._get_response_data(res, _key="")
 
+    def update_work_item_later(self, work_item_type_key, work_item_id, request_data):
+        """
+        通过写缓冲更新工作项：同一工作项在合并窗口内的多次更新按 field_key 合并为一次请求
+        :return: Future，结果为 update_work_item 的返回值
+        """
+        return get_write_buffer().update(self, work_item_type_key, work_item_id, request_data)
+
+    @traced("feishu.search")
     def search_work_item_filter(self, work_item_type_keys, work_item_name=None, request_data=None):
         """
         获取指定的工作项列表（单空间-过滤条件）
@@ -139,6 +155,7 @@ class FeiShuProjectUtils:
         res = self.client.post(url=url, headers=self.headers, json=request_data)
         return self._get_response_data(res, _key="")
 
+    @traced("feishu.search")
     def search_work_item_all(self, work_item_type_key, request_data):
         """
         获取指定的工作项列表（单空间-复杂传参）
@@ -189,11 +206,81 @@ class FeiShuProjectUtils:
             res_data_list = res_data_list + res.json().get("data", [])
         return res_data_list
 
-    def update_bug_info_from_ping_code(self, _bugs=None, progress_callback=None):
+    @staticmethod
+    def _restore_checkpoint(result_set, checkpoint, bugs):
+        """
+        从断点恢复已运行的结果，并过滤掉已处理的 bug
+        恢复时重新查询的飞书 bug 列表顺序和成员都可能变化，按断点中已处理的工作项 id 过滤，而不是按位置跳过
+        :param result_set: 本次运行的结果集，processed_ids 中记录已处理的工作项 id
+        :param checkpoint: {"index": 已完成数量, "result": 已运行的结果}
+        :param bugs: 本次查询到的飞书 bug 列表
+        :return: 尚未处理的 bug 列表
+        """
+        result_set["processed_ids"] = []
+        if not checkpoint:
+            return bugs
+        partial_result = checkpoint.get("result") or {}
+        result_set["success"] = partial_result.get("success", [])
+        result_set["error"] = partial_result.get("error", [])
+        if "skipped" in result_set:
+            result_set["skipped"] = partial_result.get("skipped", [])
+        result_set["processed_ids"] = list(partial_result.get("processed_ids") or [])
+        processed_ids = set(result_set["processed_ids"])
+        pending_bugs = [bug for bug in bugs if str(bug.get("id")) not in processed_ids]
+        logger.info(f"从断点恢复，跳过已处理的 {len(bugs) - len(pending_bugs)} 个BUG")
+        return pending_bugs
+
+    @staticmethod
+    def _collect_update(update, bug_result):
+        """
+        汇总写缓冲中已完成的更新结果
+        :param update: (PingCode 编号, PingCode 状态, 更新数据, Future)
+        :param bug_result: 该 bug 的处理结果 {"success": [...], "error": [...]}
+        """
+        pc_bug_id, pc_bug_state_name, update_request_data, future = update
+        try:
+            res = future.result()
+        except Exception as e:
+            logger.error(f"修改缺陷失败：{e}")
+            bug_result["error"].append({pc_bug_id: f"更新失败: {e}"})
+            return
+        if res.get("err_code"):
+            logger.error(f"修改缺陷失败：{res}")
+            logger.error(f"PingCode_编号: {pc_bug_id}，PingCode_状态: {pc_bug_state_name}")
+            bug_result["error"].append({pc_bug_id: res})
+        else:
+            logger.info(f"PingCode_编号：{pc_bug_id} 数据已更新: {update_request_data}")
+            bug_result["success"].append({pc_bug_id: update_request_data})
+
+    def _commit_bug_results(self, uncommitted, result_set, wait=False):
+        """
+        按处理顺序把 bug 结果提交到 result_set，遇到写缓冲中尚未完成的更新即停止，
+        保证断点中已处理的 bug 都已写入飞书，且 result_set 只包含这些 bug 的结果
+        :param uncommitted: deque[(工作项 id, bug_result, update)]，update 为 (PingCode 编号, PingCode 状态, 更新数据,
+            Future) 或 None，已提交的会被移除
+        :param wait: 是否等待全部更新完成
+        :return: 本次提交的 bug 数量
+        """
+        committed = 0
+        while uncommitted:
+            work_item_id, bug_result, update = uncommitted[0]
+            if update:
+                if not wait and not update[3].done():
+                    break
+                self._collect_update(update, bug_result)
+            uncommitted.popleft()
+            result_set["success"] += bug_result["success"]
+            result_set["error"] += bug_result["error"]
+            result_set["processed_ids"].append(work_item_id)
+            committed += 1
+        return committed
+
+    def update_bug_info_from_ping_code(self, _bugs=None, progress_callback=None, checkpoint=None):
         """
         获取 PingCode 数据更新 bug 信息
         :param _bugs: 可选的bug列表
         :param progress_callback: 进度回调函数，接收0-100的进度值
+        :param checkpoint: 恢复断点 {"index": 已完成数量, "result": 已运行的结果}，跳过 result 中已处理的 bug
         :return: 处理结果
         """
         # 初始化进度
@@ -210,89 +297,101 @@ class FeiShuProjectUtils:
         _bugs = _bugs or self.search_work_item_all(work_item_type_key="issue", request_data=feishu_search_params)
         bug_count = len(_bugs)
         result_set = {"count": bug_count, "success": [], "error": []}
+        pending_bugs = self._restore_checkpoint(result_set, checkpoint, _bugs)
 
         if not _bugs:
             if progress_callback:
                 progress_callback(100, message="没有bug需要更新")
+            result_set.pop("processed_ids")
             return result_set
 
         pcc = PingCodeClient()
-
-        for index, bug in enumerate(_bugs):
-            try:
-                pc_bug_id = (
-                    Utils.search_list_json(bug.get("fields", []), "field_alias", "pingcode_id")
-                    .get("field_value")
-                    .strip()
-                )
-                fs_bug_comments = (
-                    Utils.search_list_json(bug.get("fields", []), "field_alias", "pingcode_comments")
-                    .get("field_value", "")
-                    .replace("\\n", "\n")
-                    .strip()
-                )
-                fs_bug_status = Utils.search_list_json(bug.get("fields", []), "field_alias", "pingcode_status").get(
-                    "field_value"
-                )
-                fs_bug_url = Utils.search_list_json(bug.get("fields", []), "field_alias", "pingcode_url").get(
-                    "field_value"
-                )
-
-                if pc_bug_id:
-                    pc_bug_info = pcc.search_bug_by_id(pc_bug_id[6:]).get("data")
-                    if pc_bug_info:
-                        update_request_data = {"update_fields": []}
-                        # 处理PingCode Bug状态
-                        pc_bug_state_id = pc_bug_info.get("value")[0].get("state_id")
-                        pc_bug_short_id = pc_bug_info.get("value")[0].get("short_id")
-
-                        if not fs_bug_url:
-                            update_request_data["update_fields"].append(
-                                {"field_key": "field_f18a13", "field_value": pcc.get_bug_url(pc_bug_short_id)}
-                            )
-                        pc_bug_state_name = pcc.get_bug_status_name(pc_bug_state_id)
-                        if pc_bug_state_name != fs_bug_status:
-                            update_request_data["update_fields"].append(
-                                {"field_key": "field_9d59f3", "field_value": pc_bug_state_name}
-                            )
-
-                        # 处理PingCode Bug 评论
-                        pc_bug_comment_id = pc_bug_info.get("value")[0].get("_id")
-                        pc_comment_request_list = pcc.format_comments(pc_bug_comment_id, fs_bug_comments)
-                        if pc_comment_request_list:
-                            update_request_data["update_fields"].append(
-                                {"field_key": "field_7f6e66", "field_value": pc_comment_request_list}
-                            )
-
-                        if update_request_data.get("update_fields"):
-                            res = self.update_work_item("issue", bug.get("id"), update_request_data)
-                            if res.get("err_code"):
-                                logger.error(f"修改缺陷失败：{res}")
-                                logger.error(f"PingCode_编号: {pc_bug_id}，PingCode_状态: {pc_bug_state_name}")
-                                result_set["error"].append({pc_bug_id: res})
+        # 已处理、尚未提交到 result_set 的 bug，写缓冲中的更新完成后按顺序提交
+        uncommitted = deque()
+        committed_index = bug_count - len(pending_bugs)
+
+        try:
+            for bug in pending_bugs:
+                bug_result = {"success": [], "error": []}
+                update = None
+                try:
+                    pc_bug_id = (
+                        Utils.search_list_json(bug.get("fields", []), "field_alias", "pingcode_id")
+                        .get("field_value")
+                        .strip()
+                    )
+                    fs_bug_comments = (
+                        Utils.search_list_json(bug.get("fields", []), "field_alias", "pingcode_comments")
+                        .get("field_value", "")
+                        .replace("\\n", "\n")
+                        .strip()
+                    )
+                    fs_bug_status = Utils.search_list_json(
+                        bug.get("fields", []), "field_alias", "pingcode_status"
+                    ).get("field_value")
+                    fs_bug_url = Utils.search_list_json(
+                        bug.get("fields", []), "field_alias", "pingcode_url"
+                    ).get("field_value")
+
+                    if pc_bug_id:
+                        pc_bug_info = pcc.search_bug_by_id(pc_bug_id[6:]).get("data")
+                        if pc_bug_info:
+                            update_request_data = {"update_fields": []}
+                            # 处理PingCode Bug状态
+                            pc_bug_state_id = pc_bug_info.get("value")[0].get("state_id")
+                            pc_bug_short_id = pc_bug_info.get("value")[0].get("short_id")
+
+                            if not fs_bug_url:
+                                update_request_data["update_fields"].append(
+                                    {"field_key": "field_f18a13", "field_value": pcc.get_bug_url(pc_bug_short_id)}
+                                )
+                            pc_bug_state_name = pcc.get_bug_status_name(pc_bug_state_id)
+                            if pc_bug_state_name != fs_bug_status:
+                                update_request_data["update_fields"].append(
+                                    {"field_key": "field_9d59f3", "field_value": pc_bug_state_name}
+                                )
+
+                            # 处理PingCode Bug 评论
+                            pc_bug_comment_id = pc_bug_info.get("value")[0].get("_id")
+                            pc_comment_request_list = pcc.format_comments(pc_bug_comment_id, fs_bug_comments)
+                            if pc_comment_request_list:
+                                update_request_data["update_fields"].append(
+                                    {"field_key": "field_7f6e66", "field_value": pc_comment_request_list}
+                                )
+
+                            if update_request_data.get("update_fields"):
+                                # 通过写缓冲提交，更新结果在后续统一汇总
+                                future = self.update_work_item_later("issue", bug.get("id"), update_request_data)
+                                update = (pc_bug_id, pc_bug_state_name, update_request_data, future)
                             else:
-                                logger.info(f"PingCode_编号：{pc_bug_id} 数据已更新: {update_request_data}")
-                                result_set["success"].append({pc_bug_id: update_request_data})
+                                logger.debug(f"BUG({pc_bug_id})状态和评论未变更！")
                         else:
-                            logger.debug(f"BUG({pc_bug_id})状态和评论未变更！")
+                            error_msg = f"BUG({pc_bug_id})信息获取失败！\n已运行的结果：{result_set}"
+                            bug_result["error"].append({pc_bug_id: f"信息获取失败{pc_bug_info}"})
+                            logger.error(error_msg)
+                            raise Exception(error_msg)
                     else:
-                        error_msg = f"BUG({pc_bug_id})信息获取失败！\n已运行的结果：{result_set}"
-                        result_set["error"].append({pc_bug_id: f"信息获取失败{pc_bug_info}"})
-                        logger.error(error_msg)
-                        raise Exception(error_msg)
-                else:
-                    result_set["error"].append({f"飞书BUG（{bug.get('name')}）": "缺少PingCode编号"})
-                    logger.error(f"缺少PingCode编号: {pc_bug_id}")
-
-            except Exception as e:
-                # 错误处理
-                error_msg = f"处理BUG时发生错误: {str(e)}"
-                result_set["error"].append({f"飞书BUG（{bug.get('name')}）": error_msg})
-                logger.error(error_msg)
-
-            # 更新进度
-            if progress_callback:
-                progress_callback(current=index+1, total=bug_count, message="")
+                        bug_result["error"].append({f"飞书BUG（{bug.get('name')}）": "缺少PingCode编号"})
+                        logger.error(f"缺少PingCode编号: {pc_bug_id}")
+
+                except Exception as e:
+                    # 错误处理
+                    error_msg = f"处理BUG时发生错误: {str(e)}"
+                    bug_result["error"].append({f"飞书BUG（{bug.get('name')}）": error_msg})
+                    logger.error(error_msg)
+
+                uncommitted.append((str(bug.get("id")), bug_result, update))
+                committed_index += self._commit_bug_results(uncommitted, result_set)
+                # 更新进度：断点只推进到写入已完成的 bug
+                if progress_callback:
+                    progress_callback(current=committed_index, total=bug_count, message="", result=result_set)
+        finally:
+            # 正常结束、任务中断或取消时都等待已提交到写缓冲的更新完成，再返回或抛出异常；
+            # 中断时未提交的 bug 不计入断点，恢复后重新处理（此时飞书已是最新数据，不会重复更新）
+            with span("feishu.update.wait", pending=len(uncommitted)):
+                wait_futures([item[3] for _, _, item in uncommitted if item])
+        self._commit_bug_results(uncommitted, result_set, wait=True)
+        result_set.pop("processed_ids")
 
         # 完成进度
         if progress_callback:
@@ -300,22 +399,67 @@ class FeiShuProjectUtils:
 
         return result_set
 
-    def update_ping_code_sprint_bug(self, sprint_name, progress_callback=None):
+    def search_bugs_by_ping_code_ids(self, pc_bug_ids, chunk_size=50):
+        """
+        按 PingCode 编号查询飞书项目中对应的 bug
+        :param pc_bug_ids: PingCode 编号列表，如 ["SYYXX-123"]
+        :param chunk_size: 每次查询的编号数量
+        :return: 飞书 bug 列表
+        """
+        pc_bug_ids = list(dict.fromkeys(pc_bug_ids))
+        fs_bugs = []
+        for start in range(0, len(pc_bug_ids), chunk_size):
+            request_data = {
+                "search_group": {
+                    "search_params": [
+                        {"param_key": "field_e2c852", "value": pc_bug_id, "operator": "="}
+                        for pc_bug_id in pc_bug_ids[start : start + chunk_size]
+                    ],
+                    "conjunction": "OR",
+                },
+                "fields": ["field_e2c852", "field_9d59f3", "field_7f6e66", "field_f18a13"],
+            }
+            fs_bugs += self.search_work_item_all(work_item_type_key="issue", request_data=request_data)
+        return fs_bugs
+
+    def sync_bugs_by_ping_code_ids(self, pc_bug_ids, progress_callback=None, checkpoint=None):
+        """
+        只同步指定 PingCode 编号对应的飞书 bug（状态、评论、链接），用于 webhook 推送的增量更新
+        :param pc_bug_ids: PingCode 编号列表
+        :param progress_callback: 进度回调函数
+        :param checkpoint: 恢复断点
+        :return: 处理结果
+        """
+        fs_bugs = self.search_bugs_by_ping_code_ids(pc_bug_ids) if pc_bug_ids else []
+        if not fs_bugs:
+            logger.info(f"飞书项目中没有对应 PingCode 编号的BUG（共 {len(pc_bug_ids)} 个编号）")
+            if progress_callback:
+                progress_callback(100, message="没有bug需要更新")
+            return {"count": 0, "success": [], "error": []}
+        return self.update_bug_info_from_ping_code(
+            _bugs=fs_bugs, progress_callback=progress_callback, checkpoint=checkpoint
+        )
+
+    def update_ping_code_sprint_bug(self, sprint_name, progress_callback=None, checkpoint=None, pcc=None):
         """
         更新 sprint 下的 bug 列表
         :param sprint_name: Sprint名称
         :param progress_callback: 进度回调函数，接收0-100的进度值
-        :return: 处理结果
+        :param checkpoint: 恢复断点 {"index": 已完成数量, "result": 已运行的结果}，跳过 result 中已处理的 bug
+        :param pcc: PingCodeClient 实例，同步多个 sprint 时复用同一个客户端（连接池）
+        :return: 处理结果，skipped 中为已在该迭代中、无需更新的 PingCode 编号
+        :raise SprintNotFoundError: 飞书项目或 PingCode 中找不到该 sprint
         """
         # 初始化进度
         if progress_callback:
             progress_callback(0, message="开始同步sprint bug信息")
 
-        pcc = PingCodeClient()
+        pcc = pcc or PingCodeClient()
 
-        fs_sprint_info = self.search_work_item_filter(work_item_type_keys=["sprint"], work_item_name=sprint_name)
-        fs_sprint_id = fs_sprint_info.get("data")[0].get("id")
-        pc_sprint_id = pcc.get_sprints_info(sprint_name).get("data").get("value")[0].get("_id")
+        # sprint id 从注册表缓存中获取，未命中时按名称查询
+        sprint = get_sprint_registry().resolve(sprint_name, feishu_client=self, pcc=pcc)
+        fs_sprint_id = sprint["feishu_id"]
+        pc_sprint_id = sprint["pingcode_id"]
         request_data = {
             "search_group": {
                 "search_params": [{"param_key": "planning_sprint", "value": [fs_sprint_id], "operator": "HAS ANY OF"}],
@@ -327,9 +471,10 @@ class FeiShuProjectUtils:
         fs_bugs = self.search_work_item_all(work_item_type_key="issue", request_data=request_data)
         bug_count = len(fs_bugs)
 
-        result_set = {"count": bug_count, "success": [], "error": []}
+        result_set = {"count": bug_count, "success": [], "error": [], "skipped": []}
+        pending_bugs = self._restore_checkpoint(result_set, checkpoint, fs_bugs)
 
-        for index, bug in enumerate(fs_bugs):
+        for index, bug in enumerate(pending_bugs, start=bug_count - len(pending_bugs) + 1):
             try:
                 pc_bug_id = (
                     Utils.search_list_json(bug.get("fields", []), "field_alias", "pingcode_id")
@@ -339,13 +484,18 @@ class FeiShuProjectUtils:
                 if pc_bug_id:
                     pc_bug_info = pcc.search_bug_by_id(pc_bug_id[6:]).get("data")
                     if pc_bug_info:
-                        temp_pc_bug_id = pc_bug_info.get("value")[0].get("_id")
-                        res = pcc.put_work_item_info(temp_pc_bug_id, {"sprint_id": pc_sprint_id})
-                        if res.get("data").get("value"):
-                            result_set["success"].append({pc_bug_id: res})
-                            logger.info(f"PingCode_编号：{pc_bug_id} 数据已更新: {res}")
+                        pc_bug = pc_bug_info.get("value")[0]
+                        # 搜索结果中已带有当前迭代，已在该迭代中的 bug 不再更新
+                        if pc_bug.get("sprint_id") == pc_sprint_id:
+                            result_set["skipped"].append(pc_bug_id)
+                            logger.debug(f"PingCode_编号：{pc_bug_id} 已在迭代中，跳过")
                         else:
-                            result_set["error"].append({pc_bug_id: res})
+                            res = pcc.put_work_item_info(pc_bug.get("_id"), {"sprint_id": pc_sprint_id})
+                            if res.get("data").get("value"):
+                                result_set["success"].append({pc_bug_id: res})
+                                logger.info(f"PingCode_编号：{pc_bug_id} 数据已更新: {res}")
+                            else:
+                                result_set["error"].append({pc_bug_id: res})
                     else:
                         result_set["error"].append({pc_bug_id: f"信息获取失败{pc_bug_info}"})
                         logger.error(f"BUG({pc_bug_id})信息获取失败！")
@@ -360,8 +510,13 @@ class FeiShuProjectUtils:
                 logger.error(error_msg)
 
             # 更新进度
+            result_set["processed_ids"].append(str(bug.get("id")))
             if progress_callback:
-                progress_callback(current=index + 1, total=bug_count, message="")
+                progress_callback(current=index, total=bug_count, message="", result=result_set)
+
+        result_set.pop("processed_ids")
+        if result_set["skipped"]:
+            logger.info(f"sprint {sprint_name}: {len(result_set['skipped'])} 个BUG已在迭代中，未更新")
 
         # 完成进度
         if progress_callback:
@@ -369,6 +524,98 @@ class FeiShuProjectUtils:
 
         return result_set
 
+    @staticmethod
+    def _sprint_progress_callback(progress_callback, result_set, index, sprint_count, sprint_name):
+        """
+        多个 sprint 的任务中单个 sprint 的进度回调：
+        进度缩放到该 sprint 在整体中的区间，sprint 内的断点记录在 result_set["current_sprint"] 中
+        """
+
+        def sprint_progress(percentage=0, current=None, total=None, message="", result=None):
+            if current is not None and total:
+                percentage = current * 100 / total
+            if result is not None:
+                result_set["current_sprint"] = {
+                    "name": sprint_name,
+                    "checkpoint": {"index": current, "result": result},
+                }
+            # 通过外层回调上报，任务的暂停/取消在每个 bug 处理后生效
+            progress_callback(
+                int((index * 100 + percentage) / sprint_count),
+                current=index,
+                total=sprint_count,
+                message=message or f"正在同步 sprint: {sprint_name}",
+                result=result_set,
+            )
+
+        return sprint_progress
+
+    def update_ping_code_sprints_bugs(self, sprint_names, progress_callback=None, checkpoint=None):
+        """
+        在一个任务中同步多个 sprint 下的 bug，复用同一个飞书/PingCode 客户端及其连接池
+        :param sprint_names: Sprint名称列表
+        :param progress_callback: 进度回调函数
+        :param checkpoint: 恢复断点 {"index": 已完成的 sprint 数量, "result": 已运行的结果}，
+            跳过 result["sprints"] 中已完成的 sprint；result["current_sprint"] 为正在同步的 sprint 内的断点，
+            恢复时从该 sprint 的断点继续
+        :return: 处理结果，sprints 中为各 sprint 的统计
+        """
+        sprint_names = list(dict.fromkeys(sprint_names))
+        result_set = {"count": 0, "success": [], "error": [], "skipped": [], "sprints": {}}
+        current_sprint = None
+        if checkpoint:
+            result_set.update(checkpoint.get("result") or {})
+            current_sprint = result_set.pop("current_sprint", None)
+            logger.info(f"从断点恢复，跳过已同步的 {len(result_set['sprints'])} 个sprint")
+
+        pcc = PingCodeClient()
+        sprint_count = len(sprint_names)
+        for sprint_name in sprint_names:
+            # 按名称跳过已完成的 sprint，不依赖位置
+            if sprint_name in result_set["sprints"]:
+                continue
+            index = len(result_set["sprints"])
+            sprint_checkpoint = None
+            if current_sprint and current_sprint.get("name") == sprint_name:
+                sprint_checkpoint = current_sprint.get("checkpoint")
+            sprint_progress = None
+            if progress_callback:
+                sprint_progress = self._sprint_progress_callback(
+                    progress_callback, result_set, index, sprint_count, sprint_name
+                )
+                sprint_progress(0)
+            try:
+                sprint_result = self.update_ping_code_sprint_bug(
+                    sprint_name, progress_callback=sprint_progress, checkpoint=sprint_checkpoint, pcc=pcc
+                )
+            except TaskCancelledError:
+                raise
+            except SprintNotFoundError as e:
+                logger.error(str(e))
+                sprint_result = {"count": 0, "success": [], "error": [{sprint_name: str(e)}], "skipped": []}
+            except Exception as e:
+                error_msg = f"同步sprint时发生错误: {str(e)}"
+                logger.error(error_msg)
+                sprint_result = {"count": 0, "success": [], "error": [{sprint_name: error_msg}], "skipped": []}
+
+            result_set.pop("current_sprint", None)
+            result_set["count"] += sprint_result["count"]
+            result_set["success"] += sprint_result["success"]
+            result_set["error"] += sprint_result["error"]
+            result_set["skipped"] += sprint_result["skipped"]
+            result_set["sprints"][sprint_name] = {
+                "count": sprint_result["count"],
+                "success": len(sprint_result["success"]),
+                "error": len(sprint_result["error"]),
+                "skipped": len(sprint_result["skipped"]),
+            }
+            if progress_callback:
+                progress_callback(current=index + 1, total=sprint_count, message="", result=result_set)
+
+        if progress_callback:
+            progress_callback(100, message="同步完成")
+        return result_set
+
 
 #
 #     print(feishu_client.get_project_token())
@@ -1,13 +1,103 @@
 #!/usr/bin/env python3
+import base64
+import hashlib
+import shlex
 import subprocess
-import sqlite3
 import json
-from datetime import datetime, timezone
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+from utils.sqlite_db import get_sqlite_db
+
+# 页面展示时间为北京时间（UTC+8），数据库中 timestamp 为 UTC ISO 格式
+DISPLAY_TZ = timezone(timedelta(hours=8))
+# 分页查询每页默认/最大条数
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# 汇总粒度 -> 分桶格式（北京时间）
+ROLLUP_BUCKET_FORMATS = {
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d",
+}
+# 自动选择粒度：查询范围不超过该天数时使用对应粒度，控制返回的点数
+AUTO_RESOLUTION_DAYS = [("raw", 2), ("hour", 60)]
+# 单次返回的最大点数
+MAX_SERIES_POINTS = 5000
+
+# 批量采集：默认并发数和单台 NAS 超时（秒）
+DEFAULT_FLEET_WORKERS = 16
+DEFAULT_HOST_TIMEOUT = 60
+# 批量采集时每累计多少条采样写入一次数据库
+SMART_INSERT_BATCH = 20
+
+# SSH 连接复用（ControlMaster）：空闲连接保留秒数，0 表示每次采样新建连接
+SSH_CONTROL_PERSIST = 300
+SSH_CONTROL_DIR = Path(tempfile.gettempdir()) / "autopingcode-ssh"
+
+# 系统盘检测脚本，输出设备路径
+DETECT_DEVICE_SCRIPT = r'''
+root_dev=$(df / 2>/dev/null | awk 'NR==2 {print $1}')
+case "$root_dev" in
+    /dev/ada[0-9]*) echo "/dev/$(echo "$root_dev" | sed -E 's@/dev/(ada[0-9]+)p[0-9]*@\1@')" ;;
+    /dev/nvme[0-9]*n[0-9]*) echo "/dev/$(echo "$root_dev" | sed -E 's@/dev/(nvme[0-9]+n[0-9]+)p[0-9]*@\1@')" ;;
+    /dev/sd[a-z]*|/dev/hd[a-z]*) echo "/dev/$(echo "$root_dev" | sed -E 's@/dev/([a-z]+)[0-9]*@\1@')" ;;
+    *) echo "$root_dev" | sed 's/[0-9]*$//' ;;
+esac
+'''
+SMART_DEVICE_MARKER = "__SMART_DEVICE__"
+# 系统盘检测缓存有效期（秒），0 表示不缓存；smartctl 失败时会立即重新检测
+DEVICE_CACHE_TTL = 7 * 24 * 3600
+NO_DEVICE_EXIT_CODE = 97
+# ssh 自身出错（连接失败、认证失败等）时的退出码
+SSH_ERROR_EXIT_CODE = 255
+# smartctl 退出码中表示命令行错误/设备打开失败的位，即设备不存在或无效
+SMARTCTL_DEVICE_ERROR_BITS = 0b11
+# 使用缓存设备采集时最多占用的超时比例，失败后留出重新检测的时间
+CACHED_DEVICE_TIMEOUT_SHARE = 0.5
+
+# smart_json 存储模式：split-静态设备信息按设备去重存储，每次采样只存变化字段；full-完整 JSON
+# split 模式下变化字段以设备首次采样的变化字段作为 zlib 预置字典压缩，结构相同的采样压缩后仅几十到几百字节
+SMART_STORAGE_MODE = "split"
+# 每次采样会变化的字段，其余字段（型号、序列号、固件、容量等）视为静态设备信息
+SMART_DYNAMIC_KEYS = [
+    "smartctl",
+    "local_time",
+    "smart_status",
+    "temperature",
+    "power_on_time",
+    "power_cycle_count",
+    "nvme_namespaces",  # 含已用容量（utilization）
+    "nvme_smart_health_information_log",
+    "nvme_error_information_log",
+    "nvme_self_test_log",
+    "ata_smart_data",
+    "ata_smart_attributes",
+    "ata_smart_error_log",
+    "ata_smart_self_test_log",
+    "ata_smart_selective_self_test_log",
+    "scsi_error_counter_log",
+    "scsi_grown_defect_list",
+]
+
+
+def smart_db(db_path=None):
+    """nas_smart.db 访问层（WAL、线程级连接复用，进程内首次访问时执行建表/迁移）"""
+    return get_sqlite_db(db_path or default_db_path(), schema_init=init_schema)
 
 
 def init_db(db_path):
-    """初始化数据库，新增 GB 字段"""
-    conn = sqlite3.connect(db_path)
+    """初始化数据库（进程内只执行一次建表/迁移）"""
+    smart_db(db_path).migrate()
+
+
+def init_schema(conn):
+    """建表/迁移，由 SQLiteDB 在进程内首次访问时调用"""
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS smart_records (
@@ -20,8 +110,108 @@ def init_db(db_path):
             data_units_written_gb REAL    -- 新增
         )
     ''')
+    # split 存储模式新增字段：静态设备信息哈希 + 压缩后的变化字段，smart_json 置空
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(smart_records)")}
+    for column, column_type in [("info_hash", "TEXT"), ("smart_blob", "BLOB")]:
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE smart_records ADD COLUMN {column} {column_type}")
+    # 静态设备信息，按内容哈希去重（固件升级等变化会生成新记录，历史采样仍可还原）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS smart_device_info (
+            info_hash TEXT PRIMARY KEY,
+            nas_ip TEXT NOT NULL,
+            device TEXT NOT NULL,
+            static_json TEXT NOT NULL,
+            zdict BLOB NOT NULL,          -- 压缩变化字段的预置字典（首次采样的变化字段）
+            first_seen TEXT NOT NULL
+        )
+    ''')
+    # 系统盘检测缓存，避免每次采样都执行检测脚本
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS smart_device_cache (
+            nas_ip TEXT PRIMARY KEY,
+            device TEXT NOT NULL,
+            detected_time TEXT NOT NULL
+        )
+    ''')
+    # 按 NAS/设备/时间范围分页查询的索引
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_smart_records_ip_device_ts
+        ON smart_records (nas_ip, device, timestamp)
+    ''')
+    # 不带过滤条件时按时间倒序分页
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_smart_records_ts ON smart_records (timestamp)
+    ''')
+    # 按小时/天汇总的读写量，写入记录时增量维护
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS smart_rollups (
+            resolution TEXT NOT NULL,     -- hour/day
+            nas_ip TEXT NOT NULL,
+            device TEXT NOT NULL,
+            bucket TEXT NOT NULL,         -- 分桶起点（北京时间）
+            samples INTEGER NOT NULL,
+            first_time TEXT NOT NULL,     -- 桶内第一条记录的 UTC 时间
+            last_time TEXT NOT NULL,      -- 桶内最后一条记录的 UTC 时间
+            read_min REAL,
+            read_max REAL,
+            read_last REAL,
+            written_min REAL,
+            written_max REAL,
+            written_last REAL,
+            PRIMARY KEY (resolution, nas_ip, device, bucket)
+        )
+    ''')
+    conn.commit()
+    # 首次创建汇总表时从历史记录回填
+    has_rollups = cursor.execute("SELECT 1 FROM smart_rollups LIMIT 1").fetchone()
+    has_records = cursor.execute("SELECT 1 FROM smart_records LIMIT 1").fetchone()
+    if has_records and not has_rollups:
+        rebuild_smart_rollups(conn)
+
+
+def update_smart_rollups(cursor, nas_ip, device, timestamp, read_gb, write_gb):
+    """
+    将一条记录增量合并到小时/天汇总：min/max 取极值，last 取时间最新的记录
+    """
+    if read_gb is None and write_gb is None:
+        return
+    for resolution, bucket_format in ROLLUP_BUCKET_FORMATS.items():
+        cursor.execute('''
+            INSERT INTO smart_rollups (
+                resolution, nas_ip, device, bucket, samples, first_time, last_time,
+                read_min, read_max, read_last, written_min, written_max, written_last
+            ) VALUES (?, ?, ?, strftime(?, ?, '+8 hours'), 1, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (resolution, nas_ip, device, bucket) DO UPDATE SET
+                samples = samples + 1,
+                first_time = min(first_time, excluded.first_time),
+                read_min = min(coalesce(read_min, excluded.read_min), coalesce(excluded.read_min, read_min)),
+                read_max = max(coalesce(read_max, excluded.read_max), coalesce(excluded.read_max, read_max)),
+                written_min = min(coalesce(written_min, excluded.written_min),
+                                  coalesce(excluded.written_min, written_min)),
+                written_max = max(coalesce(written_max, excluded.written_max),
+                                  coalesce(excluded.written_max, written_max)),
+                read_last = CASE WHEN excluded.last_time >= last_time THEN excluded.read_last ELSE read_last END,
+                written_last = CASE WHEN excluded.last_time >= last_time
+                                    THEN excluded.written_last ELSE written_last END,
+                last_time = max(last_time, excluded.last_time)
+        ''', (resolution, nas_ip, device, bucket_format, timestamp, timestamp, timestamp,
+              read_gb, read_gb, read_gb, write_gb, write_gb, write_gb))
+
+
+def rebuild_smart_rollups(conn):
+    """根据 smart_records 重建汇总表（用于汇总表上线前的历史数据）"""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM smart_rollups")
+    rows = conn.execute('''
+        SELECT nas_ip, device, timestamp, data_units_read_gb, data_units_written_gb
+        FROM smart_records ORDER BY timestamp
+    ''').fetchall()
+    for row in rows:
+        update_smart_rollups(cursor, *row)
     conn.commit()
-    conn.close()
+    print(f"✅ 已根据 {len(rows)} 条历史记录重建 SMART 汇总表")
+
 
 def extract_data_units_gb(smart_dict):
     """
@@ -49,106 +239,505 @@ def extract_data_units_gb(smart_dict):
         return None, None
 
 
-def get_nas_smart_as_dict(nas_ip, nas_user, nas_password=None, timeout=60):
+class NasSmartError(Exception):
+    """获取 NAS SMART 信息失败"""
+
+    def __init__(self, message, device_invalid=False):
+        """
+        :param device_invalid: 是否为设备不存在或无效（区别于 SSH 连接、超时等传输错误）
+        """
+        super().__init__(message)
+        self.device_invalid = device_invalid
+
+
+def get_cached_device(db_path, nas_ip, ttl=None):
     """
-    通过 SSH 获取 NAS 磁盘的 SMART 信息，并返回 Python dict（使用 smartctl -j）
-    
-    返回:
-        (device: str, smart_dict: dict) 或 (None, None)
+    读取系统盘检测缓存
+    :param ttl: 缓存有效期（秒），默认 DEVICE_CACHE_TTL，过期返回 None
     """
-    print(f"正在连接 NAS ({nas_ip}) 并检测系统盘...")
+    ttl = DEVICE_CACHE_TTL if ttl is None else ttl
+    if not ttl:
+        return None
+    expire_before = (datetime.now(timezone.utc) - timedelta(seconds=ttl)).isoformat()
+    row = smart_db(db_path).execute(
+        "SELECT device FROM smart_device_cache WHERE nas_ip = ? AND detected_time >= ?", (nas_ip, expire_before)
+    ).fetchone()
+    return row[0] if row else None
 
-    # 设备检测脚本（同前）
-    detect_script = r'''
-root_dev=$(df / 2>/dev/null | awk 'NR==2 {print $1}')
-case "$root_dev" in
-    /dev/ada[0-9]*) echo "/dev/$(echo "$root_dev" | sed -E 's@/dev/(ada[0-9]+)p[0-9]*@\1@')" ;;
-    /dev/nvme[0-9]*n[0-9]*) echo "/dev/$(echo "$root_dev" | sed -E 's@/dev/(nvme[0-9]+n[0-9]+)p[0-9]*@\1@')" ;;
-    /dev/sd[a-z]*|/dev/hd[a-z]*) echo "/dev/$(echo "$root_dev" | sed -E 's@/dev/([a-z]+)[0-9]*@\1@')" ;;
-    *) echo "$root_dev" | sed 's/[0-9]*$//' ;;
+
+def save_cached_device(db_path, nas_ip, device):
+    """写入系统盘检测缓存"""
+    with smart_db(db_path).transaction() as conn:
+        conn.execute('''
+            INSERT INTO smart_device_cache (nas_ip, device, detected_time) VALUES (?, ?, ?)
+            ON CONFLICT (nas_ip) DO UPDATE SET device = excluded.device, detected_time = excluded.detected_time
+        ''', (nas_ip, device, datetime.now(timezone.utc).isoformat()))
+
+
+def invalidate_cached_device(db_path, nas_ip):
+    """清除系统盘检测缓存"""
+    with smart_db(db_path).transaction() as conn:
+        conn.execute("DELETE FROM smart_device_cache WHERE nas_ip = ?", (nas_ip,))
+
+
+def build_ssh_cmd(nas_password=None):
+    """
+    构建 SSH 命令（支持密码），开启 ControlMaster 时同一 NAS 的后续采样复用已认证的连接，免去握手
+    """
+    ssh_cmd = ["ssh", "-o", "StrictHostKeyChecking=no"]
+    if SSH_CONTROL_PERSIST:
+        SSH_CONTROL_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        ssh_cmd += [
+            "-o", "ControlMaster=auto",
+            # %C 为连接参数哈希，避免 socket 路径超长
+            "-o", f"ControlPath={SSH_CONTROL_DIR}/%C",
+            "-o", f"ControlPersist={SSH_CONTROL_PERSIST}",
+        ]
+    if nas_password:
+        ssh_cmd = ["sshpass", "-p", nas_password] + ssh_cmd
+    return ssh_cmd
+
+
+def build_smart_script(device=None):
+    """
+    远程脚本：检测系统盘并执行 smartctl，一次 SSH 调用完成
+    输出格式：首行 "__SMART_DEVICE__ <设备>"，其后为 smartctl -j 的 JSON，退出码为 smartctl 的退出码
+    :param device: 已知设备（来自检测缓存）时跳过检测，只执行 smartctl
+    """
+    if device:
+        return f'''
+dev={shlex.quote(device)}
+echo "{SMART_DEVICE_MARKER} $dev"
+sudo smartctl -j -a "$dev"
+'''
+    return f'''
+detect_device() {{
+{DETECT_DEVICE_SCRIPT}
+}}
+dev=$(detect_device)
+case "$dev" in
+    /dev/*) ;;
+    *) echo "未检测到有效设备: $dev" >&2; exit {NO_DEVICE_EXIT_CODE} ;;
 esac
+echo "{SMART_DEVICE_MARKER} $dev"
+sudo smartctl -j -a "$dev"
 '''
 
-    # 构建 SSH 命令（支持密码）
-    if nas_password:
-        ssh_cmd = ["sshpass", "-p", nas_password, "ssh", "-o", "StrictHostKeyChecking=no"]
-    else:
-        ssh_cmd = ["ssh", "-o", "StrictHostKeyChecking=no"]
 
-    try:
-        # 获取设备名
-        cmd = ssh_cmd + [f"{nas_user}@{nas_ip}", detect_script]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
-        if result.returncode != 0:
-            print(f"❌ 设备检测失败: {result.stderr}")
-            return None, None
+def parse_smart_output(stdout):
+    """解析远程脚本输出，返回 (device, smartctl 输出)，没有设备标记行时 device 为 None"""
+    lines = stdout.splitlines()
+    for index, line in enumerate(lines):
+        if line.startswith(SMART_DEVICE_MARKER):
+            return line[len(SMART_DEVICE_MARKER):].strip(), "\n".join(lines[index + 1:])
+    return None, stdout
 
-        lines = [l.strip() for l in result.stdout.splitlines() if l.strip()]
-        remote_disk = None
-        for line in reversed(lines):
-            if line.startswith("/dev/"):
-                remote_disk = line
-                break
-        if not remote_disk:
-            print("❌ 未检测到有效设备")
-            return None, None
 
-        print(f"检测到设备: {remote_disk}")
+def run_smart_script(nas_ip, nas_user, nas_password=None, timeout=60, device=None):
+    """
+    执行一次远程采集脚本，失败时抛出 NasSmartError
+    :param device: 已知设备时跳过检测
+    :return: (device, smart_dict)
+    """
+    if timeout <= 0:
+        raise NasSmartError(f"{nas_ip} 超时")
+    cmd = build_ssh_cmd(nas_password) + [f"{nas_user}@{nas_ip}", build_smart_script(device)]
+    # ControlPersist 的后台 master 进程会继承 stderr，使用临时文件避免管道等待其退出
+    with tempfile.TemporaryFile() as stderr_file:
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=stderr_file, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise NasSmartError(f"{nas_ip} 超时（{round(timeout, 1)}s）")
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode("utf-8", errors="replace").strip()
 
-        # 使用 smartctl -j 获取 JSON 格式输出（关键！）
-        json_cmd = f"sudo smartctl -j -a '{remote_disk}'"
-        cmd = ssh_cmd + [f"{nas_user}@{nas_ip}", json_cmd]
-        smart_result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode == SSH_ERROR_EXIT_CODE:
+        raise NasSmartError(f"{nas_ip} SSH 连接失败: {stderr}")
 
-        if smart_result.returncode != 0:
-            print(f"❌ smartctl 执行失败: {smart_result.stderr}")
-            return None, None
+    remote_disk, smart_output = parse_smart_output(result.stdout)
+    if remote_disk is None:
+        raise NasSmartError(f"设备检测失败: {stderr}", device_invalid=result.returncode == NO_DEVICE_EXIT_CODE)
+
+    if result.returncode != 0:
+        raise NasSmartError(
+            f"smartctl 执行失败: {stderr}", device_invalid=bool(result.returncode & SMARTCTL_DEVICE_ERROR_BITS)
+        )
 
+    try:
+        smart_dict = json.loads(smart_output)
+    except json.JSONDecodeError as e:
+        print("输出预览:", smart_output[:200])
+        raise NasSmartError(f"JSON 解析失败: {e}")
+    # 验证是否为有效 SMART JSON
+    if "smartctl_version" not in smart_dict and "device" not in smart_dict:
+        raise NasSmartError("返回内容不是有效 SMART JSON", device_invalid=True)
+    return remote_disk, smart_dict
+
+
+def fetch_nas_smart(nas_ip, nas_user, nas_password=None, timeout=60, db_path=None):
+    """
+    通过 SSH 获取 NAS 磁盘的 SMART 信息（使用 smartctl -j），失败时抛出 NasSmartError
+    设备检测和 smartctl 在同一次 SSH 调用中执行；传入 db_path 时使用设备检测缓存，
+    缓存命中只执行 smartctl（最多占用 CACHED_DEVICE_TIMEOUT_SHARE 的超时），失败时在剩余时间内重新检测；
+    只有 smartctl 报告设备不存在或无效时才清除缓存，SSH 连接、超时等传输错误不影响缓存
+    :param timeout: 单台 NAS 的超时（秒）
+    :param db_path: nas_smart.db 路径，用于设备检测缓存
+    :return: (device, smart_dict)
+    """
+    print(f"正在连接 NAS ({nas_ip}) 并采集系统盘 SMART 信息...")
+    deadline = time.monotonic() + timeout
+    cached_device = get_cached_device(db_path, nas_ip) if db_path else None
+    if cached_device:
         try:
-            smart_dict = json.loads(smart_result.stdout)
-            # 验证是否为有效 SMART JSON
-            if "smartctl_version" in smart_dict or "device" in smart_dict:
-                return remote_disk, smart_dict
-            else:
-                print("❌ 返回内容不是有效 SMART JSON")
-                return None, None
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON 解析失败: {e}")
-            print("输出预览:", smart_result.stdout[:200])
-            return None, None
+            cached_timeout = (deadline - time.monotonic()) * CACHED_DEVICE_TIMEOUT_SHARE
+            return run_smart_script(nas_ip, nas_user, nas_password, cached_timeout, device=cached_device)
+        except NasSmartError as e:
+            print(f"缓存设备 {cached_device} 采集失败，重新检测系统盘: {e}")
+            if e.device_invalid:
+                invalidate_cached_device(db_path, nas_ip)
+
+    remote_disk, smart_dict = run_smart_script(nas_ip, nas_user, nas_password, deadline - time.monotonic())
+    print(f"检测到设备: {remote_disk}")
+    if db_path:
+        save_cached_device(db_path, nas_ip, remote_disk)
+    return remote_disk, smart_dict
 
+
+def get_nas_smart_as_dict(nas_ip, nas_user, nas_password=None, timeout=60, db_path=None):
+    """
+    通过 SSH 获取 NAS 磁盘的 SMART 信息，并返回 Python dict（使用 smartctl -j）
+    
+    返回:
+        (device: str, smart_dict: dict) 或 (None, None)
+    """
+    try:
+        return fetch_nas_smart(nas_ip, nas_user, nas_password, timeout, db_path=db_path)
+    except NasSmartError as e:
+        print(f"❌ {e}")
+        return None, None
     except Exception as e:
         print(f"❌ 异常: {e}")
         return None, None
 
 
-def save_smart_dict_to_db(db_path, nas_ip, device, smart_dict):
-    """保存 SMART JSON + 计算后的 GB 值"""
-    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-    smart_json = json.dumps(smart_dict, ensure_ascii=False)
+def split_smart_dict(smart_dict):
+    """
+    拆分 smartctl JSON 为静态设备信息和变化字段
+    :return: (static_json, dynamic_dict)，static_json 为排序后的 JSON，相同设备信息得到相同哈希
+    """
+    static = {k: v for k, v in smart_dict.items() if k not in SMART_DYNAMIC_KEYS}
+    dynamic = {k: v for k, v in smart_dict.items() if k in SMART_DYNAMIC_KEYS}
+    return json.dumps(static, ensure_ascii=False, sort_keys=True), dynamic
 
-    read_gb, write_gb = extract_data_units_gb(smart_dict)
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+def save_device_info(cursor, nas_ip, device, static_json, dynamic_bytes, timestamp):
+    """
+    保存静态设备信息（已存在时不重复写入）
+    :return: (info_hash, zdict)
+    """
+    info_hash = hashlib.sha1(f"{nas_ip}|{device}|{static_json}".encode("utf-8")).hexdigest()
     cursor.execute('''
-        INSERT INTO smart_records (
-            nas_ip, device, smart_json, timestamp,
-            data_units_read_gb, data_units_written_gb
-        ) VALUES (?, ?, ?, ?, ?, ?)
-    ''', (nas_ip, device, smart_json, timestamp, read_gb, write_gb))
-    conn.commit()
-    record_id = cursor.lastrowid
-    conn.close()
-    return record_id
+        INSERT OR IGNORE INTO smart_device_info (info_hash, nas_ip, device, static_json, zdict, first_seen)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (info_hash, nas_ip, device, static_json, dynamic_bytes, timestamp))
+    zdict = cursor.execute("SELECT zdict FROM smart_device_info WHERE info_hash = ?", (info_hash,)).fetchone()[0]
+    return info_hash, zdict
+
+
+def compress_smart_dict(cursor, nas_ip, device, smart_dict, timestamp):
+    """split 模式下的存储字段：(smart_json, info_hash, smart_blob)"""
+    static_json, dynamic = split_smart_dict(smart_dict)
+    dynamic_bytes = json.dumps(dynamic, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    info_hash, zdict = save_device_info(cursor, nas_ip, device, static_json, dynamic_bytes, timestamp)
+    compressor = zlib.compressobj(9, zdict=zdict)
+    smart_blob = compressor.compress(dynamic_bytes) + compressor.flush()
+    return "", info_hash, smart_blob
+
+
+def load_smart_dict(db_path, record_id):
+    """读取一条记录的完整 smartctl JSON（兼容 full/split 两种存储）"""
+    row = smart_db(db_path).execute('''
+        SELECT r.smart_json, r.smart_blob, d.static_json, d.zdict
+        FROM smart_records r LEFT JOIN smart_device_info d ON r.info_hash = d.info_hash
+        WHERE r.id = ?
+    ''', (record_id,)).fetchone()
+    if row is None:
+        return None
+    smart_json, smart_blob, static_json, zdict = row
+    if smart_blob is None:
+        return json.loads(smart_json)
+    decompressor = zlib.decompressobj(zdict=zdict)
+    smart_dict = json.loads(static_json)
+    smart_dict.update(json.loads(decompressor.decompress(smart_blob) + decompressor.flush()))
+    return smart_dict
+
+
+def migrate_smart_json_storage(db_path, batch_size=500, vacuum=True):
+    """
+    将历史记录的完整 smart_json 迁移为 split 存储，分批提交，可重复执行（只处理未迁移的记录）
+    :param vacuum: 迁移后执行 VACUUM 回收磁盘空间
+    :return: 迁移的记录数
+    """
+    conn = smart_db(db_path).connection()
+    cursor = conn.cursor()
+    migrated = 0
+    last_id = 0
+    try:
+        while True:
+            rows = conn.execute('''
+                SELECT id, nas_ip, device, smart_json, timestamp FROM smart_records
+                WHERE id > ? AND smart_blob IS NULL ORDER BY id LIMIT ?
+            ''', (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            for record_id, nas_ip, device, smart_json, timestamp in rows:
+                last_id = record_id
+                try:
+                    smart_dict = json.loads(smart_json)
+                except (TypeError, json.JSONDecodeError):
+                    print(f"❌ 记录 {record_id} 的 smart_json 无法解析，保持原样")
+                    continue
+                cursor.execute(
+                    "UPDATE smart_records SET smart_json = ?, info_hash = ?, smart_blob = ? WHERE id = ?",
+                    (*compress_smart_dict(cursor, nas_ip, device, smart_dict, timestamp), record_id),
+                )
+                migrated += 1
+            conn.commit()
+            print(f"已迁移 {migrated} 条记录")
+        if vacuum and migrated:
+            conn.execute("VACUUM")
+            # WAL 模式下检查点后数据库文件才会缩小
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except Exception:
+        conn.rollback()
+        raise
+    print(f"✅ smart_json 存储迁移完成，共 {migrated} 条记录")
+    return migrated
+
+
+def utc_timestamp():
+    """数据库中 timestamp 的格式（UTC）"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def save_smart_records(db_path, samples, storage_mode=None):
+    """
+    批量保存 SMART 采样（同一事务内写入记录、设备信息和汇总）
+    :param samples: [(nas_ip, device, smart_dict)] 或 [(nas_ip, device, smart_dict, 采集时间)]，默认当前时间
+    :param storage_mode: split/full，默认 SMART_STORAGE_MODE
+    :return: 与 samples 对应的记录 ID 列表
+    """
+    now = utc_timestamp()
+    record_ids = []
+    with smart_db(db_path).transaction() as conn:
+        cursor = conn.cursor()
+        for sample in samples:
+            nas_ip, device, smart_dict = sample[:3]
+            timestamp = sample[3] if len(sample) > 3 else now
+            read_gb, write_gb = extract_data_units_gb(smart_dict)
+            if (storage_mode or SMART_STORAGE_MODE) == "split":
+                smart_json, info_hash, smart_blob = compress_smart_dict(cursor, nas_ip, device, smart_dict, timestamp)
+            else:
+                smart_json, info_hash, smart_blob = json.dumps(smart_dict, ensure_ascii=False), None, None
+            cursor.execute('''
+                INSERT INTO smart_records (
+                    nas_ip, device, smart_json, timestamp,
+                    data_units_read_gb, data_units_written_gb, info_hash, smart_blob
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (nas_ip, device, smart_json, timestamp, read_gb, write_gb, info_hash, smart_blob))
+            record_ids.append(cursor.lastrowid)
+            update_smart_rollups(cursor, nas_ip, device, timestamp, read_gb, write_gb)
+    return record_ids
+
+
+def save_smart_dict_to_db(db_path, nas_ip, device, smart_dict, storage_mode=None):
+    """
+    保存 SMART JSON + 计算后的 GB 值
+    :param storage_mode: split/full，默认 SMART_STORAGE_MODE
+    """
+    return save_smart_records(db_path, [(nas_ip, device, smart_dict)], storage_mode=storage_mode)[0]
+
+
+def to_utc_timestamp(value):
+    """
+    将查询时间转换为数据库中的 UTC 时间戳格式，便于直接按索引比较
+    :param value: ISO 格式时间，如 "2025-11-05 13:54:00"、"2025-11-05"，不带时区时按北京时间处理
+    :return: "%Y-%m-%dT%H:%M:%S.%fZ" 格式的 UTC 时间
+    """
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=DISPLAY_TZ)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def encode_cursor(timestamp, record_id):
+    """分页游标：最后一条记录的 (timestamp, id)"""
+    return base64.urlsafe_b64encode(json.dumps([timestamp, record_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """解析分页游标，格式错误时抛出 ValueError"""
+    try:
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(timestamp), int(record_id)
+    except Exception:
+        raise ValueError(f"无效的分页游标: {cursor}")
+
+
+def query_smart_records(db_path, nas_ip=None, device=None, start_time=None, end_time=None, cursor=None,
+                        limit=DEFAULT_PAGE_SIZE):
+    """
+    按时间倒序分页查询 SMART 记录（游标分页，翻页性能不随数据量下降）
+    :param nas_ip: NAS IP 过滤
+    :param device: 设备过滤
+    :param start_time: 开始时间（含），见 to_utc_timestamp
+    :param end_time: 结束时间（含）
+    :param cursor: 上一页返回的 next_cursor
+    :param limit: 每页条数
+    :return: {"items": [...], "next_cursor": 下一页游标，没有更多数据时为 None}
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    conditions = []
+    params = []
+    if nas_ip:
+        conditions.append("nas_ip = ?")
+        params.append(nas_ip)
+    if device:
+        conditions.append("device = ?")
+        params.append(device)
+    if start_time:
+        conditions.append("timestamp >= ?")
+        params.append(to_utc_timestamp(start_time))
+    if end_time:
+        conditions.append("timestamp <= ?")
+        params.append(to_utc_timestamp(end_time))
+    if cursor:
+        conditions.append("(timestamp, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    # 时间格式化在 SQL 中完成：UTC 转北京时间
+    # 格式化后的列不能与 timestamp 同名，否则 ORDER BY 按秒级字符串排序，与游标比较的原始时间不一致，也用不上索引
+    rows = smart_db(db_path).execute(f'''
+        SELECT id, nas_ip, device, timestamp,
+               COALESCE(strftime('%Y-%m-%d %H:%M:%S', timestamp, '+8 hours'), timestamp, 'N/A') AS display_time,
+               data_units_read_gb, data_units_written_gb
+        FROM smart_records
+        {where}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    ''', params + [limit + 1]).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    items = []
+    for row in rows:
+        item = dict(row)
+        item["timestamp"] = item.pop("display_time")
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def choose_resolution(db_path, nas_ip=None, device=None, start_time=None, end_time=None):
+    """根据查询时间范围自动选择粒度：raw（原始记录）/hour/day"""
+    if not start_time or not end_time:
+        # 未指定范围时取实际数据范围
+        conditions, params = _series_conditions(nas_ip, device, start_time, end_time, "timestamp", "timestamp")
+        first, last = smart_db(db_path).execute(
+            f"SELECT min(timestamp), max(timestamp) FROM smart_records {conditions}", params
+        ).fetchone()
+        if not first:
+            return "raw"
+        start = to_utc_timestamp(start_time) if start_time else first
+        end = to_utc_timestamp(end_time) if end_time else last
+    else:
+        start, end = to_utc_timestamp(start_time), to_utc_timestamp(end_time)
+    days = (datetime.fromisoformat(end.replace("Z", "+00:00"))
+            - datetime.fromisoformat(start.replace("Z", "+00:00"))).total_seconds() / 86400
+    for resolution, max_days in AUTO_RESOLUTION_DAYS:
+        if days <= max_days:
+            return resolution
+    return "day"
+
+
+def _series_conditions(nas_ip, device, start_time, end_time, start_column, end_column):
+    conditions = []
+    params = []
+    if nas_ip:
+        conditions.append("nas_ip = ?")
+        params.append(nas_ip)
+    if device:
+        conditions.append("device = ?")
+        params.append(device)
+    if start_time:
+        conditions.append(f"{end_column} >= ?")
+        params.append(to_utc_timestamp(start_time))
+    if end_time:
+        conditions.append(f"{start_column} <= ?")
+        params.append(to_utc_timestamp(end_time))
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+
+def query_smart_series(db_path, nas_ip=None, device=None, start_time=None, end_time=None, resolution="auto"):
+    """
+    查询读写量时间序列（用于图表），按时间升序
+    :param resolution: raw/hour/day，auto 时根据时间范围自动选择
+    :return: {"resolution": 实际粒度, "points": [{"time", "nas_ip", "device", "data_units_read_gb",
+              "data_units_written_gb", "write_rate_gb_per_hour", ...}]}
+              汇总粒度下读写量取桶内最后一次采样，并附带 samples/min/max
+    """
+    if resolution == "auto":
+        resolution = choose_resolution(db_path, nas_ip, device, start_time, end_time)
+    if resolution != "raw" and resolution not in ROLLUP_BUCKET_FORMATS:
+        raise ValueError(f"不支持的粒度: {resolution}")
+
+    if resolution == "raw":
+        conditions, params = _series_conditions(nas_ip, device, start_time, end_time, "timestamp", "timestamp")
+        sql = f'''
+            SELECT strftime('%Y-%m-%d %H:%M:%S', timestamp, '+8 hours') AS time, nas_ip, device,
+                   timestamp AS sample_time,
+                   data_units_read_gb, data_units_written_gb
+            FROM smart_records
+            {conditions}
+        '''
+    else:
+        conditions, params = _series_conditions(nas_ip, device, start_time, end_time, "first_time", "last_time")
+        conditions = f"{conditions} AND resolution = ?" if conditions else "WHERE resolution = ?"
+        params.append(resolution)
+        sql = f'''
+            SELECT bucket AS time, nas_ip, device, last_time AS sample_time,
+                   read_last AS data_units_read_gb, written_last AS data_units_written_gb,
+                   samples, read_min, read_max, written_min, written_max
+            FROM smart_rollups
+            {conditions}
+        '''
+
+    # 写入速率：与同一设备上一个点的写入量差值 / 间隔小时数
+    rows = smart_db(db_path).execute(f'''
+        SELECT *,
+               round((data_units_written_gb - lag(data_units_written_gb) OVER w)
+                     / nullif((julianday(sample_time) - julianday(lag(sample_time) OVER w)) * 24, 0), 3)
+                   AS write_rate_gb_per_hour
+        FROM ({sql})
+        WINDOW w AS (PARTITION BY nas_ip, device ORDER BY sample_time)
+        ORDER BY sample_time DESC
+        LIMIT ?
+    ''', params + [MAX_SERIES_POINTS]).fetchall()
+
+    points = []
+    for row in reversed(rows):
+        point = dict(row)
+        point.pop("sample_time")
+        points.append(point)
+    return {"resolution": resolution, "points": points}
 
 
 def fetch_and_store_smart_json(nas_ip, nas_user, nas_password=None, db_path=None):
-    """主函数：获取 SMART JSON 并存入 DB"""
-    if db_path is None:
-        db_path = "/Users/test/Minis/MyScripts/AutoPingCode/data/nas_smart.db"
-    init_db(db_path)
-    device, smart_dict = get_nas_smart_as_dict(nas_ip, nas_user, nas_password)
+    """主函数：获取 SMART JSON 并存入 DB（默认 <PROJECT_PATH>/data/nas_smart.db）"""
+    db_path = db_path or default_db_path()
+    device, smart_dict = get_nas_smart_as_dict(nas_ip, nas_user, nas_password, db_path=db_path)
     if device and smart_dict:
         record_id = save_smart_dict_to_db(db_path, nas_ip, device, smart_dict)
         print(f"✅ 完整 SMART 数据已存入 DB (ID: {record_id})")
@@ -158,8 +747,101 @@ def fetch_and_store_smart_json(nas_ip, nas_user, nas_password=None, db_path=None
         return None
 
 
+def default_db_path():
+    """默认数据库路径：<PROJECT_PATH>/data/nas_smart.db"""
+    from conf.global_conf import PROJECT_PATH
+
+    db_path = PROJECT_PATH / "data" / "nas_smart.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    return db_path
+
+
+def load_nas_inventory():
+    """
+    读取 NAS 清单 conf/nas_conf.py 中的 NAS_HOSTS，如:
+        NAS_HOSTS = [{"nas_ip": "192.168.1.66", "nas_user": "root", "nas_password": None}]
+    """
+    try:
+        from conf.nas_conf import NAS_HOSTS
+    except ImportError:
+        return []
+    return list(NAS_HOSTS)
+
+
+def collect_fleet_smart(hosts=None, max_workers=DEFAULT_FLEET_WORKERS, timeout=DEFAULT_HOST_TIMEOUT, db_path=None,
+                        progress_callback=None):
+    """
+    并发采集多台 NAS 的 SMART 信息并入库，单台失败不影响其他 NAS
+    :param hosts: [{"nas_ip", "nas_user", "nas_password"}]，默认读取 NAS 清单
+    :param max_workers: 最大并发数
+    :param timeout: 单台 NAS 超时（秒）
+    :param progress_callback: 进度回调，可作为异步任务执行
+    :return: {"count": NAS 数量, "success": [{"nas_ip", "device", "record_id", "elapsed"}],
+              "error": [{"nas_ip", "error"}]}
+    """
+    hosts = load_nas_inventory() if hosts is None else hosts
+    db_path = db_path or default_db_path()
+    result_set = {"count": len(hosts), "success": [], "error": []}
+    if not hosts:
+        return result_set
+
+    def probe(host):
+        start = time.monotonic()
+        device, smart_dict = fetch_nas_smart(
+            host["nas_ip"], host.get("nas_user") or "root", host.get("nas_password"), timeout=timeout, db_path=db_path
+        )
+        return device, smart_dict, utc_timestamp(), round(time.monotonic() - start, 3)
+
+    pending = []  # 待入库的采样 [(nas_ip, device, smart_dict, 采集时间, elapsed)]
+
+    def flush():
+        if not pending:
+            return
+        try:
+            record_ids = save_smart_records(db_path, [sample[:4] for sample in pending])
+            for (nas_ip, device, _, _, elapsed), record_id in zip(pending, record_ids):
+                result_set["success"].append(
+                    {"nas_ip": nas_ip, "device": device, "record_id": record_id, "elapsed": elapsed}
+                )
+        except Exception as e:
+            result_set["error"] += [{"nas_ip": sample[0], "error": f"入库失败: {e}"} for sample in pending]
+        pending.clear()
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(hosts))), thread_name_prefix="nas-smart")
+    try:
+        futures = {executor.submit(probe, host): host for host in hosts}
+        # SSH 在线程池中并发执行，入库在当前线程中按批次完成
+        for index, future in enumerate(as_completed(futures)):
+            nas_ip = futures[future]["nas_ip"]
+            try:
+                device, smart_dict, sample_time, elapsed = future.result()
+                pending.append((nas_ip, device, smart_dict, sample_time, elapsed))
+            except Exception as e:
+                result_set["error"].append({"nas_ip": nas_ip, "error": str(e)})
+            if len(pending) >= SMART_INSERT_BATCH:
+                flush()
+            if progress_callback:
+                progress_callback(current=index + 1, total=len(hosts), message=nas_ip, result=result_set)
+    finally:
+        # 任务取消时不再启动排队中的采集，已完成的采样仍然入库
+        executor.shutdown(wait=True, cancel_futures=True)
+        flush()
+
+    print(f"✅ 批量采集完成: 成功 {len(result_set['success'])} 台，失败 {len(result_set['error'])} 台")
+    return result_set
+
+
 # ===== 命令行入口 =====
 if __name__ == "__main__":
+    # 迁移历史记录: python3 -m utils.nas_utils migrate <DB_PATH>
+    if len(sys.argv) > 2 and sys.argv[1] == "migrate":
+        migrate_smart_json_storage(sys.argv[2])
+        sys.exit(0)
+    # 按 NAS 清单批量采集（可配置为定时任务）: python3 -m utils.nas_utils collect
+    if len(sys.argv) > 1 and sys.argv[1] == "collect":
+        fleet_result = collect_fleet_smart()
+        sys.exit(0 if not fleet_result["error"] else 1)
+
     # if len(sys.argv) < 3:
     #     print("用法: python3 nas_smart_json.py <NAS_IP> <USER> [PASSWORD]")
     #     sys.exit(1)
@@ -1,5 +1,6 @@
 from jsonpath import jsonpath  # noqa
 
+from conf import ping_code_conf
 from conf.ping_code_conf import (
     COOKIE,
     PING_CODE_BASE_URL,
@@ -9,27 +10,36 @@ from conf.ping_code_conf import (
     PING_CODE_BUG_STATUS_RES,
 )
 from utils.log_utils import logger
+from utils.profiling import traced
 from utils.request_utils import RetryableRequest
 from utils.utils import Utils
 
+# PingCode 附件下载服务地址
+PING_CODE_ATLAS_URL = "https://atlas.pingcode.com"
+# 缺陷视图的显示设置 id（查询视图内容时的 addon_setting_id），可在 conf/ping_code_conf.py 中配置
+PING_CODE_ADDON_SETTING_ID = getattr(ping_code_conf, "PING_CODE_ADDON_SETTING_ID", "6847a64c4c9434fbbce54bcf")
+
 
 class PingCodeClient:
     """
     PingCode客户端类，用于与PingCode系统进行交互
     """
 
-    def __init__(self, base_url=None, cookies=None):
+    def __init__(self, base_url=None, cookies=None, atlas_url=None):
         """
         初始化PingCode客户端
 
         Args:
             base_url (str): PingCode基础URL
+            atlas_url (str): 附件下载服务地址
         """
         self.base_url = base_url or PING_CODE_BASE_URL
+        self.atlas_url = atlas_url or PING_CODE_ATLAS_URL
         self.headers = {"Content-Type": "application/json", "Cookie": cookies or COOKIE}
 
         self.request_client = RetryableRequest(retries=3, backoff_factor=2)
 
+    @traced("pingcode.search")
     def search_bug_list(self, request_data=None):
         """
         搜索PingCode缺陷列表
@@ -38,7 +48,7 @@ class PingCodeClient:
             f"{self.base_url}/api/agile/projects/{PING_CODE_PROJECT_ID}/defect/views/{PING_CODE_VIEWS_ID}/content"
         )
         if request_data is None:
-            request_data = {"addon_setting_id": "6847a64c4c9434fbbce54bcf", "is_brief": 1, "pi": 0, "ps": 1000}
+            request_data = {"addon_setting_id": PING_CODE_ADDON_SETTING_ID, "is_brief": 1, "pi": 0, "ps": 1000}
 
         try:
             response = self.request_client.post(url=search_url, headers=self.headers, json=request_data, timeout=30)
@@ -47,6 +57,36 @@ class PingCodeClient:
             logger.error(f"搜索PingCode缺陷失败: {e}")
             return None
 
+    def search_all_bugs(self, page_size=1000):
+        """
+        分页获取视图下的全部缺陷
+
+        Args:
+            page_size (int): 每页数量
+
+        Returns:
+            list: 缺陷列表，获取失败返回 None
+        """
+        bugs = []
+        page_index = 0
+        while True:
+            request_data = {
+                "addon_setting_id": PING_CODE_ADDON_SETTING_ID,
+                "is_brief": 1,
+                "pi": page_index,
+                "ps": page_size,
+            }
+            res = self.search_bug_list(request_data)
+            if not res or not res.get("data"):
+                logger.error(f"获取PingCode缺陷列表失败（第 {page_index + 1} 页）: {res}")
+                return None
+            page_bugs = res.get("data", {}).get("value", [])
+            bugs += page_bugs
+            if len(page_bugs) < page_size:
+                return bugs
+            page_index += 1
+
+    @traced("pingcode.search")
     def search_bug_by_id(self, bug_id):
         """
         根据ID搜索PingCode缺陷
@@ -61,7 +101,7 @@ class PingCodeClient:
             f"{self.base_url}/api/agile/projects/{PING_CODE_PROJECT_ID}/defect/views/{PING_CODE_VIEWS_ID}/content"
         )
         search_data = {
-            "addon_setting_id": "6847a64c4c9434fbbce54bcf",
+            "addon_setting_id": PING_CODE_ADDON_SETTING_ID,
             "criteria": {
                 "search": {"keywords": "", "scopes": ["identifier", "title"]},
                 "condition_logic": 1,
@@ -89,6 +129,7 @@ class PingCodeClient:
             logger.error(f"搜索PingCode缺陷失败: {e}")
             return None
 
+    @traced("pingcode.comments")
     def get_bug_comments(self, bug_id):
         """
         获取缺陷的评论
@@ -119,7 +160,22 @@ class PingCodeClient:
             list: 格式化后的评论列表
         """
         comment_data = self.get_bug_comments(comment_id)
-        if not comment_data.get("data"):
+        return self.format_comment_data(comment_data, old_comment_data)
+
+    @staticmethod
+    @traced("comment.convert")
+    def format_comment_data(comment_data, old_comment_data=""):
+        """
+        将已获取的评论数据格式化给飞书，并判断是否需要更新
+
+        Args:
+            comment_data (dict): get_bug_comments 的返回数据
+            old_comment_data (str): 飞书中已有的评论
+
+        Returns:
+            list: 格式化后的评论列表，无需更新时为空
+        """
+        if not comment_data or not comment_data.get("data"):
             return []
 
         comment_value_list = comment_data.get("data", {}).get("value", [])
@@ -207,6 +263,7 @@ class PingCodeClient:
 
         return f"{self.base_url}/pjm/workitems/{short_id}"
 
+    @traced("pingcode.search")
     def get_bug_info(self, short_id):
         """
         获取缺陷信息
@@ -219,6 +276,7 @@ class PingCodeClient:
             logger.error(f"获取缺陷详情失败: {e}")
             return None
 
+    @traced("pingcode.update")
     def put_work_item_info(self, work_item_id, request_data):
         """
         更新工作项信息
@@ -237,6 +295,7 @@ class PingCodeClient:
             logger.error(f"更新工作项信息失败: {e}")
             return None
 
+    @traced("pingcode.sprints")
     def get_sprints_info(self, search_key_words=None):
         """
         获取迭代信息
@@ -252,6 +311,7 @@ class PingCodeClient:
             logger.error(f"搜索PingCode缺陷失败: {e}")
             return None
 
+    @traced("pingcode.image_token")
     def get_public_image_token(self):
         """
         获取项目信息
@@ -265,17 +325,19 @@ class PingCodeClient:
             logger.error(f"更新工作项信息失败: {e}")
             return None
 
+    @traced("pingcode.download")
     def download_attachment(self, _token):
         """
         下载附件  atlas.pingcode.com/file/download-url
         """
         try:
-            url = f"https://atlas.pingcode.com/file/download-url?action=download&token={_token}"
+            url = f"{self.atlas_url}/file/download-url?action=download&token={_token}"
             return self.request_client.get(url=url, headers=self.headers)
         except Exception as e:
             logger.error(f"下载附件失败: {e}")
             return None
 
+    @traced("pingcode.download")
     def download_image_as_base64(self, image_url):
         """下载图片并返回 Base64 data URI"""
         try:
@@ -295,6 +357,7 @@ class PingCodeClient:
             print(f"❌ 下载或编码图片失败: {e}")
             return None
 
+    @traced("html.convert")
     def process_html_with_tokenized_images(self, html_content):
         """获取 token → 替换所有 img src 为带 token 的 Base64"""
         token = self.get_public_image_token()
@@ -323,6 +386,7 @@ class PingCodeClient:
 
         return str(soup)
 
+    @traced("html.convert")
     def add_token_to_img_urls(self, html_content):
         """
         给 HTML 中所有 <img> 标签的 src URL 添加 token 参数
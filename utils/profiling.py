@@ -0,0 +1,156 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/20 16:30
+# @Author : Xumh
+"""
+轻量级分阶段耗时统计：span 可以嵌套，按名称（阶段）汇总次数和耗时
+未在 collect_trace 上下文中时 span 不做任何记录，可以直接埋在同步流程中
+阶段名称约定：pingcode.search、pingcode.comments、pingcode.download、html.convert、feishu.update 等
+"""
+import contextlib
+import contextvars
+import functools
+import itertools
+import threading
+import time
+
+# 单个 trace 保留的 span 明细上限，超过后只汇总不保留明细
+PROFILE_MAX_SPANS = 20000
+
+# 当前上下文的 tracer 和所在的 span id
+_current_tracer = contextvars.ContextVar("profile_tracer", default=None)
+_current_span = contextvars.ContextVar("profile_span", default=None)
+
+
+class Tracer:
+    """
+    收集 span 并按阶段汇总（线程安全）
+    其他线程中的 span（如写缓冲发出的飞书更新）会与主流程重叠，阶段耗时之和可能大于总耗时
+    """
+
+    def __init__(self, keep_spans=False, max_spans=PROFILE_MAX_SPANS):
+        """
+        :param keep_spans: 是否保留 span 明细（用于导出完整 trace），否则只汇总
+        :param max_spans: 保留的明细数量上限
+        """
+        self.keep_spans = keep_spans
+        self.max_spans = max_spans
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._start = time.perf_counter()
+        self._end = None
+        self.phases = {}  # name -> {"count", "total", "max"}
+        self.spans = []
+        self.dropped_spans = 0
+
+    def next_id(self):
+        return next(self._ids)
+
+    def add(self, span_id, parent_id, name, start, elapsed, attrs):
+        with self._lock:
+            phase = self.phases.get(name)
+            if phase is None:
+                phase = self.phases[name] = {"count": 0, "total": 0.0, "max": 0.0}
+            phase["count"] += 1
+            phase["total"] += elapsed
+            phase["max"] = max(phase["max"], elapsed)
+            if not self.keep_spans:
+                return
+            if len(self.spans) >= self.max_spans:
+                self.dropped_spans += 1
+                return
+            self.spans.append(
+                {
+                    "id": span_id,
+                    "parent": parent_id,
+                    "name": name,
+                    "start_ms": round((start - self._start) * 1000, 3),
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "thread": threading.current_thread().name,
+                    **({"attrs": attrs} if attrs else {}),
+                }
+            )
+
+    def finish(self):
+        self._end = self._end or time.perf_counter()
+
+    def summary(self):
+        """
+        :return: {"total_ms", "phases": {name: {"count", "total_ms", "avg_ms", "max_ms"}}}，阶段按总耗时倒序
+        """
+        total = (self._end or time.perf_counter()) - self._start
+        with self._lock:
+            phases = sorted(self.phases.items(), key=lambda item: item[1]["total"], reverse=True)
+            return {
+                "total_ms": round(total * 1000, 2),
+                "phases": {
+                    name: {
+                        "count": phase["count"],
+                        "total_ms": round(phase["total"] * 1000, 2),
+                        "avg_ms": round(phase["total"] / phase["count"] * 1000, 2),
+                        "max_ms": round(phase["max"] * 1000, 2),
+                    }
+                    for name, phase in phases
+                },
+            }
+
+    def dump(self):
+        """完整 trace：阶段汇总 + span 明细（parent 为上层 span 的 id）"""
+        data = self.summary()
+        with self._lock:
+            data["spans"] = list(self.spans)
+            data["dropped_spans"] = self.dropped_spans
+        return data
+
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """
+    记录一个阶段的耗时，可嵌套
+    :param name: 阶段名称
+    :param attrs: 附加信息（只在保留明细时记录），如 bug 编号
+    """
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield
+        return
+    span_id = tracer.next_id()
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+        tracer.add(span_id, parent_id, name, start, time.perf_counter() - start, attrs)
+
+
+def traced(name):
+    """装饰器：函数调用记为一个 span"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextlib.contextmanager
+def collect_trace(keep_spans=False):
+    """
+    在上下文中收集 span
+    在其他线程中执行的代码需通过 contextvars.copy_context() 传递上下文才会计入
+    :param keep_spans: 是否保留 span 明细
+    """
+    tracer = Tracer(keep_spans=keep_spans)
+    tracer_token = _current_tracer.set(tracer)
+    span_token = _current_span.set(None)
+    try:
+        yield tracer
+    finally:
+        tracer.finish()
+        _current_span.reset(span_token)
+        _current_tracer.reset(tracer_token)
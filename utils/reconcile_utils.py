@@ -0,0 +1,406 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/19 22:20
+# @Author : Xumh
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from utils.feishu_project_utils import FeiShuProjectUtils
+from utils.log_utils import logger
+from utils.ping_code_utils import PingCodeClient
+from utils.sqlite_db import get_sqlite_db
+from utils.sprint_registry import get_sprint_registry
+from utils.utils import Utils
+
+# 默认快照库路径：<项目根目录>/data/reconcile.db
+DEFAULT_RECONCILE_DB_PATH = Path(__file__).resolve().parent.parent / "data" / "reconcile.db"
+
+# 字段以哪一方为准：两边不一致时用该方的值覆盖另一方，两边自上次对账后都有修改（冲突）时也以该方为准
+FIELD_OWNERS = {"status": "pingcode", "comments": "pingcode", "url": "pingcode", "sprint": "feishu"}
+# 可写入飞书的字段（以 PingCode 为准时）及其飞书 bug 字段
+FEISHU_FIELD_KEYS = {"status": "field_9d59f3", "comments": "field_7f6e66", "url": "field_f18a13"}
+# 可写入 PingCode 的字段（以飞书为准时）
+PINGCODE_FIELDS = ["sprint"]
+# 用于判断冲突的快照列：(飞书快照列, PingCode 快照列)，评论只追加、链接只补全，不存在冲突
+CONFLICT_COLUMNS = {"status": ("status", "status"), "sprint": ("sprint_id", "sprint_id")}
+# 快照表的列
+FEISHU_SNAPSHOT_COLUMNS = [
+    "work_item_id",
+    "name",
+    "pc_bug_id",
+    "status",
+    "comments",
+    "url",
+    "sprint_id",
+    "snapshot_time",
+]
+PINGCODE_SNAPSHOT_COLUMNS = [
+    "pc_bug_id",
+    "item_id",
+    "short_id",
+    "status",
+    "sprint_id",
+    "updated_at",
+    "comments_json",
+    "snapshot_time",
+]
+SNAPSHOT_COLUMNS = {"feishu_bugs": FEISHU_SNAPSHOT_COLUMNS, "pingcode_bugs": PINGCODE_SNAPSHOT_COLUMNS}
+# PingCode 更新的并发数和每批数量（飞书更新走写缓冲，由写缓冲控制并发）
+RECONCILE_WORKERS = 4
+RECONCILE_BATCH = 50
+
+
+def init_reconcile_schema(conn):
+    """快照表：两边的 bug 按 PingCode 编号关联"""
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS feishu_bugs (
+            work_item_id TEXT PRIMARY KEY,
+            name TEXT,
+            pc_bug_id TEXT,
+            status TEXT,
+            comments TEXT,
+            url TEXT,
+            sprint_id TEXT,
+            snapshot_time TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_feishu_bugs_pc_bug_id ON feishu_bugs (pc_bug_id);
+        CREATE TABLE IF NOT EXISTS pingcode_bugs (
+            pc_bug_id TEXT PRIMARY KEY,
+            item_id TEXT,
+            short_id TEXT,
+            status TEXT,
+            sprint_id TEXT,
+            updated_at TEXT,
+            comments_json TEXT,
+            snapshot_time TEXT
+        );
+        """
+    )
+
+
+def check_field_owners(field_owners):
+    """校验字段归属：以 PingCode 为准的字段需可写入飞书，以飞书为准的字段需可写入 PingCode"""
+    writable = {"pingcode": FEISHU_FIELD_KEYS, "feishu": PINGCODE_FIELDS}
+    for field, owner in field_owners.items():
+        if owner not in writable:
+            raise ValueError(f"字段 {field} 的归属方 {owner} 无效，应为 pingcode 或 feishu")
+        if field not in writable[owner]:
+            raise ValueError(f"字段 {field} 不支持以 {owner} 为准同步")
+
+
+class Reconciler:
+    """
+    飞书项目与 PingCode 双向对账：
+    1. 两边的 bug 各全量拉取一次，写入本地快照表（PingCode 评论只在缺陷更新时间变化时重新获取）
+    2. 按 PingCode 编号关联，一次计算出需要修改的字段（状态、评论、链接、迭代）
+    3. 按 FIELD_OWNERS 决定方向，分批写入：飞书更新走写缓冲，PingCode 迭代更新有限并发
+    """
+
+    def __init__(
+        self, feishu_client=None, pcc=None, db_path=None, max_workers=RECONCILE_WORKERS, field_owners=None
+    ):
+        """
+        :param feishu_client: FeiShuProjectUtils 实例
+        :param pcc: PingCodeClient 实例
+        :param db_path: 快照库路径
+        :param max_workers: PingCode 更新并发数
+        :param field_owners: 字段以哪一方为准，默认 FIELD_OWNERS
+        """
+        self.field_owners = dict(field_owners or FIELD_OWNERS)
+        check_field_owners(self.field_owners)
+        self.feishu_client = feishu_client or FeiShuProjectUtils()
+        self.pcc = pcc or PingCodeClient()
+        self.db = get_sqlite_db(db_path or DEFAULT_RECONCILE_DB_PATH, schema_init=init_reconcile_schema)
+        self.max_workers = max_workers
+
+    def _load_snapshot(self, table, key):
+        return {row[key]: dict(row) for row in self.db.execute(f"SELECT * FROM {table}")}
+
+    def _save_snapshot(self, table, rows):
+        """用本次快照覆盖上次快照，本次没有记录时清空，避免下次对账与过期的快照比较"""
+        columns = SNAPSHOT_COLUMNS[table]
+        with self.db.transaction() as conn:
+            conn.execute(f"DELETE FROM {table}")
+            if rows:
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                    [[row.get(c) for c in columns] for row in rows.values()],
+                )
+
+    def snapshot_feishu(self):
+        """拉取飞书项目中关联了 PingCode 编号的 bug"""
+        request_data = {
+            "search_group": {
+                "search_params": [{"param_key": "field_e2c852", "value": "", "operator": "IS NOT NULL"}],
+                "conjunction": "AND",
+            },
+            "fields": ["field_e2c852", "field_9d59f3", "field_7f6e66", "field_f18a13", "planning_sprint"],
+        }
+        fs_bugs = self.feishu_client.search_work_item_all(work_item_type_key="issue", request_data=request_data)
+        snapshot_time = datetime.now().isoformat()
+        rows = {}
+        for bug in fs_bugs:
+            fields = bug.get("fields", [])
+            sprint_id = Utils.search_list_json(fields, "field_key", "planning_sprint").get("field_value")
+            if isinstance(sprint_id, list):
+                sprint_id = sprint_id[0] if sprint_id else None
+            pc_bug_id = Utils.search_list_json(fields, "field_alias", "pingcode_id").get("field_value") or ""
+            comments = Utils.search_list_json(fields, "field_alias", "pingcode_comments").get("field_value") or ""
+            rows[str(bug.get("id"))] = {
+                "work_item_id": str(bug.get("id")),
+                "name": bug.get("name"),
+                "pc_bug_id": pc_bug_id.strip(),
+                "status": Utils.search_list_json(fields, "field_alias", "pingcode_status").get("field_value"),
+                "comments": comments.replace("\\n", "\n").strip(),
+                "url": Utils.search_list_json(fields, "field_alias", "pingcode_url").get("field_value"),
+                "sprint_id": str(sprint_id) if sprint_id else None,
+                "snapshot_time": snapshot_time,
+            }
+        return rows
+
+    def snapshot_pingcode(self, previous, pc_bug_ids):
+        """
+        拉取 PingCode 缺陷，只为飞书中关联的缺陷获取评论，更新时间未变化的缺陷复用上次快照的评论
+        :param previous: 上次的 PingCode 快照
+        :param pc_bug_ids: 飞书中关联的 PingCode 编号
+        """
+        pc_bugs = self.pcc.search_all_bugs()
+        if pc_bugs is None:
+            raise Exception("获取PingCode缺陷列表失败")
+        # 视图中的 identifier 只有编号数字部分，飞书中为带项目标识的完整编号（如 SYYXX-123）
+        pc_bug_ids = {pc_bug_id.rsplit("-", 1)[-1]: pc_bug_id for pc_bug_id in pc_bug_ids if pc_bug_id}
+        snapshot_time = datetime.now().isoformat()
+        rows = {}
+        comment_fetch_count = 0
+        for pc_bug in pc_bugs:
+            pc_bug_id = pc_bug_ids.get(str(pc_bug.get("identifier")))
+            if pc_bug_id is None:
+                continue
+            old_row = previous.get(pc_bug_id) or {}
+            comments_json = old_row.get("comments_json")
+            if comments_json is None or old_row.get("updated_at") != str(pc_bug.get("updated_at")):
+                comment_data = self.pcc.get_bug_comments(pc_bug.get("_id"))
+                # 获取失败时不缓存，下次对账重新获取
+                comments_json = json.dumps(comment_data, ensure_ascii=False) if comment_data else None
+                comment_fetch_count += 1
+            rows[pc_bug_id] = {
+                "pc_bug_id": pc_bug_id,
+                "item_id": pc_bug.get("_id"),
+                "short_id": pc_bug.get("short_id"),
+                "status": self.pcc.get_bug_status_name(pc_bug.get("state_id")),
+                "sprint_id": pc_bug.get("sprint_id"),
+                "updated_at": str(pc_bug.get("updated_at")),
+                "comments_json": comments_json,
+                "snapshot_time": snapshot_time,
+            }
+        logger.info(f"PingCode 快照：{len(rows)} 个缺陷，重新获取评论 {comment_fetch_count} 个")
+        return rows
+
+    def load_sprint_map(self):
+        """飞书 sprint id -> 同名 PingCode 迭代 _id（来自 sprint 注册表缓存）"""
+        return get_sprint_registry().feishu_to_pingcode(self.feishu_client, self.pcc)
+
+    @staticmethod
+    def _changed(previous, current, key, field):
+        """字段自上次快照后是否有修改（没有上次快照时视为未修改）"""
+        return key in previous and previous[key].get(field) != current.get(field)
+
+    def _feishu_value(self, field, fs_row, pc_row):
+        """
+        以 PingCode 为准的字段需写入飞书的值
+        :return: (飞书字段值, 写入成功后飞书快照需更新的列)，无需写入返回 (None, None)
+        """
+        if field == "status":
+            if fs_row["status"] != pc_row["status"]:
+                return pc_row["status"], {"status": pc_row["status"]}
+        elif field == "url":
+            if not fs_row["url"]:
+                return self.pcc.get_bug_url(pc_row["short_id"]), None
+        elif field == "comments":
+            comment_data = json.loads(pc_row["comments_json"]) if pc_row["comments_json"] else None
+            comment_request_list = self.pcc.format_comment_data(comment_data, fs_row["comments"])
+            if comment_request_list:
+                return comment_request_list, None
+        return None, None
+
+    @staticmethod
+    def _pingcode_value(field, fs_row, pc_row, sprint_map):
+        """
+        以飞书为准的字段需写入 PingCode 的请求数据
+        :return: (请求数据, 写入成功后 PingCode 快照需更新的列)，无需写入返回 (None, None)
+        :raises ValueError: 飞书的值在 PingCode 中没有对应项
+        """
+        if field == "sprint":
+            # 飞书未规划 sprint 时不清空 PingCode 迭代
+            if not fs_row["sprint_id"]:
+                return None, None
+            pc_sprint_id = sprint_map.get(fs_row["sprint_id"])
+            if pc_sprint_id is None:
+                raise ValueError(f"PingCode中没有与飞书 sprint（{fs_row['sprint_id']}）同名的迭代")
+            if pc_sprint_id != pc_row["sprint_id"]:
+                return {"sprint_id": pc_sprint_id}, {"sprint_id": pc_sprint_id}
+        return None, None
+
+    def compute_diff(self, fs_rows, pc_rows, prev_fs, prev_pc, sprint_map):
+        """
+        一次计算两边需要修改的内容，每个字段的写入方向和冲突时的胜出方由 field_owners 决定
+        :return: {"feishu": [{"work_item_id", "pc_bug_id", "update_fields", "fields", "snapshot"}],
+                  "pingcode": [{"item_id", "pc_bug_id", "request_data", "fields", "snapshot"}],
+                  "conflicts": [...], "error": [...]}
+                 snapshot 为写入成功后快照需更新的列
+        """
+        diff = {"feishu": [], "pingcode": [], "conflicts": [], "error": []}
+        for work_item_id, fs_row in fs_rows.items():
+            pc_bug_id = fs_row["pc_bug_id"]
+            if not pc_bug_id:
+                diff["error"].append({f"飞书BUG（{fs_row['name']}）": "缺少PingCode编号"})
+                continue
+            pc_row = pc_rows.get(pc_bug_id)
+            if pc_row is None:
+                diff["error"].append({pc_bug_id: "PingCode中不存在该缺陷"})
+                continue
+
+            feishu_change = {
+                "work_item_id": work_item_id, "pc_bug_id": pc_bug_id, "update_fields": [], "fields": [], "snapshot": {}
+            }
+            pingcode_change = {
+                "item_id": pc_row["item_id"], "pc_bug_id": pc_bug_id, "request_data": {}, "fields": [], "snapshot": {}
+            }
+            for field, owner in self.field_owners.items():
+                if owner == "pingcode":
+                    value, snapshot = self._feishu_value(field, fs_row, pc_row)
+                    if value is None:
+                        continue
+                    change = feishu_change
+                    change["update_fields"].append({"field_key": FEISHU_FIELD_KEYS[field], "field_value": value})
+                else:
+                    try:
+                        request_data, snapshot = self._pingcode_value(field, fs_row, pc_row, sprint_map)
+                    except ValueError as e:
+                        diff["error"].append({pc_bug_id: str(e)})
+                        continue
+                    if request_data is None:
+                        continue
+                    change = pingcode_change
+                    change["request_data"].update(request_data)
+                change["fields"].append(field)
+                change["snapshot"].update(snapshot or {})
+
+                fs_column, pc_column = CONFLICT_COLUMNS.get(field, (None, None))
+                if (
+                    fs_column
+                    and self._changed(prev_fs, fs_row, work_item_id, fs_column)
+                    and self._changed(prev_pc, pc_row, pc_bug_id, pc_column)
+                ):
+                    diff["conflicts"].append({"pc_bug_id": pc_bug_id, "field": field, "winner": owner})
+            if feishu_change["fields"]:
+                diff["feishu"].append(feishu_change)
+            if pingcode_change["fields"]:
+                diff["pingcode"].append(pingcode_change)
+        return diff
+
+    def _put_pingcode(self, change):
+        res = self.pcc.put_work_item_info(change["item_id"], change["request_data"])
+        return change, res
+
+    def apply(self, diff, result_set, applied, progress_callback=None):
+        """
+        分批写入差异，每批结束后更新进度（可在批次之间取消）
+        :param applied: 写入成功的变更追加到该列表（取消时保留已写入的部分）
+        """
+        changes = [("feishu", c) for c in diff["feishu"]] + [("pingcode", c) for c in diff["pingcode"]]
+        total = len(changes)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="reconcile") as executor:
+            for start in range(0, total, RECONCILE_BATCH):
+                batch = changes[start : start + RECONCILE_BATCH]
+                futures = [
+                    (c, self.feishu_client.update_work_item_later("issue", c["work_item_id"], c))
+                    for side, c in batch
+                    if side == "feishu"
+                ]
+                pc_changes = [c for side, c in batch if side == "pingcode"]
+                # 在当前任务的上下文中发出请求，请求统计计入本任务
+                pc_results = executor.map(
+                    lambda context, c: context.run(self._put_pingcode, c),
+                    [contextvars.copy_context() for _ in pc_changes],
+                    pc_changes,
+                )
+                for change, future in futures:
+                    try:
+                        res = future.result()
+                    except Exception as e:
+                        res = {"err_code": -1, "err_msg": str(e)}
+                    if res.get("err_code"):
+                        result_set["error"].append({change["pc_bug_id"]: res})
+                    else:
+                        applied.append(change)
+                        result_set["success"].append({change["pc_bug_id"]: {"feishu": change["fields"]}})
+                for change, res in pc_results:
+                    if res and (res.get("data") or {}).get("value"):
+                        applied.append(change)
+                        result_set["success"].append({change["pc_bug_id"]: {"pingcode": change["fields"]}})
+                    else:
+                        result_set["error"].append({change["pc_bug_id"]: res})
+                if progress_callback:
+                    done = min(start + RECONCILE_BATCH, total)
+                    progress_callback(50 + int(50 * done / total), message=f"已写入 {done}/{total} 项差异")
+
+    def run(self, dry_run=False, progress_callback=None):
+        """
+        执行一次对账
+        :param dry_run: 只计算差异，不写入
+        :param progress_callback: 进度回调
+        :return: {"count": 关联的 bug 数, "success", "error", "diff": 各字段差异数, "conflicts", "dry_run"}
+        """
+        if progress_callback:
+            progress_callback(0, message="开始对账，拉取飞书项目 bug")
+        prev_fs = self._load_snapshot("feishu_bugs", "work_item_id")
+        prev_pc = self._load_snapshot("pingcode_bugs", "pc_bug_id")
+
+        fs_rows = self.snapshot_feishu()
+        if progress_callback:
+            progress_callback(20, message=f"飞书项目 bug {len(fs_rows)} 个，拉取 PingCode 缺陷")
+        pc_rows = self.snapshot_pingcode(prev_pc, {row["pc_bug_id"] for row in fs_rows.values()})
+        sprint_map = self.load_sprint_map()
+        if progress_callback:
+            progress_callback(45, message="计算差异")
+
+        diff = self.compute_diff(fs_rows, pc_rows, prev_fs, prev_pc, sprint_map)
+        field_counts = {field: 0 for field in self.field_owners}
+        for change in diff["feishu"] + diff["pingcode"]:
+            for field in change["fields"]:
+                field_counts[field] += 1
+        result_set = {
+            "count": len(fs_rows),
+            "success": [],
+            "error": list(diff["error"]),
+            "diff": field_counts,
+            "conflicts": diff["conflicts"],
+            "dry_run": dry_run,
+        }
+        logger.info(f"对账差异：{field_counts}，冲突 {len(diff['conflicts'])} 项")
+        if progress_callback:
+            progress_callback(50, message=f"差异：{field_counts}", result=result_set)
+
+        applied = []
+        try:
+            if dry_run:
+                result_set["changes"] = diff["feishu"] + diff["pingcode"]
+            else:
+                self.apply(diff, result_set, applied, progress_callback=progress_callback)
+        finally:
+            # 写入成功的值作为快照，下次对账据此判断两边是否各自有修改；dry_run 或取消时同样保存，复用已获取的评论
+            for change in applied:
+                if "item_id" in change:
+                    pc_rows[change["pc_bug_id"]].update(change["snapshot"])
+                else:
+                    fs_rows[change["work_item_id"]].update(change["snapshot"])
+            self._save_snapshot("feishu_bugs", fs_rows)
+            self._save_snapshot("pingcode_bugs", pc_rows)
+
+        if progress_callback:
+            progress_callback(100, message="对账完成", result=result_set)
+        return result_set
@@ -0,0 +1,304 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/20 14:00
+# @Author : Xumh
+import contextlib
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from utils.log_utils import logger
+
+# 请求耗时直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Prometheus 指标名前缀
+METRIC_PREFIX = "autopingcode_http_client"
+# 多进程部署（gunicorn 多 worker）时各进程定期把统计写入该目录，/metrics 汇总全部进程的文件后导出
+DEFAULT_METRICS_DIR = Path(__file__).resolve().parent.parent / "data" / "metrics"
+# 各进程写入统计文件的间隔（秒）
+METRICS_DUMP_INTERVAL = 5
+
+# 路径中视为 id 的片段：纯数字、24 位十六进制（PingCode _id）、较长的字母数字混合串（token、工作项 key 等）
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-f]{24}|(?=[A-Za-z_-]*\d)[A-Za-z0-9_-]{16,})$")
+# PingCode 编号，如 SYYXX-123
+_IDENTIFIER_SEGMENT = re.compile(r"^[A-Z][A-Z0-9]*-\d+$")
+
+
+def route_template(url):
+    """
+    将请求地址归一为 (host, 路由模板)，路径中的 id 替换为 {id}，避免每个工作项单独成为一个序列
+    如 https://project.feishu.cn/open_api/abc/work_item/issue/12345
+    -> ("project.feishu.cn", "/open_api/abc/work_item/issue/{id}")
+    """
+    parts = urlsplit(url)
+    segments = []
+    for segment in parts.path.split("/"):
+        if _ID_SEGMENT.match(segment) or _IDENTIFIER_SEGMENT.match(segment):
+            segment = "{id}"
+        segments.append(segment)
+    return parts.netloc, "/".join(segments) or "/"
+
+
+class EndpointStats:
+    """单个 (host, method, 路由模板) 的统计"""
+
+    def __init__(self):
+        self.count = 0
+        self.retries = 0
+        self.errors = 0  # 最终失败（HTTP 错误状态或连接异常）的请求数
+        self.status = {}  # 状态码 -> 次数，连接异常记为 "error"
+        self.response_bytes = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # 最后一个桶为 +Inf
+
+    def add(self, status, elapsed, retries, response_bytes, failed):
+        self.count += 1
+        self.retries += retries
+        self.errors += int(failed)
+        self.status[status] = self.status.get(status, 0) + 1
+        self.response_bytes += response_bytes
+        self.latency_sum += elapsed
+        self.latency_max = max(self.latency_max, elapsed)
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound), len(LATENCY_BUCKETS))
+        self.buckets[index] += 1
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "retries": self.retries,
+            "errors": self.errors,
+            "status": [[status, count] for status, count in self.status.items()],
+            "response_bytes": self.response_bytes,
+            "latency_sum": self.latency_sum,
+            "latency_max": self.latency_max,
+            "buckets": self.buckets,
+        }
+
+    def merge(self, data):
+        """累加另一进程导出的统计（to_dict 的结果）"""
+        self.count += data["count"]
+        self.retries += data["retries"]
+        self.errors += data["errors"]
+        for status, count in data["status"]:
+            self.status[status] = self.status.get(status, 0) + count
+        self.response_bytes += data["response_bytes"]
+        self.latency_sum += data["latency_sum"]
+        self.latency_max = max(self.latency_max, data["latency_max"])
+        self.buckets = [a + b for a, b in zip(self.buckets, data["buckets"])]
+
+    def quantile(self, q):
+        """按直方图估算分位数（取所在桶的上界，落在 +Inf 桶时取最大值）"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (None,), self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return self.latency_max if bound is None else min(bound, self.latency_max)
+        return self.latency_max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "retries": self.retries,
+            "errors": self.errors,
+            "status": {str(k): v for k, v in self.status.items()},
+            "response_bytes": self.response_bytes,
+            "avg_ms": round(self.latency_sum / self.count * 1000, 2) if self.count else 0,
+            "p50_ms": round(self.quantile(0.5) * 1000, 2),
+            "p95_ms": round(self.quantile(0.95) * 1000, 2),
+            "max_ms": round(self.latency_max * 1000, 2),
+        }
+
+
+class RequestMetrics:
+    """按 host、method、路由模板聚合的 HTTP 请求统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}  # (host, method, route) -> EndpointStats
+
+    def record(self, method, url, status, elapsed, retries=0, response_bytes=0):
+        """
+        记录一次请求（包含重试在内的完整调用）
+        :param status: 最终状态码，连接异常等没有响应时传 "error"
+        :param elapsed: 耗时（秒），包含重试和退避等待
+        :param retries: 重试次数
+        """
+        host, route = route_template(url)
+        failed = not isinstance(status, int) or status >= 400
+        with self._lock:
+            stats = self._endpoints.get((host, method, route))
+            if stats is None:
+                stats = self._endpoints[(host, method, route)] = EndpointStats()
+            stats.add(status, elapsed, retries, response_bytes, failed)
+
+    def summary(self):
+        """
+        :return: {"requests", "retries", "errors", "response_bytes", "endpoints": {"METHOD host路由模板": {...}}}
+        """
+        with self._lock:
+            endpoints = {
+                f"{method} {host}{route}": stats.summary()
+                for (host, method, route), stats in sorted(self._endpoints.items())
+            }
+        return {
+            "requests": sum(e["count"] for e in endpoints.values()),
+            "retries": sum(e["retries"] for e in endpoints.values()),
+            "errors": sum(e["errors"] for e in endpoints.values()),
+            "response_bytes": sum(e["response_bytes"] for e in endpoints.values()),
+            "endpoints": endpoints,
+        }
+
+    def to_prometheus(self):
+        """导出为 Prometheus 文本格式"""
+        lines = [
+            f"# HELP {METRIC_PREFIX}_requests_total HTTP requests by endpoint and final status.",
+            f"# TYPE {METRIC_PREFIX}_requests_total counter",
+        ]
+        retry_lines = [
+            f"# HELP {METRIC_PREFIX}_retries_total HTTP retries by endpoint.",
+            f"# TYPE {METRIC_PREFIX}_retries_total counter",
+        ]
+        bytes_lines = [
+            f"# HELP {METRIC_PREFIX}_response_bytes_total HTTP response body bytes by endpoint.",
+            f"# TYPE {METRIC_PREFIX}_response_bytes_total counter",
+        ]
+        latency_lines = [
+            f"# HELP {METRIC_PREFIX}_request_duration_seconds HTTP request latency including retries.",
+            f"# TYPE {METRIC_PREFIX}_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (host, method, route), stats in sorted(self._endpoints.items()):
+                labels = f'host="{_escape(host)}",method="{method}",route="{_escape(route)}"'
+                for status, count in sorted(stats.status.items(), key=lambda item: str(item[0])):
+                    lines.append(f'{METRIC_PREFIX}_requests_total{{{labels},status="{status}"}} {count}')
+                retry_lines.append(f"{METRIC_PREFIX}_retries_total{{{labels}}} {stats.retries}")
+                bytes_lines.append(f"{METRIC_PREFIX}_response_bytes_total{{{labels}}} {stats.response_bytes}")
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats.buckets):
+                    cumulative += count
+                    latency_lines.append(
+                        f'{METRIC_PREFIX}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                    )
+                latency_lines.append(f"{METRIC_PREFIX}_request_duration_seconds_sum{{{labels}}} {stats.latency_sum}")
+                latency_lines.append(f"{METRIC_PREFIX}_request_duration_seconds_count{{{labels}}} {stats.count}")
+        return "\n".join(lines + retry_lines + bytes_lines + latency_lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def to_dict(self):
+        """导出为可 JSON 序列化的数据，用于多进程汇总"""
+        with self._lock:
+            return [
+                {"host": host, "method": method, "route": route, **stats.to_dict()}
+                for (host, method, route), stats in self._endpoints.items()
+            ]
+
+    def merge(self, endpoints):
+        """累加 to_dict 导出的统计"""
+        with self._lock:
+            for data in endpoints:
+                key = (data["host"], data["method"], data["route"])
+                stats = self._endpoints.get(key)
+                if stats is None:
+                    stats = self._endpoints[key] = EndpointStats()
+                stats.merge(data)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# 进程内全局统计，供 /metrics 接口导出
+_request_metrics = RequestMetrics()
+# 当前上下文（任务）的统计，由 collect_request_metrics 设置
+_task_metrics = contextvars.ContextVar("task_request_metrics", default=None)
+
+
+def get_request_metrics():
+    return _request_metrics
+
+
+# 本进程的统计文件名：pid + 启动时间，避免 pid 复用时覆盖已退出进程的统计导致计数回退
+_metrics_file_name = f"{os.getpid()}-{int(time.time() * 1000)}.json"
+_metrics_dump_lock = threading.Lock()
+_metrics_dump_thread = None
+
+
+def dump_request_metrics(metrics_dir=None):
+    """将本进程的统计写入统计目录（先写临时文件再替换，汇总时不会读到写了一半的文件）"""
+    metrics_dir = Path(metrics_dir or DEFAULT_METRICS_DIR)
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    path = metrics_dir / _metrics_file_name
+    tmp_path = path.with_suffix(".tmp")
+    with _metrics_dump_lock:
+        tmp_path.write_text(json.dumps(_request_metrics.to_dict()), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def load_request_metrics(metrics_dir=None):
+    """
+    汇总统计目录中所有进程（包括已退出的 worker）的统计，计数不会因为请求落到不同 worker 或 worker 重启而回退
+    :return: RequestMetrics
+    """
+    metrics = RequestMetrics()
+    for path in sorted(Path(metrics_dir or DEFAULT_METRICS_DIR).glob("*.json")):
+        try:
+            metrics.merge(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"读取请求统计文件失败 {path}: {e}")
+    return metrics
+
+
+def clear_request_metrics(metrics_dir=None):
+    """清空统计目录，服务（gunicorn master）启动时调用，计数从 0 开始"""
+    for path in Path(metrics_dir or DEFAULT_METRICS_DIR).glob("*.*"):
+        path.unlink(missing_ok=True)
+
+
+def start_request_metrics_dump(metrics_dir=None, interval=METRICS_DUMP_INTERVAL):
+    """启动后台线程定期写入本进程的统计（重复调用无副作用）"""
+    global _metrics_dump_thread
+
+    def dump_loop():
+        while True:
+            time.sleep(interval)
+            try:
+                dump_request_metrics(metrics_dir)
+            except Exception as e:
+                logger.error(f"写入请求统计文件失败: {e}")
+
+    with _metrics_dump_lock:
+        if _metrics_dump_thread is not None:
+            return
+        _metrics_dump_thread = threading.Thread(target=dump_loop, name="request-metrics-dump", daemon=True)
+    _metrics_dump_thread.start()
+
+
+def record_request(method, url, status, elapsed, retries=0, response_bytes=0):
+    """记录到全局统计，以及当前上下文中正在收集的任务统计"""
+    _request_metrics.record(method, url, status, elapsed, retries, response_bytes)
+    task_metrics = _task_metrics.get()
+    if task_metrics is not None:
+        task_metrics.record(method, url, status, elapsed, retries, response_bytes)
+
+
+@contextlib.contextmanager
+def collect_request_metrics():
+    """
+    在上下文中单独收集请求统计（用于任务结果中的请求摘要）
+    在其他线程中发出的请求需通过 contextvars.copy_context() 传递上下文才会计入
+    """
+    metrics = RequestMetrics()
+    token = _task_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _task_metrics.reset(token)
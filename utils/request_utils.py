@@ -1,16 +1,19 @@
 # --*-- conding:utf-8 --*--
 # @Time : 2025/03/06 10:04
 # @Author : Xumh
+import time
 from types import TracebackType
 
 import requests
 from urllib3 import BaseHTTPResponse  # noqa
+from urllib3.exceptions import MaxRetryError
 from urllib3.connectionpool import ConnectionPool
 from urllib3.util import Retry
 from requests.adapters import HTTPAdapter
 
 from conf.global_conf import REQUEST_TIMEOUT
 from utils.log_utils import logger
+from utils.request_metrics import record_request
 
 
 class LoggingRetry(Retry):
@@ -61,6 +64,7 @@ class LoggingRetry(Retry):
 
 class RetryableRequest:
     def __init__(self, retries=3, backoff_factor=1):
+        self.retries = retries
         self.session = requests.Session()
 
         # 配置重试策略
@@ -83,11 +87,14 @@ class RetryableRequest:
         :param url: 请求地址
         :param kwargs: 其他requests参数
         """
+        start = time.perf_counter()
+        response = error = None
         try:
             response = self.session.request(method=method, url=url, **kwargs)
             response.raise_for_status()
             return response
         except requests.exceptions.RequestException as e:
+            response, error = e.response, e
             # 记录详细的错误信息
             logger.error(f"Request failed after retries")
             logger.error(f"  Method: {method}")
@@ -111,6 +118,32 @@ class RetryableRequest:
                 logger.error(f"  Response Body: {e.response.text[:500]}")  # 只记录前500字符
             
             raise Exception(f"Request failed after retries: {str(e)}") from e
+        finally:
+            self._record_metrics(method, url, response, error, time.perf_counter() - start, kwargs.get("stream"))
+
+    def _record_metrics(self, method, url, response, error, elapsed, stream=False):
+        """
+        记录请求统计：耗时（含重试和退避）、重试次数、最终状态码、响应字节数
+        :param response: 最终响应，重试耗尽或连接异常时为 None
+        :param error: 请求异常
+        """
+        try:
+            if response is None:
+                # 重试耗尽时 requests 抛出的异常包装了 MaxRetryError，没有可用的重试记录，按重试上限统计
+                reason = error.args[0] if error is not None and error.args else None
+                retries = self.retries if isinstance(reason, MaxRetryError) else 0
+                record_request(method, url, "error", elapsed, retries)
+                return
+            retry = getattr(response.raw, "retries", None)
+            retries = len(retry.history) if retry is not None else 0
+            if stream:
+                # 流式下载不读取响应体，按 Content-Length 统计
+                response_bytes = int(response.headers.get("Content-Length") or 0)
+            else:
+                response_bytes = len(response.content or b"")
+            record_request(method, url, response.status_code, elapsed, retries, response_bytes)
+        except Exception as e:
+            logger.warning(f"记录请求统计失败: {e}")
 
     # 快捷方法
     def get(self, url, **kwargs):
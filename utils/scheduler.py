@@ -0,0 +1,319 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/19 20:10
+# @Author : Xumh
+import random
+import threading
+from datetime import datetime, timedelta
+
+from utils.log_utils import logger
+
+# 调度线程检查间隔（秒）
+TICK_INTERVAL = 15
+# 调度主实例租约名称，多 worker 部署时只有持有租约的实例触发定时任务
+LEADER_LEASE = "scheduler"
+
+
+class CronExpression:
+    """
+    5 段 cron 表达式：分 时 日 月 周（周日为 0 或 7），支持 *、列表、范围和步长，如 "*/30 8-20 * * 1-5"
+    日和周都不是 * 时，满足其一即可（与 crontab 一致）；时间按服务器本地时间计算
+    """
+
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expr):
+        self.expr = expr
+        parts = expr.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron 表达式需为 5 段（分 时 日 月 周）: {expr}")
+        fields = [self._parse_field(part, low, high) for part, (low, high) in zip(parts, self.FIELD_RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = fields
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = parts[2] == "*"
+        self.any_weekday = parts[4] == "*"
+
+    @staticmethod
+    def _parse_field(part, low, high):
+        values = set()
+        for item in part.split(","):
+            value_range, _, step = item.partition("/")
+            if value_range == "*":
+                start, end = low, high
+            elif "-" in value_range:
+                start, end = (int(v) for v in value_range.split("-", 1))
+            else:
+                start = int(value_range)
+                end = high if step else start
+            step = int(step) if step else 1
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"cron 字段超出范围 [{low}-{high}]: {part}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        day_match = moment.day in self.days
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+    def next_time(self, after):
+        """after 之后（不含）的下一个触发时间"""
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # 跨闰年的 2 月 29 日等表达式最多向后查找 5 年
+        limit = moment + timedelta(days=5 * 366)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"cron 表达式没有可触发的时间: {self.expr}")
+
+
+class Schedule:
+    def __init__(self, name, kind, args=None, kwargs=None, interval=None, cron=None, jitter=0, dedup_key=None):
+        """
+        :param name: 定时任务名称（唯一）
+        :param kind: 通过 ThreadUtils.register_task 注册的任务类型
+        :param args: 任务参数（需可 JSON 序列化）
+        :param kwargs: 任务关键字参数
+        :param interval: 执行间隔（秒），与 cron 二选一
+        :param cron: cron 表达式
+        :param jitter: 随机延后的最大秒数，避免多个任务同时触发集中消耗接口配额
+        :param dedup_key: 去重键，相同键的任务（含手动触发的）还在执行时跳过本次，默认为 kind:参数
+        """
+        if (interval is None) == (cron is None):
+            raise ValueError(f"定时任务 {name} 需指定 interval 或 cron 之一")
+        self.name = name
+        self.kind = kind
+        self.args = list(args or [])
+        self.kwargs = dict(kwargs or {})
+        self.interval = interval
+        self.cron = CronExpression(cron) if cron else None
+        self.jitter = jitter or 0
+        self.dedup_key = dedup_key or ":".join([kind] + [str(arg) for arg in self.args])
+
+    def next_run_after(self, moment):
+        """计算 moment 之后的下次运行时间（含随机延后）"""
+        if self.cron:
+            next_run = self.cron.next_time(moment)
+        else:
+            next_run = moment + timedelta(seconds=self.interval)
+        if self.jitter:
+            next_run += timedelta(seconds=random.uniform(0, self.jitter))
+        return next_run
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "args": self.args,
+            "kwargs": self.kwargs,
+            "interval": self.interval,
+            "cron": self.cron.expr if self.cron else None,
+            "jitter": self.jitter,
+            "dedup_key": self.dedup_key,
+        }
+
+
+class Scheduler:
+    """
+    定时调度：按 interval/cron 通过 ThreadUtils 提交已注册的任务
+    - 同一去重键的任务还在执行时跳过本次（skip-if-running），不会排队堆积
+    - 多 worker 部署时通过任务存储中的租约选出一个主实例触发任务，主实例退出后其他实例在租约过期后接管
+    - 下次运行时间、上次耗时等状态保存在任务存储中，所有实例查询结果一致，重启后不会立即重跑
+    """
+
+    def __init__(self, thread_utils, schedules=None, tick_interval=TICK_INTERVAL):
+        """
+        :param thread_utils: ThreadUtils 实例，定时任务的类型需已注册
+        :param schedules: 定时任务配置列表，字段见 Schedule
+        :param tick_interval: 检查间隔（秒）
+        """
+        self.thread_utils = thread_utils
+        self.task_store = thread_utils.task_store
+        self.owner = thread_utils.instance_id
+        self.tick_interval = tick_interval
+        self.lease_ttl = tick_interval * 3
+        self.schedules = {}
+        self.is_leader = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        for spec in schedules or []:
+            self.add_schedule(**spec)
+
+    def add_schedule(self, name, kind, enabled=True, **kwargs):
+        """
+        添加定时任务
+        :param enabled: 初始是否启用，之后以接口设置的状态为准
+        """
+        schedule = Schedule(name, kind, **kwargs)
+        self.schedules[name] = schedule
+        if not enabled and name not in self._load_states():
+            self.task_store.set_schedule_enabled(name, False)
+        return schedule
+
+    def _load_states(self):
+        try:
+            return self.task_store.get_schedules()
+        except Exception as e:
+            logger.error(f"读取定时任务状态失败: {e}")
+            return {}
+
+    def _acquire_leadership(self, now):
+        try:
+            expires = (now + timedelta(seconds=self.lease_ttl)).isoformat()
+            self.is_leader = self.task_store.acquire_lease(LEADER_LEASE, self.owner, expires, now.isoformat())
+        except Exception as e:
+            logger.error(f"获取调度租约失败: {e}")
+            self.is_leader = False
+        return self.is_leader
+
+    def _refresh_last_run(self, state):
+        """补充上次运行的状态和耗时（任务结束后）"""
+        task_id = state.get("last_task_id")
+        if not task_id or state.get("last_duration") is not None:
+            return state
+        task_status = self.thread_utils.get_task_status(task_id)
+        if task_status is None:
+            return state
+        state = dict(state, last_status=task_status["status"])
+        if task_status.get("end_time") and task_status.get("start_time"):
+            duration = datetime.fromisoformat(task_status["end_time"]) - datetime.fromisoformat(
+                task_status["start_time"]
+            )
+            state["last_duration"] = round(duration.total_seconds(), 3)
+        return state
+
+    def _submit(self, schedule, state, now):
+        """
+        提交任务，同一去重键的任务还在执行时跳过
+        :return: (新的运行状态, task_id)，跳过时 task_id 为 None
+        """
+        running_task_id = self.thread_utils.find_active_task(schedule.dedup_key)
+        if running_task_id:
+            logger.info(f"定时任务 {schedule.name} 上次运行（{running_task_id}）尚未结束，跳过本次")
+            state = dict(state, skipped_count=state.get("skipped_count", 0) + 1, last_skipped_time=now.isoformat())
+            return state, None
+
+        task_id = self.thread_utils.submit_task(
+            schedule.kind, *schedule.args, dedup_key=schedule.dedup_key, **schedule.kwargs
+        )
+        logger.info(f"定时任务 {schedule.name} 已提交: {task_id}")
+        state = dict(
+            state,
+            last_task_id=task_id,
+            last_run_time=now.isoformat(),
+            last_status="pending",
+            last_duration=None,
+            run_count=state.get("run_count", 0) + 1,
+        )
+        return state, task_id
+
+    def tick(self, now=None):
+        """
+        检查并触发到期的定时任务，非主实例不触发
+        :return: 本次提交的 task_id 列表
+        """
+        now = now or datetime.now()
+        if not self._acquire_leadership(now):
+            return []
+        submitted = []
+        states = self._load_states()
+        for name, schedule in list(self.schedules.items()):
+            stored = states.get(name, {"state": {}, "enabled": True})
+            state = self._refresh_last_run(dict(stored["state"]))
+            next_run = state.get("next_run_time")
+            if next_run is None:
+                # 首次调度（或新增的定时任务）从现在开始计算，不立即执行
+                state["next_run_time"] = schedule.next_run_after(now).isoformat()
+            elif datetime.fromisoformat(next_run) <= now:
+                if stored["enabled"]:
+                    state, task_id = self._submit(schedule, state, now)
+                    if task_id:
+                        submitted.append(task_id)
+                state["next_run_time"] = schedule.next_run_after(now).isoformat()
+            if state != stored["state"]:
+                self.task_store.save_schedule(name, state)
+        return submitted
+
+    def _loop(self):
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"定时调度执行失败: {e}")
+            if self._stopping.wait(self.tick_interval):
+                break
+
+    def start(self):
+        """启动调度线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="task-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"定时调度已启动，共 {len(self.schedules)} 个定时任务")
+
+    def stop(self):
+        """停止调度线程并释放主实例租约，其他实例可立即接管"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.tick_interval)
+        try:
+            self.task_store.release_lease(LEADER_LEASE, self.owner)
+        except Exception as e:
+            logger.error(f"释放调度租约失败: {e}")
+        self.is_leader = False
+
+    def run_now(self, name):
+        """
+        立即运行定时任务（不影响下次运行时间），同一去重键的任务还在执行时返回该任务
+        :return: task_id，定时任务不存在返回 None
+        """
+        schedule = self.schedules.get(name)
+        if schedule is None:
+            return None
+        return self.thread_utils.submit_task(
+            schedule.kind, *schedule.args, dedup_key=schedule.dedup_key, **schedule.kwargs
+        )
+
+    def set_enabled(self, name, enabled):
+        """
+        启用/暂停定时任务，所有实例共享
+        :return: 定时任务是否存在
+        """
+        if name not in self.schedules:
+            return False
+        self.task_store.set_schedule_enabled(name, enabled)
+        return True
+
+    def get_schedules(self):
+        """定时任务列表：配置、是否启用、下次运行时间、上次运行的任务/状态/耗时、跳过次数"""
+        states = self._load_states()
+        result = []
+        for name, schedule in self.schedules.items():
+            stored = states.get(name, {"state": {}, "enabled": True})
+            state = self._refresh_last_run(stored["state"])
+            result.append(
+                {
+                    **schedule.to_dict(),
+                    "enabled": stored["enabled"],
+                    "next_run_time": state.get("next_run_time"),
+                    "last_run_time": state.get("last_run_time"),
+                    "last_task_id": state.get("last_task_id"),
+                    "last_status": state.get("last_status"),
+                    "last_duration": state.get("last_duration"),
+                    "run_count": state.get("run_count", 0),
+                    "skipped_count": state.get("skipped_count", 0),
+                    "last_skipped_time": state.get("last_skipped_time"),
+                }
+            )
+        return result
@@ -0,0 +1,176 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/19 23:05
+# @Author : Xumh
+import threading
+import time
+
+from utils.log_utils import logger
+
+# 缓存有效期（秒），过期后下次查询时重新拉取
+SPRINT_CACHE_TTL = 30 * 60
+# 后台刷新间隔（秒）
+SPRINT_REFRESH_INTERVAL = 10 * 60
+# 飞书 sprint 分页大小
+FEISHU_SPRINT_PAGE_SIZE = 200
+
+
+class SprintNotFoundError(Exception):
+    """飞书项目或 PingCode 中找不到指定名称的 sprint/迭代"""
+
+
+class SprintRegistry:
+    """
+    sprint 注册表：名称 <-> 飞书 sprint id <-> PingCode 迭代 _id
+    全量拉取两边的 sprint 后缓存在进程内，可由后台线程定期刷新；缓存未命中时按名称单独查询
+    """
+
+    def __init__(self, ttl=SPRINT_CACHE_TTL):
+        """
+        :param ttl: 缓存有效期（秒）
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sprints = {}  # name -> {"name", "feishu_id", "pingcode_id"}
+        self._refreshed_at = None  # time.monotonic()
+        self.refreshed_time = None  # 最后一次刷新的时间戳，用于接口展示
+        self._thread = None
+        self._stopping = threading.Event()
+
+    @staticmethod
+    def _clients(feishu_client=None, pcc=None):
+        # 延迟导入，避免与 feishu_project_utils 循环导入
+        from utils.feishu_project_utils import FeiShuProjectUtils
+        from utils.ping_code_utils import PingCodeClient
+
+        return feishu_client or FeiShuProjectUtils(), pcc or PingCodeClient()
+
+    @staticmethod
+    def fetch_feishu_sprints(feishu_client, sprint_name=None):
+        """拉取飞书项目 sprint（分页），返回 {name: id}"""
+        sprints = {}
+        page_num = 1
+        while True:
+            request_data = {
+                "work_item_type_keys": ["sprint"],
+                "page_size": FEISHU_SPRINT_PAGE_SIZE,
+                "page_num": page_num,
+            }
+            if sprint_name:
+                request_data["work_item_name"] = sprint_name
+            res = feishu_client.search_work_item_filter(work_item_type_keys=["sprint"], request_data=request_data)
+            if not isinstance(res, dict):
+                raise Exception(f"获取飞书项目 sprint 失败: {res}")
+            page_sprints = res.get("data") or []
+            for sprint in page_sprints:
+                sprints[sprint.get("name")] = str(sprint.get("id"))
+            total = (res.get("pagination") or {}).get("total", 0)
+            if len(page_sprints) < FEISHU_SPRINT_PAGE_SIZE or page_num * FEISHU_SPRINT_PAGE_SIZE >= total:
+                return sprints
+            page_num += 1
+
+    @staticmethod
+    def fetch_pingcode_sprints(pcc, sprint_name=None):
+        """拉取 PingCode 迭代，返回 {name: _id}"""
+        res = pcc.get_sprints_info(sprint_name)
+        if not res or not isinstance(res.get("data"), dict):
+            raise Exception(f"获取PingCode迭代失败: {res}")
+        return {sprint.get("name"): sprint.get("_id") for sprint in res["data"].get("value") or []}
+
+    def refresh(self, feishu_client=None, pcc=None):
+        """
+        全量拉取两边的 sprint 并替换缓存
+        :return: sprint 数量
+        """
+        feishu_client, pcc = self._clients(feishu_client, pcc)
+        feishu_sprints = self.fetch_feishu_sprints(feishu_client)
+        pingcode_sprints = self.fetch_pingcode_sprints(pcc)
+        sprints = {
+            name: {"name": name, "feishu_id": feishu_sprints.get(name), "pingcode_id": pingcode_sprints.get(name)}
+            for name in set(feishu_sprints) | set(pingcode_sprints)
+        }
+        with self._lock:
+            self._sprints = sprints
+            self._refreshed_at = time.monotonic()
+            self.refreshed_time = time.time()
+        logger.info(f"sprint 注册表已刷新：飞书 {len(feishu_sprints)} 个，PingCode {len(pingcode_sprints)} 个")
+        return len(sprints)
+
+    def _is_fresh(self):
+        return self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.ttl
+
+    def resolve(self, sprint_name, feishu_client=None, pcc=None):
+        """
+        查询 sprint 两边的 id，缓存中缺少任一方时按名称单独查询
+        :return: {"name", "feishu_id", "pingcode_id"}
+        :raise SprintNotFoundError: 任一方找不到该 sprint
+        """
+        with self._lock:
+            sprint = dict(self._sprints.get(sprint_name) or {}) if self._is_fresh() else {}
+        if not (sprint.get("feishu_id") and sprint.get("pingcode_id")):
+            feishu_client, pcc = self._clients(feishu_client, pcc)
+            sprint = {
+                "name": sprint_name,
+                "feishu_id": sprint.get("feishu_id")
+                or self.fetch_feishu_sprints(feishu_client, sprint_name).get(sprint_name),
+                "pingcode_id": sprint.get("pingcode_id")
+                or self.fetch_pingcode_sprints(pcc, sprint_name).get(sprint_name),
+            }
+            with self._lock:
+                self._sprints[sprint_name] = sprint
+
+        missing = [side for side, key in (("飞书项目", "feishu_id"), ("PingCode", "pingcode_id")) if not sprint[key]]
+        if missing:
+            raise SprintNotFoundError(f"{'、'.join(missing)}中找不到 sprint: {sprint_name}")
+        return sprint
+
+    def feishu_to_pingcode(self, feishu_client=None, pcc=None):
+        """飞书 sprint id -> 同名 PingCode 迭代 _id（缓存过期时先刷新）"""
+        if not self._is_fresh():
+            self.refresh(feishu_client, pcc)
+        with self._lock:
+            return {s["feishu_id"]: s["pingcode_id"] for s in self._sprints.values() if s["feishu_id"]}
+
+    def invalidate(self):
+        """清空缓存，下次查询时重新拉取"""
+        with self._lock:
+            self._sprints = {}
+            self._refreshed_at = None
+
+    def list(self):
+        with self._lock:
+            return sorted(self._sprints.values(), key=lambda s: s["name"] or "")
+
+    def _refresh_loop(self, interval):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"sprint 注册表刷新失败: {e}")
+            if self._stopping.wait(interval):
+                break
+
+    def start(self, interval=SPRINT_REFRESH_INTERVAL):
+        """启动后台刷新线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._refresh_loop, args=(interval,), name="sprint-registry", daemon=True
+            )
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+
+_sprint_registry = None
+_sprint_registry_lock = threading.Lock()
+
+
+def get_sprint_registry():
+    """进程内共享的 sprint 注册表"""
+    global _sprint_registry
+    with _sprint_registry_lock:
+        if _sprint_registry is None:
+            _sprint_registry = SprintRegistry()
+        return _sprint_registry
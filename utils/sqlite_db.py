@@ -0,0 +1,102 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/19 18:05
+# @Author : Xumh
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils.log_utils import logger
+
+# 写锁等待时间（秒），并发写入和页面查询同时访问时等待而不是立即报 database is locked
+BUSY_TIMEOUT = 30
+
+
+class SQLiteDB:
+    """
+    SQLite 数据库访问层（nas_smart.db、reconcile.db 等）：
+    - WAL 模式，读写互不阻塞
+    - 每个线程复用一个连接，避免每次调用都打开/关闭数据库
+    - 进程内首次访问时执行一次建表/迁移（schema_init），后续调用不再执行 DDL
+    """
+
+    def __init__(self, db_path, schema_init=None):
+        """
+        :param db_path: 数据库路径
+        :param schema_init: 建表/迁移函数 schema_init(conn)，进程内只执行一次
+        """
+        self.db_path = Path(db_path)
+        self.schema_init = schema_init
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._migrated = False
+
+    def _connect(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 模式下 NORMAL 可保证一致性，只在掉电时可能丢失最后的事务
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def connection(self):
+        """当前线程的连接（首次访问时完成建表/迁移）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        if not self._migrated:
+            self.migrate()
+        return conn
+
+    def migrate(self, force=False):
+        """
+        执行建表/迁移，进程内只执行一次
+        :param force: 重新执行（如数据库文件被替换）
+        """
+        with self._lock:
+            if self._migrated and not force:
+                return
+            conn = getattr(self._local, "conn", None) or self._connect()
+            self._local.conn = conn
+            if self.schema_init:
+                self.schema_init(conn)
+                conn.commit()
+                logger.info(f"数据库初始化完成: {self.db_path}")
+            self._migrated = True
+
+    @contextmanager
+    def transaction(self):
+        """事务：正常结束时提交，异常时回滚"""
+        conn = self.connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def execute(self, sql, params=()):
+        """执行单条读语句"""
+        return self.connection().execute(sql, params)
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_sqlite_db(db_path, schema_init=None):
+    """按路径获取 SQLiteDB 单例"""
+    key = str(Path(db_path).resolve())
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = SQLiteDB(db_path, schema_init=schema_init)
+        return _instances[key]
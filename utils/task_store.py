@@ -0,0 +1,567 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/19 10:12
+# @Author : Xumh
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from utils.log_utils import logger
+
+# 默认任务库路径：<项目根目录>/data/tasks.db
+DEFAULT_TASK_DB_PATH = Path(__file__).resolve().parent.parent / "data" / "tasks.db"
+
+# 任务记录字段，JSON 字段在 SQLite 中以文本存储
+TASK_FIELDS = [
+    "task_id",
+    "kind",
+    "dedup_key",
+    "queue_name",
+    "priority",
+    "args",
+    "kwargs",
+    "status",
+    "progress",
+    "current",
+    "total",
+    "message",
+    "result",
+    "error",
+    "owner",
+    "created_time",
+    "start_time",
+    "end_time",
+    "updated_time",
+]
+JSON_FIELDS = ["args", "kwargs", "result"]
+# 已结束的任务状态，可被清理
+FINISHED_STATUSES = ["completed", "failed", "cancelled"]
+# 未结束的任务状态
+ACTIVE_STATUSES = ["pending", "running", "paused"]
+
+
+class BaseTaskStore(ABC):
+    """
+    任务存储接口，ThreadUtils 通过它持久化任务状态；记录为 dict，字段见 TASK_FIELDS
+    """
+
+    @abstractmethod
+    def save(self, record):
+        """新增或覆盖任务记录"""
+
+    @abstractmethod
+    def get(self, task_id):
+        """获取任务记录，不存在返回 None"""
+
+    @abstractmethod
+    def list(self, statuses=None):
+        """按状态列出任务记录"""
+
+    @abstractmethod
+    def delete(self, task_id):
+        """删除任务记录"""
+
+    @abstractmethod
+    def update_progress(self, task_id, progress, message, updated_time):
+        """
+        只更新进度百分比、消息和更新时间，不写入断点（current、result），用于两次断点之间的轻量更新
+        :return: 任务是否存在
+        """
+
+    @abstractmethod
+    def set_control(self, task_id, control):
+        """
+        写入任务控制请求（cancel/pause/resume），由持有任务的实例在条目之间读取执行，用于跨进程控制
+        :return: 任务是否存在
+        """
+
+    @abstractmethod
+    def get_control(self, task_id):
+        """读取任务控制请求"""
+
+    @abstractmethod
+    def claim(self, task_id, old_owner, new_owner):
+        """
+        原子地将任务从 old_owner 转移给 new_owner，多个实例同时恢复同一任务时只有一个成功
+        :return: 是否认领成功
+        """
+
+    @abstractmethod
+    def find_active(self, dedup_key):
+        """查询去重键对应的未结束任务记录"""
+
+    @abstractmethod
+    def insert_dedup(self, record, live_since):
+        """
+        原子地检查去重键并新增任务记录：存在相同去重键、且持有者为 record 的持有者或心跳不早于 live_since 的未结束任务时不新增，
+        多个实例同时提交相同去重键的任务时只有一个新增成功
+        :param live_since: 心跳时间不早于该时间（isoformat）的实例视为存活，已退出实例遗留的任务不阻止新增
+        :return: 已存在的未结束任务的 task_id，新增成功返回 None
+        """
+
+    @abstractmethod
+    def heartbeat(self, owner, heartbeat_time):
+        """记录实例心跳"""
+
+    @abstractmethod
+    def remove_owner(self, owner):
+        """实例退出时移除心跳，其持有的未结束任务可立即被其他实例恢复"""
+
+    @abstractmethod
+    def live_owners(self, since):
+        """心跳时间不早于 since（isoformat）的实例集合"""
+
+    @abstractmethod
+    def acquire_lease(self, name, owner, expires, now):
+        """
+        获取或续期租约（如定时调度的主实例），租约未过期时只有持有者能续期
+        :param expires: 租约过期时间（isoformat）
+        :param now: 当前时间（isoformat），早于该时间过期的租约可被其他实例抢占
+        :return: 是否持有租约
+        """
+
+    @abstractmethod
+    def release_lease(self, name, owner):
+        """释放租约，其他实例可立即获取"""
+
+    @abstractmethod
+    def save_schedule(self, name, state):
+        """保存定时任务的运行状态（下次运行时间、上次耗时等）"""
+
+    @abstractmethod
+    def set_schedule_enabled(self, name, enabled):
+        """启用/暂停定时任务"""
+
+    @abstractmethod
+    def get_schedules(self):
+        """
+        所有定时任务的运行状态
+        :return: {name: {"state": dict, "enabled": bool}}
+        """
+
+    @abstractmethod
+    def prune(self, finished_before=None, max_records=None):
+        """
+        清理已结束的任务记录
+        :param finished_before: 结束时间早于该时间（isoformat）的任务被删除
+        :param max_records: 记录总数上限，超出时按结束时间从旧到新删除已结束的任务
+        :return: 被删除的 task_id 列表
+        """
+
+
+class MemoryTaskStore(BaseTaskStore):
+    """
+    内存任务存储，进程重启后丢失，适用于测试或不需要恢复的场景
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+        self._controls = {}
+        self._owners = {}
+        self._leases = {}
+        self._schedules = {}
+
+    def save(self, record):
+        with self._lock:
+            self._records[record["task_id"]] = dict(record)
+
+    def update_progress(self, task_id, progress, message, updated_time):
+        with self._lock:
+            record = self._records.get(task_id)
+            if not record:
+                return False
+            record.update(progress=progress, message=message, updated_time=updated_time)
+            return True
+
+    def set_control(self, task_id, control):
+        with self._lock:
+            if task_id not in self._records:
+                return False
+            self._controls[task_id] = control
+            return True
+
+    def get_control(self, task_id):
+        with self._lock:
+            return self._controls.get(task_id)
+
+    def claim(self, task_id, old_owner, new_owner):
+        with self._lock:
+            record = self._records.get(task_id)
+            if not record or record.get("owner") != old_owner:
+                return False
+            record["owner"] = new_owner
+            return True
+
+    def find_active(self, dedup_key):
+        with self._lock:
+            return [
+                dict(r)
+                for r in self._records.values()
+                if r.get("dedup_key") == dedup_key and r.get("status") in ACTIVE_STATUSES
+            ]
+
+    def insert_dedup(self, record, live_since):
+        with self._lock:
+            for existing in self._records.values():
+                if existing.get("dedup_key") != record["dedup_key"] or existing.get("status") not in ACTIVE_STATUSES:
+                    continue
+                owner = existing.get("owner")
+                if owner == record.get("owner") or self._owners.get(owner, "") >= live_since:
+                    return existing["task_id"]
+            self._records[record["task_id"]] = dict(record)
+            return None
+
+    def heartbeat(self, owner, heartbeat_time):
+        with self._lock:
+            self._owners[owner] = heartbeat_time
+
+    def remove_owner(self, owner):
+        with self._lock:
+            self._owners.pop(owner, None)
+
+    def live_owners(self, since):
+        with self._lock:
+            return {owner for owner, heartbeat_time in self._owners.items() if heartbeat_time >= since}
+
+    def acquire_lease(self, name, owner, expires, now):
+        with self._lock:
+            lease = self._leases.get(name)
+            if lease and lease["owner"] != owner and lease["expires"] >= now:
+                return False
+            self._leases[name] = {"owner": owner, "expires": expires}
+            return True
+
+    def release_lease(self, name, owner):
+        with self._lock:
+            if self._leases.get(name, {}).get("owner") == owner:
+                self._leases.pop(name)
+
+    def save_schedule(self, name, state):
+        with self._lock:
+            self._schedules.setdefault(name, {"state": {}, "enabled": True})["state"] = dict(state)
+
+    def set_schedule_enabled(self, name, enabled):
+        with self._lock:
+            self._schedules.setdefault(name, {"state": {}, "enabled": True})["enabled"] = bool(enabled)
+
+    def get_schedules(self):
+        with self._lock:
+            return {name: {"state": dict(s["state"]), "enabled": s["enabled"]} for name, s in self._schedules.items()}
+
+    def get(self, task_id):
+        with self._lock:
+            record = self._records.get(task_id)
+            return dict(record) if record else None
+
+    def list(self, statuses=None):
+        with self._lock:
+            return [dict(r) for r in self._records.values() if not statuses or r.get("status") in statuses]
+
+    def delete(self, task_id):
+        with self._lock:
+            self._records.pop(task_id, None)
+
+    def prune(self, finished_before=None, max_records=None):
+        with self._lock:
+            finished = sorted(
+                (r for r in self._records.values() if r.get("status") in FINISHED_STATUSES),
+                key=lambda r: r.get("end_time") or "",
+            )
+            expired = [
+                r["task_id"] for r in finished if finished_before and (r.get("end_time") or "") < finished_before
+            ]
+            overflow = len(self._records) - len(expired) - max_records if max_records else 0
+            if overflow > 0:
+                expired += [r["task_id"] for r in finished if r["task_id"] not in expired][:overflow]
+            for task_id in expired:
+                self._records.pop(task_id, None)
+                self._controls.pop(task_id, None)
+            return expired
+
+
+class SqliteTaskStore(BaseTaskStore):
+    """
+    SQLite 任务存储（默认），服务重启后仍可查询任务并恢复被中断的任务
+    使用 WAL 模式，多个 worker 进程可共享同一任务库
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or DEFAULT_TASK_DB_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    kind TEXT,
+                    dedup_key TEXT,
+                    args TEXT,
+                    kwargs TEXT,
+                    status TEXT NOT NULL,
+                    progress INTEGER DEFAULT 0,
+                    current INTEGER,
+                    total INTEGER,
+                    message TEXT,
+                    result TEXT,
+                    error TEXT,
+                    owner TEXT,
+                    created_time TEXT,
+                    start_time TEXT,
+                    end_time TEXT,
+                    updated_time TEXT,
+                    control TEXT
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS task_owners (
+                    owner TEXT PRIMARY KEY,
+                    heartbeat_time TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schedules (
+                    name TEXT PRIMARY KEY,
+                    state TEXT,
+                    enabled INTEGER NOT NULL DEFAULT 1
+                )
+                """
+            )
+            # 旧版本任务库补充新增字段
+            columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(tasks)")]
+            for field in TASK_FIELDS + ["control"]:
+                if field not in columns:
+                    self._conn.execute(f"ALTER TABLE tasks ADD COLUMN {field} TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_end_time ON tasks (end_time)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_dedup_key ON tasks (dedup_key)")
+            self._conn.commit()
+
+    @staticmethod
+    def _dumps(value):
+        if value is None:
+            return None
+        return json.dumps(value, ensure_ascii=False, default=str)
+
+    @staticmethod
+    def _loads(value):
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            logger.warning(f"任务记录 JSON 解析失败: {value[:200]}")
+            return None
+
+    def _row_to_record(self, row):
+        record = dict(row)
+        for field in JSON_FIELDS:
+            record[field] = self._loads(record.get(field))
+        return record
+
+    def save(self, record):
+        values = [self._dumps(record.get(f)) if f in JSON_FIELDS else record.get(f) for f in TASK_FIELDS]
+        # UPSERT 保留其他进程写入的 control 字段
+        updates = ", ".join(f"{f} = excluded.{f}" for f in TASK_FIELDS if f != "task_id")
+        sql = (
+            f"INSERT INTO tasks ({', '.join(TASK_FIELDS)}) VALUES ({', '.join('?' for _ in TASK_FIELDS)}) "
+            f"ON CONFLICT(task_id) DO UPDATE SET {updates}"
+        )
+        with self._lock:
+            self._conn.execute(sql, values)
+            self._conn.commit()
+
+    def update_progress(self, task_id, progress, message, updated_time):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET progress = ?, message = ?, updated_time = ? WHERE task_id = ?",
+                (progress, message, updated_time, task_id),
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def set_control(self, task_id, control):
+        with self._lock:
+            cursor = self._conn.execute("UPDATE tasks SET control = ? WHERE task_id = ?", (control, task_id))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def get_control(self, task_id):
+        with self._lock:
+            row = self._conn.execute("SELECT control FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return row["control"] if row else None
+
+    def claim(self, task_id, old_owner, new_owner):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET owner = ? WHERE task_id = ? AND owner IS ?", (new_owner, task_id, old_owner)
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def find_active(self, dedup_key):
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM tasks WHERE dedup_key = ? AND status IN ({placeholders})",
+                [dedup_key] + ACTIVE_STATUSES,
+            ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def insert_dedup(self, record, live_since):
+        values = [self._dumps(record.get(f)) if f in JSON_FIELDS else record.get(f) for f in TASK_FIELDS]
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        with self._lock:
+            # BEGIN IMMEDIATE 立即获取写锁，其他进程的检查与新增需等待本事务结束，避免检查后插入前被抢先
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT t.task_id FROM tasks t LEFT JOIN task_owners o ON o.owner = t.owner "
+                    f"WHERE t.dedup_key = ? AND t.status IN ({placeholders}) "
+                    f"AND (t.owner IS ? OR o.heartbeat_time >= ?) LIMIT 1",
+                    [record["dedup_key"]] + ACTIVE_STATUSES + [record.get("owner"), live_since],
+                ).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        f"INSERT INTO tasks ({', '.join(TASK_FIELDS)}) VALUES ({', '.join('?' for _ in TASK_FIELDS)})",
+                        values,
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return row["task_id"] if row else None
+
+    def heartbeat(self, owner, heartbeat_time):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO task_owners (owner, heartbeat_time) VALUES (?, ?) "
+                "ON CONFLICT(owner) DO UPDATE SET heartbeat_time = excluded.heartbeat_time",
+                (owner, heartbeat_time),
+            )
+            self._conn.commit()
+
+    def remove_owner(self, owner):
+        with self._lock:
+            self._conn.execute("DELETE FROM task_owners WHERE owner = ?", (owner,))
+            self._conn.commit()
+
+    def live_owners(self, since):
+        with self._lock:
+            # 顺带清理长时间无心跳的实例
+            self._conn.execute("DELETE FROM task_owners WHERE heartbeat_time < ?", (since,))
+            self._conn.commit()
+            rows = self._conn.execute("SELECT owner FROM task_owners").fetchall()
+        return {row["owner"] for row in rows}
+
+    def acquire_lease(self, name, owner, expires, now):
+        with self._lock:
+            # 租约不存在、已过期或本实例持有时写入，否则不变
+            self._conn.execute(
+                "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.owner = excluded.owner OR leases.expires < ?",
+                (name, owner, expires, now),
+            )
+            self._conn.commit()
+            row = self._conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row["owner"] == owner
+
+    def release_lease(self, name, owner):
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+            self._conn.commit()
+
+    def save_schedule(self, name, state):
+        with self._lock:
+            # 只更新运行状态，保留通过接口设置的 enabled
+            self._conn.execute(
+                "INSERT INTO schedules (name, state) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET state = excluded.state",
+                (name, self._dumps(state)),
+            )
+            self._conn.commit()
+
+    def set_schedule_enabled(self, name, enabled):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO schedules (name, enabled) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET enabled = excluded.enabled",
+                (name, int(bool(enabled))),
+            )
+            self._conn.commit()
+
+    def get_schedules(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT name, state, enabled FROM schedules").fetchall()
+        return {
+            row["name"]: {"state": self._loads(row["state"]) or {}, "enabled": bool(row["enabled"])} for row in rows
+        }
+
+    def get(self, task_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def list(self, statuses=None):
+        with self._lock:
+            if statuses:
+                placeholders = ", ".join("?" for _ in statuses)
+                rows = self._conn.execute(
+                    f"SELECT * FROM tasks WHERE status IN ({placeholders}) ORDER BY created_time", list(statuses)
+                ).fetchall()
+            else:
+                rows = self._conn.execute("SELECT * FROM tasks ORDER BY created_time").fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def delete(self, task_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+            self._conn.commit()
+
+    def prune(self, finished_before=None, max_records=None):
+        status_filter = f"status IN ({', '.join('?' for _ in FINISHED_STATUSES)})"
+        expired = []
+        with self._lock:
+            if finished_before:
+                rows = self._conn.execute(
+                    f"SELECT task_id FROM tasks WHERE {status_filter} AND end_time < ?",
+                    FINISHED_STATUSES + [finished_before],
+                ).fetchall()
+                expired += [row["task_id"] for row in rows]
+            if max_records:
+                total = self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+                overflow = total - len(expired) - max_records
+                if overflow > 0:
+                    placeholders = ", ".join("?" for _ in expired)
+                    rows = self._conn.execute(
+                        f"SELECT task_id FROM tasks WHERE {status_filter} AND task_id NOT IN ({placeholders}) "
+                        "ORDER BY end_time LIMIT ?",
+                        FINISHED_STATUSES + expired + [overflow],
+                    ).fetchall()
+                    expired += [row["task_id"] for row in rows]
+            if expired:
+                self._conn.executemany("DELETE FROM tasks WHERE task_id = ?", [(task_id,) for task_id in expired])
+                self._conn.commit()
+        return expired
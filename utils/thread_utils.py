@@ -2,12 +2,51 @@
 # @Time : 2024/08/13 15:37
 # @Author : Xumh
 # 修改 thread_utils.py
+import inspect
+import itertools
+import json
+import queue
 import threading
+import time
 import uuid
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
+from datetime import datetime, timedelta
+from pathlib import Path
 
 from utils.log_utils import logger
+from utils.profiling import collect_trace
+from utils.request_metrics import collect_request_metrics
+from utils.task_store import SqliteTaskStore
+
+# 未结束的任务状态，服务重启后这些任务视为被中断
+ACTIVE_STATUSES = ["pending", "running", "paused"]
+
+# 任务优先级，数值越小越先执行
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+DEFAULT_QUEUE = "default"
+
+# 断点持久化间隔：距上次断点超过该条目数或秒数时才写入完整断点（current、result），
+# 其间只更新进度百分比，避免每个条目都序列化不断增长的结果
+CHECKPOINT_EVERY_ITEMS = 50
+CHECKPOINT_INTERVAL = 5
+
+# 实例心跳间隔（秒），超过 3 个间隔无心跳的实例视为已退出，其未结束任务由其他实例接管
+HEARTBEAT_INTERVAL = 10
+
+# 大结果压缩后的落盘目录：<项目根目录>/data/task_results
+DEFAULT_RESULT_DIR = Path(__file__).resolve().parent.parent / "data" / "task_results"
+# 任务分阶段耗时（profile）的落盘目录：<项目根目录>/data/task_profiles
+DEFAULT_PROFILE_DIR = Path(__file__).resolve().parent.parent / "data" / "task_profiles"
+
+
+class TaskCancelledError(Exception):
+    """任务被取消，由进度回调在条目之间抛出"""
+
+
+class TaskInterruptedError(TaskCancelledError):
+    """实例关闭时中断任务，任务保留断点并交由其他实例继续执行"""
 
 
 class AsyncTask:
@@ -16,70 +55,707 @@ class AsyncTask:
         self.func = func
         self.args = args
         self.kwargs = kwargs
+        self.kind = None  # 注册的任务类型，只有注册过的任务才能在重启后恢复
+        self.dedup_key = None  # 去重键，相同键同时只运行一个任务
+        self.queue_name = DEFAULT_QUEUE  # 所属任务队列
+        self.priority = PRIORITY_NORMAL
+        self.queued_time = None  # 进入队列的时间，用于统计排队等待时长
+        self.wait_seconds = None  # 出队时的排队等待时长
         self.status = "pending"
         self.progress = 0  # 添加进度字段
+        self.current = None  # 最后一个已完成条目的序号，用作恢复断点
+        self.total = None
+        self.message = ""
         self.result = None
         self.error = None
+        self.checkpoint = None  # 恢复任务时传给任务函数的断点 {"index": ..., "result": ...}
+        self.request_metrics = None  # 本次执行的请求统计摘要
+        self.profile = False  # 是否保留 span 明细（完整 trace），否则只记录分阶段汇总
+        self.profile_summary = None  # 本次执行的分阶段耗时汇总
+        self.checkpoint_current = None  # 最近一次持久化断点时的 current
+        self.checkpoint_time = 0.0  # 最近一次持久化断点的时间（time.monotonic()）
         self.created_time = datetime.now()
         self.start_time = None
         self.end_time = None
+        self.updated_time = self.created_time
+        self.cancel_event = threading.Event()  # 已请求取消
+        self.resume_event = threading.Event()  # 未暂停时为 set 状态
+        self.resume_event.set()
+        self.published_counts = {}  # 已推送的 success/error 条目数量
+
+    def to_record(self, owner=None):
+        """转换为任务存储记录"""
+        return {
+            "task_id": self.task_id,
+            "kind": self.kind,
+            "dedup_key": self.dedup_key,
+            "queue_name": self.queue_name,
+            "priority": self.priority,
+            "args": list(self.args),
+            "kwargs": self.kwargs,
+            "status": self.status,
+            "progress": self.progress,
+            "current": self.current,
+            "total": self.total,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "owner": owner,
+            "created_time": self.created_time.isoformat() if self.created_time else None,
+            "start_time": self.start_time.isoformat() if self.start_time else None,
+            "end_time": self.end_time.isoformat() if self.end_time else None,
+            "updated_time": self.updated_time.isoformat() if self.updated_time else None,
+        }
+
+
+class TaskQueue:
+    """
+    命名任务队列：独立的并发上限，队列内按优先级出队（同优先级先进先出）
+    """
+
+    def __init__(self, name, max_workers, runner):
+        self.name = name
+        self.max_workers = max_workers
+        self._runner = runner
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._workers = []
+        self.running = 0
+        self.started_count = 0  # 已出队执行的任务数量
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def put(self, async_task):
+        async_task.queued_time = datetime.now()
+        self._queue.put((async_task.priority, next(self._seq), async_task))
+        with self._lock:
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(
+                    target=self._worker, name=f"task-{self.name}-{len(self._workers)}", daemon=True
+                )
+                self._workers.append(worker)
+                worker.start()
+
+    def _worker(self):
+        while True:
+            _, _, async_task = self._queue.get()
+            if async_task is None:
+                return
+            wait_seconds = (datetime.now() - async_task.queued_time).total_seconds()
+            async_task.wait_seconds = wait_seconds
+            with self._lock:
+                self.running += 1
+                self.started_count += 1
+                self.total_wait += wait_seconds
+                self.max_wait = max(self.max_wait, wait_seconds)
+            try:
+                self._runner(async_task)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+    def pending_tasks(self):
+        """按出队顺序返回排队中的任务"""
+        with self._queue.mutex:
+            items = sorted(self._queue.queue)
+        return [item[2] for item in items if item[2] is not None and item[2].status == "pending"]
+
+    def stats(self):
+        """队列指标：并发上限、运行中数量、排队深度、等待时长"""
+        pending = self.pending_tasks()
+        now = datetime.now()
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "running": self.running,
+                "queue_depth": len(pending),
+                "oldest_wait_seconds": round((now - pending[0].queued_time).total_seconds(), 3) if pending else 0,
+                "avg_wait_seconds": round(self.total_wait / self.started_count, 3) if self.started_count else 0,
+                "max_wait_seconds": round(self.max_wait, 3),
+                "started_count": self.started_count,
+            }
+
+    def shutdown(self, wait=True):
+        """停止工作线程，已排队的任务执行完后退出"""
+        with self._lock:
+            workers = list(self._workers)
+        for _ in workers:
+            self._queue.put((float("inf"), next(self._seq), None))
+        if wait:
+            for worker in workers:
+                worker.join()
 
 
 class ThreadUtils:
-    def __init__(self, max_workers=1):
+    def __init__(
+        self,
+        max_workers=1,
+        task_store=None,
+        max_tasks=200,
+        task_ttl=7 * 24 * 3600,
+        compact_result_bytes=None,
+        result_dir=None,
+        queues=None,
+        profile_dir=None,
+    ):
+        """
+        :param max_workers: 默认队列（default）的线程数
+        :param task_store: 任务存储，默认使用 SQLite（data/tasks.db），传入 MemoryTaskStore 则不持久化
+        :param max_tasks: 保留的任务数量上限，超出时淘汰最早结束的任务，运行中的任务不会被淘汰
+        :param task_ttl: 任务结束后保留的秒数，None 表示不过期
+        :param compact_result_bytes: 结果序列化后超过该字节数时压缩为摘要并落盘，None 表示不压缩
+        :param result_dir: 压缩结果的落盘目录
+        :param queues: 其他命名队列及其线程数，如 {"bulk": 1, "interactive": 2}，各队列互不阻塞
+        :param profile_dir: 任务分阶段耗时（profile）的落盘目录
+        """
         self._lock = threading.Lock()
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.queues = {DEFAULT_QUEUE: TaskQueue(DEFAULT_QUEUE, max_workers, self._task_wrapper)}
+        for queue_name, queue_workers in (queues or {}).items():
+            self.queues[queue_name] = TaskQueue(queue_name, queue_workers, self._task_wrapper)
         self.tasks = {}  # 存储所有任务
+        self.task_store = task_store if task_store is not None else SqliteTaskStore()
+        self.instance_id = uuid.uuid4().hex  # 当前进程实例标识，用于识别其他（已退出）实例遗留的任务
+        self._registry = {}  # 任务类型 -> {"func": 任务函数, "queue_name": 队列, "priority": 优先级}
+        self._inflight = {}  # 去重键 -> 未结束的 task_id
+        self._subscribers = {}  # task_id -> 事件队列列表，用于推送任务进度（SSE）
+        self.max_tasks = max_tasks
+        self.task_ttl = task_ttl
+        self.compact_result_bytes = compact_result_bytes
+        self.result_dir = Path(result_dir or DEFAULT_RESULT_DIR)
+        self.profile_dir = Path(profile_dir or DEFAULT_PROFILE_DIR)
+        self.heartbeat_interval = HEARTBEAT_INTERVAL
+        self._heartbeat_thread = None
+        self._stopping = threading.Event()  # 实例正在关闭
+
+    def register_task(self, kind, func, queue_name=DEFAULT_QUEUE, priority=PRIORITY_NORMAL):
+        """
+        注册任务类型，注册后的任务会持久化参数，并可在服务重启后恢复
+        :param kind: 任务类型名称
+        :param func: 任务函数，参数需可 JSON 序列化；若接受 checkpoint 参数，恢复时会从断点继续
+        :param queue_name: 该类型任务默认进入的队列
+        :param priority: 该类型任务默认优先级
+        :return:
+        """
+        if queue_name not in self.queues:
+            raise ValueError(f"任务队列不存在: {queue_name}")
+        self._registry[kind] = {"func": func, "queue_name": queue_name, "priority": priority}
+
+    def _save_task(self, async_task):
+        """持久化任务状态（含断点），存储异常不影响任务执行"""
+        try:
+            self.task_store.save(async_task.to_record(owner=self.instance_id))
+            async_task.checkpoint_current = async_task.current
+            async_task.checkpoint_time = time.monotonic()
+        except Exception as e:
+            logger.error(f"任务 {async_task.task_id} 状态持久化失败: {e}")
+
+    def _save_progress(self, async_task):
+        """
+        进度回调中持久化任务状态：距上次断点超过 CHECKPOINT_EVERY_ITEMS 个条目或 CHECKPOINT_INTERVAL 秒时写入完整断点，
+        否则只更新进度百分比和消息（current 与 result 保持一致，恢复时不会跳过未持久化的条目）
+        """
+        done_items = (async_task.current or 0) - (async_task.checkpoint_current or 0)
+        if (
+            done_items >= CHECKPOINT_EVERY_ITEMS
+            or time.monotonic() - async_task.checkpoint_time >= CHECKPOINT_INTERVAL
+        ):
+            self._save_task(async_task)
+            return
+        try:
+            self.task_store.update_progress(
+                async_task.task_id, async_task.progress, async_task.message, async_task.updated_time.isoformat()
+            )
+        except Exception as e:
+            logger.error(f"任务 {async_task.task_id} 进度持久化失败: {e}")
+
+    def subscribe(self, task_id):
+        """
+        订阅任务事件，返回事件队列；事件为 {"event": 类型, "data": 数据}
+        类型: progress-进度/状态变化，item-单个条目处理结果，done-任务结束
+        """
+        event_queue = queue.Queue(maxsize=1000)
+        with self._lock:
+            self._subscribers.setdefault(task_id, []).append(event_queue)
+        return event_queue
+
+    def unsubscribe(self, task_id, event_queue):
+        """取消订阅任务事件"""
+        with self._lock:
+            queues = self._subscribers.get(task_id, [])
+            if event_queue in queues:
+                queues.remove(event_queue)
+            if not queues:
+                self._subscribers.pop(task_id, None)
+
+    def _publish(self, task_id, event, data):
+        with self._lock:
+            queues = list(self._subscribers.get(task_id, []))
+        for event_queue in queues:
+            try:
+                event_queue.put_nowait({"event": event, "data": data})
+            except queue.Full:
+                logger.warning(f"任务 {task_id} 事件队列已满，丢弃事件: {event}")
+
+    def _publish_progress(self, async_task, event="progress"):
+        if async_task.task_id not in self._subscribers:
+            return
+        self._publish(async_task.task_id, event, self._task_status(async_task))
+
+    def _publish_items(self, async_task, result):
+        """推送结果集中新增的 success/error 条目"""
+        if async_task.task_id not in self._subscribers or not isinstance(result, dict):
+            return
+        for item_type in ["success", "error"]:
+            items = result.get(item_type)
+            if not isinstance(items, list):
+                continue
+            published = async_task.published_counts.get(item_type, 0)
+            for item in items[published:]:
+                self._publish(async_task.task_id, "item", {"type": item_type, "item": item})
+            async_task.published_counts[item_type] = len(items)
+
+    def _apply_remote_control(self, async_task):
+        """读取其他 worker 进程写入任务存储的控制请求"""
+        try:
+            control = self.task_store.get_control(async_task.task_id)
+            if not control:
+                return
+            self.task_store.set_control(async_task.task_id, None)
+        except Exception as e:
+            logger.error(f"读取任务 {async_task.task_id} 控制请求失败: {e}")
+            return
+        if control == "cancel":
+            async_task.cancel_event.set()
+            async_task.resume_event.set()
+        elif control == "pause" and not async_task.cancel_event.is_set():
+            async_task.resume_event.clear()
+        elif control == "resume":
+            async_task.resume_event.set()
+
+    def _check_control(self, async_task):
+        """
+        条目之间检查取消/暂停请求：已取消则抛出 TaskCancelledError，已暂停则阻塞直到恢复或取消
+        实例关闭时抛出 TaskInterruptedError，暂停的任务仍占用工作线程
+        """
+        self._apply_remote_control(async_task)
+        if self._stopping.is_set():
+            raise TaskInterruptedError(f"任务 {async_task.task_id} 已中断")
+        if not async_task.resume_event.is_set() and not async_task.cancel_event.is_set():
+            async_task.status = "paused"
+            async_task.updated_time = datetime.now()
+            self._save_task(async_task)
+            self._publish_progress(async_task)
+            logger.info(f"任务 {async_task.task_id} 已暂停，进度: {async_task.progress}%")
+            while not async_task.resume_event.wait(timeout=1):
+                self._apply_remote_control(async_task)
+                if self._stopping.is_set():
+                    raise TaskInterruptedError(f"任务 {async_task.task_id} 已中断")
+            async_task.status = "running"
+            async_task.updated_time = datetime.now()
+            self._save_task(async_task)
+            self._publish_progress(async_task)
+            logger.info(f"任务 {async_task.task_id} 已恢复执行")
+        if async_task.cancel_event.is_set():
+            raise TaskCancelledError(f"任务 {async_task.task_id} 已取消")
 
     def _task_wrapper(self, async_task):
+        if async_task.status not in ACTIVE_STATUSES:
+            # 排队中被 cancel_task 取消的任务已结束并推送过 done 事件，出队后直接跳过
+            logger.info(f"任务 {async_task.task_id} 已结束（{async_task.status}），跳过执行")
+            return
         try:
+            if self._stopping.is_set():
+                raise TaskInterruptedError(f"任务 {async_task.task_id} 已中断")
+            self._apply_remote_control(async_task)
+            if async_task.cancel_event.is_set():
+                # 排队中被取消的任务直接结束
+                raise TaskCancelledError(f"任务 {async_task.task_id} 已取消")
             async_task.status = "running"
-            async_task.start_time = datetime.now()
+            async_task.start_time = async_task.start_time or datetime.now()
+            async_task.updated_time = datetime.now()
+            self._save_task(async_task)
+            self._publish_progress(async_task)
 
             # 创建更完善的进度回调函数
-            def progress_callback(percentage=0, current=None, total=None, message=""):
+            def progress_callback(percentage=0, current=None, total=None, message="", result=None):
                 with self._lock:
                     # if percentage:
                     async_task.progress = max(0, min(100, percentage))
                     if current is not None and total > 0:
-                        async_task.progress = int(max(0, min(100, (current / total) * 100)))
+                        # 同时传入 percentage 时以 percentage 为准（如多个 sprint 的任务按 sprint 缩放进度）
+                        if not percentage:
+                            async_task.progress = int(max(0, min(100, (current / total) * 100)))
+                        async_task.current = current
+                        async_task.total = total
+                    if result is not None:
+                        # 保存阶段性结果，任务中断后可从 current 处继续
+                        async_task.result = result
+                    async_task.message = message
+                    async_task.updated_time = datetime.now()
                     # logger.info(f"任务 {async_task.task_id} 进度更新: {async_task.progress}%, 消息: {message}")
+                self._save_progress(async_task)
+                self._publish_items(async_task, result)
+                self._publish_progress(async_task)
+                self._check_control(async_task)
 
             # 检查函数是否接受 progress_callback 参数
-            import inspect
-
             func_signature = inspect.signature(async_task.func)
 
+            extra_kwargs = {}
             if "progress_callback" in func_signature.parameters:
                 # 执行任务并传递进度回调
-                result = async_task.func(*async_task.args, **async_task.kwargs, progress_callback=progress_callback)
-            else:
-                # 执行任务（不传递进度回调）
-                result = async_task.func(*async_task.args, **async_task.kwargs)
+                extra_kwargs["progress_callback"] = progress_callback
+            if async_task.checkpoint and "checkpoint" in func_signature.parameters:
+                # 从断点恢复任务
+                extra_kwargs["checkpoint"] = async_task.checkpoint
+
+            # 单独统计本任务发出的请求和各阶段耗时，结束后摘要附加到任务结果中
+            with collect_request_metrics() as request_metrics, collect_trace(async_task.profile) as tracer:
+                try:
+                    result = async_task.func(*async_task.args, **async_task.kwargs, **extra_kwargs)
+                finally:
+                    async_task.request_metrics = request_metrics.summary()
+                    self._save_profile(async_task, tracer)
 
             async_task.status = "completed"
             async_task.result = result
             async_task.progress = 100
             logger.info(f"任务 {async_task.task_id} 完成，最终进度: {async_task.progress}%")
+        except TaskInterruptedError:
+            # 保留断点和状态，不写入结束时间，由其他实例（或重启后的实例）继续执行
+            if async_task.status != "paused":
+                async_task.status = "pending"
+            logger.info(f"任务 {async_task.task_id} 已中断，进度: {async_task.progress}%，等待其他实例接管")
+        except TaskCancelledError:
+            # 保留取消前的阶段性结果
+            async_task.status = "cancelled"
+            logger.info(f"任务 {async_task.task_id} 已取消，进度: {async_task.progress}%")
         except Exception as e:
             async_task.status = "failed"
             async_task.error = str(e)
             async_task.progress = 0
             logger.error(f"任务 {async_task.task_id} 失败，进度: {async_task.progress}%, 错误: {str(e)}")
         finally:
-            async_task.end_time = datetime.now()
+            if async_task.status in ACTIVE_STATUSES:
+                # 被中断的任务不结束，只保存断点
+                async_task.updated_time = datetime.now()
+                self._save_task(async_task)
+            else:
+                async_task.end_time = datetime.now()
+                async_task.updated_time = async_task.end_time
+                self._publish_items(async_task, async_task.result)
+                if isinstance(async_task.result, dict) and async_task.request_metrics:
+                    async_task.result["request_metrics"] = async_task.request_metrics
+                if isinstance(async_task.result, dict) and async_task.profile_summary:
+                    async_task.result["profile"] = async_task.profile_summary
+                self._compact_result(async_task)
+                self._save_task(async_task)
+                self._publish_progress(async_task, event="done")
+            with self._lock:
+                if async_task.dedup_key and self._inflight.get(async_task.dedup_key) == async_task.task_id:
+                    self._inflight.pop(async_task.dedup_key)
+            self._evict_tasks()
+
+    def _result_blob_path(self, task_id):
+        return self.result_dir / f"{task_id}.json"
+
+    def _profile_path(self, task_id):
+        return self.profile_dir / f"{task_id}.json"
+
+    def _save_profile(self, async_task, tracer):
+        """
+        保存任务分阶段耗时：汇总附加到任务结果，完整 trace 落盘供 /tasks/<id>/profile 查看（其他 worker 也可读取）
+        """
+        tracer.finish()
+        async_task.profile_summary = tracer.summary()
+        try:
+            profile_path = self._profile_path(async_task.task_id)
+            profile_path.parent.mkdir(parents=True, exist_ok=True)
+            profile_path.write_text(json.dumps(tracer.dump(), ensure_ascii=False), encoding="utf-8")
+        except Exception as e:
+            logger.error(f"任务 {async_task.task_id} 性能数据保存失败: {e}")
+
+    def get_task_profile(self, task_id):
+        """
+        获取任务分阶段耗时
+        :return: {"total_ms", "phases", "spans", "dropped_spans"}，任务未执行过时返回 None
+        """
+        profile_path = self._profile_path(task_id)
+        if not profile_path.exists():
+            return None
+        try:
+            return json.loads(profile_path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.error(f"读取任务性能数据失败: {profile_path} {e}")
+            return None
+
+    def _compact_result(self, async_task):
+        """
+        结果过大时完整结果写入磁盘，内存和任务存储中只保留摘要
+        摘要保留结果中的标量字段，列表字段替换为数量，如 {"count": 10, "success": 8, "error": 2, ...}
+        """
+        if not self.compact_result_bytes or not isinstance(async_task.result, dict):
+            return
+        try:
+            result_json = json.dumps(async_task.result, ensure_ascii=False, default=str)
+            if len(result_json.encode("utf-8")) <= self.compact_result_bytes:
+                return
+            blob_path = self._result_blob_path(async_task.task_id)
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            blob_path.write_text(result_json, encoding="utf-8")
+            summary = {k: len(v) if isinstance(v, (list, dict)) else v for k, v in async_task.result.items()}
+            for key in ("request_metrics", "profile"):
+                if key in async_task.result:
+                    # 请求统计和分阶段耗时摘要本身不大，保留在摘要中
+                    summary[key] = async_task.result[key]
+            summary["compacted"] = True
+            summary["blob"] = str(blob_path)
+            async_task.result = summary
+            logger.info(f"任务 {async_task.task_id} 结果已压缩，完整结果保存至: {blob_path}")
+        except Exception as e:
+            logger.error(f"任务 {async_task.task_id} 结果压缩失败: {e}")
 
-    def submit_task(self, func, *args, **kwargs):
-        """提交异步任务"""
-        task_id = str(uuid.uuid4())
-        async_task = AsyncTask(task_id, func, *args, **kwargs)
+    def _load_result(self, result):
+        """压缩过的结果从磁盘读取完整内容"""
+        if isinstance(result, dict) and result.get("compacted") and result.get("blob"):
+            try:
+                return json.loads(Path(result["blob"]).read_text(encoding="utf-8"))
+            except Exception as e:
+                logger.error(f"读取任务结果失败: {result['blob']} {e}")
+        return result
 
+    def _evict_tasks(self):
+        """按保留策略淘汰已结束的任务（内存、任务存储及落盘结果）"""
+        now = datetime.now()
+        expire_before = now - timedelta(seconds=self.task_ttl) if self.task_ttl is not None else None
         with self._lock:
-            self.tasks[task_id] = async_task
+            finished = sorted(
+                (t for t in self.tasks.values() if t.status not in ACTIVE_STATUSES),
+                key=lambda t: t.end_time or now,
+            )
+            evicted = [t.task_id for t in finished if expire_before and t.end_time and t.end_time < expire_before]
+            overflow = len(self.tasks) - len(evicted) - self.max_tasks if self.max_tasks else 0
+            if overflow > 0:
+                evicted += [t.task_id for t in finished if t.task_id not in evicted][:overflow]
+            for task_id in evicted:
+                self.tasks.pop(task_id, None)
+
+        try:
+            evicted += self.task_store.prune(
+                finished_before=expire_before.isoformat() if expire_before else None, max_records=self.max_tasks
+            )
+        except Exception as e:
+            logger.error(f"清理任务存储失败: {e}")
+
+        for task_id in set(evicted):
+            self._result_blob_path(task_id).unlink(missing_ok=True)
+            self._profile_path(task_id).unlink(missing_ok=True)
+        if evicted:
+            logger.debug(f"已淘汰 {len(set(evicted))} 个已结束的任务")
+
+    def submit_task(self, func, *args, dedup_key=None, queue_name=None, priority=None, profile=False, **kwargs):
+        """
+        提交异步任务
+        :param func: 任务函数，或通过 register_task 注册的任务类型名称
+        :param dedup_key: 去重键（如 任务类型 + sprint_name），相同键的任务未结束时不再重复提交，直接返回该任务的 task_id
+        :param queue_name: 任务队列，默认使用注册时指定的队列或 default
+        :param priority: 队列内优先级，数值越小越先执行
+        :param profile: 是否记录完整 trace（span 明细），分阶段汇总总是记录
+        :return: task_id
+        """
+        kind = None
+        task_conf = {"queue_name": DEFAULT_QUEUE, "priority": PRIORITY_NORMAL}
+        if isinstance(func, str):
+            kind = func
+            task_conf = self._registry[kind]
+            func = task_conf["func"]
+        async_task = AsyncTask(str(uuid.uuid4()), func, *args, **kwargs)
+        async_task.kind = kind
+        async_task.dedup_key = dedup_key
+        async_task.queue_name = queue_name or task_conf["queue_name"]
+        async_task.priority = task_conf["priority"] if priority is None else priority
+        async_task.profile = profile
+        if async_task.queue_name not in self.queues:
+            raise ValueError(f"任务队列不存在: {async_task.queue_name}")
+
+        self._evict_tasks()
+        with self._lock:
+            if dedup_key:
+                running_task = self.tasks.get(self._inflight.get(dedup_key))
+                if running_task and running_task.status in ACTIVE_STATUSES:
+                    logger.info(f"任务 {dedup_key} 正在执行，复用任务 {running_task.task_id}")
+                    return running_task.task_id
+                self._inflight[dedup_key] = async_task.task_id
+            self.tasks[async_task.task_id] = async_task
+
+        if dedup_key:
+            remote_task_id = self._insert_dedup(async_task)
+            if remote_task_id:
+                with self._lock:
+                    self.tasks.pop(async_task.task_id, None)
+                    if self._inflight.get(dedup_key) == async_task.task_id:
+                        self._inflight.pop(dedup_key)
+                logger.info(f"任务 {dedup_key} 正在其他实例执行，复用任务 {remote_task_id}")
+                return remote_task_id
+
+        self._start_task(async_task)
+        return async_task.task_id
+
+    def find_active_task(self, dedup_key):
+        """
+        查询去重键对应的未结束任务（当前实例或其他存活实例）
+        :return: task_id，没有未结束的任务返回 None
+        """
+        with self._lock:
+            running_task = self.tasks.get(self._inflight.get(dedup_key))
+            if running_task and running_task.status in ACTIVE_STATUSES:
+                return running_task.task_id
+        return self._find_remote_task(dedup_key)
+
+    def _live_owners(self):
+        """心跳未过期的实例（含当前实例）"""
+        since = datetime.now() - timedelta(seconds=self.heartbeat_interval * 3)
+        try:
+            return self.task_store.live_owners(since.isoformat()) | {self.instance_id}
+        except Exception as e:
+            logger.error(f"查询实例心跳失败: {e}")
+            return {self.instance_id}
+
+    def _find_remote_task(self, dedup_key):
+        """查询其他存活实例上相同去重键的未结束任务"""
+        try:
+            records = self.task_store.find_active(dedup_key)
+        except Exception as e:
+            logger.error(f"查询去重任务失败: {e}")
+            return None
+        records = [r for r in records if r.get("owner") != self.instance_id]
+        if not records:
+            return None
+        live_owners = self._live_owners()
+        for record in records:
+            if record.get("owner") in live_owners:
+                return record["task_id"]
+        return None
+
+    def _insert_dedup(self, async_task):
+        """
+        在任务存储中原子地认领去重键并写入任务记录，多个实例同时提交相同去重键的任务时只有一个写入成功
+        :return: 其他存活实例上相同去重键的未结束任务的 task_id，认领成功返回 None
+        """
+        since = datetime.now() - timedelta(seconds=self.heartbeat_interval * 3)
+        try:
+            return self.task_store.insert_dedup(async_task.to_record(owner=self.instance_id), since.isoformat())
+        except Exception as e:
+            logger.error(f"认领去重任务失败: {e}")
+            return None
+
+    def _start_task(self, async_task):
+        self._save_task(async_task)
+
+        # 提交任务到所属队列
+        self.queues[async_task.queue_name].put(async_task)
+
+    def resume_interrupted_tasks(self):
+        """
+        恢复已退出实例（如容器重启前的进程、已退出的 worker）遗留的未完成任务，心跳未过期的实例的任务不处理
+        已注册类型的任务以原 task_id 从最后完成的条目继续执行，未注册的任务标记为失败
+        多个 worker 同时恢复时通过任务存储原子认领，同一任务只会被一个实例接管
+        :return: 恢复的 task_id 列表
+        """
+        resumed = []
+        live_owners = self._live_owners()
+        for record in self.task_store.list(statuses=ACTIVE_STATUSES):
+            if record.get("owner") in live_owners:
+                continue
+
+            task_id = record["task_id"]
+            if not self.task_store.claim(task_id, record.get("owner"), self.instance_id):
+                # 已被其他实例接管
+                continue
+            task_conf = self._registry.get(record.get("kind"))
+            if task_conf is None:
+                record["status"] = "failed"
+                record["error"] = "服务重启，任务已中断且无法恢复"
+                record["end_time"] = datetime.now().isoformat()
+                record["updated_time"] = record["end_time"]
+                self.task_store.save(record)
+                logger.warning(f"任务 {task_id} 已中断，类型 {record.get('kind')} 未注册，无法恢复")
+                continue
 
-        # 提交任务给执行器
-        self.executor.submit(self._task_wrapper, async_task)
-        return task_id
+            async_task = AsyncTask(
+                task_id, task_conf["func"], *(record.get("args") or []), **(record.get("kwargs") or {})
+            )
+            async_task.kind = record.get("kind")
+            async_task.queue_name = record.get("queue_name") or task_conf["queue_name"]
+            if async_task.queue_name not in self.queues:
+                async_task.queue_name = task_conf["queue_name"]
+            async_task.priority = task_conf["priority"] if record.get("priority") is None else int(record["priority"])
+            async_task.created_time = datetime.fromisoformat(record["created_time"])
+            if record.get("start_time"):
+                async_task.start_time = datetime.fromisoformat(record["start_time"])
+            async_task.progress = record.get("progress") or 0
+            async_task.current = record.get("current")
+            async_task.total = record.get("total")
+            async_task.result = record.get("result")
+            async_task.dedup_key = record.get("dedup_key")
+            if async_task.current is not None:
+                async_task.checkpoint = {"index": async_task.current, "result": async_task.result}
+            if record.get("control") == "cancel":
+                async_task.cancel_event.set()
+            elif record.get("status") == "paused":
+                # 重启前已暂停的任务恢复后保持暂停，需手动恢复
+                async_task.resume_event.clear()
+            with self._lock:
+                self.tasks[task_id] = async_task
+                if async_task.dedup_key:
+                    self._inflight[async_task.dedup_key] = task_id
+            self._start_task(async_task)
+            resumed.append(task_id)
+            logger.info(f"任务 {task_id}（{async_task.kind}）已恢复，从第 {async_task.current or 0} 项继续")
+        return resumed
+
+    @staticmethod
+    def _format_status(task):
+        return {
+            "task_id": task["task_id"],
+            "status": task["status"],
+            "progress": task["progress"],  # 添加进度信息
+            "current": task.get("current"),
+            "total": task.get("total"),
+            "message": task.get("message"),
+            "error": task.get("error"),
+            "cancel_requested": bool(task.get("cancel_requested")) or task.get("control") == "cancel",
+            "created_time": task["created_time"],
+            "start_time": task["start_time"],
+            "end_time": task["end_time"],
+        }
+
+    def _task_status(self, task):
+        record = task.to_record()
+        record["cancel_requested"] = task.cancel_event.is_set()
+        task_status = self._format_status(record)
+
+        # 队列指标：排队位置、队列深度、等待时长
+        task_queue = self.queues.get(task.queue_name)
+        task_status["queue"] = task.queue_name
+        task_status["priority"] = task.priority
+        if task_queue and task.status == "pending":
+            pending = task_queue.pending_tasks()
+            task_status["queue_depth"] = len(pending)
+            task_status["queue_position"] = pending.index(task) + 1 if task in pending else None
+        elif task_queue:
+            task_status["queue_depth"] = task_queue.stats()["queue_depth"]
+        if task.wait_seconds is not None:
+            task_status["wait_seconds"] = round(task.wait_seconds, 3)
+        elif task.queued_time:
+            task_status["wait_seconds"] = round((datetime.now() - task.queued_time).total_seconds(), 3)
+        return task_status
+
+    def get_queue_stats(self):
+        """获取所有任务队列的指标"""
+        return [task_queue.stats() for task_queue in self.queues.values()]
 
     def get_task_status(self, task_id):
         """获取任务状态"""
@@ -87,26 +763,159 @@ class ThreadUtils:
             if task_id in self.tasks:
                 task = self.tasks[task_id]
                 # 将 datetime 对象转换为字符串
-                logger.info(f"任务进度: {task.progress}%")
-                result = {
+                logger.debug(f"任务进度: {task.progress}%")
+                return self._task_status(task)
+
+        # 内存中没有时（如服务重启前的任务）从任务存储中查询
+        record = self.task_store.get(task_id)
+        return self._format_status(record) if record else None
+
+    def get_task_result(self, task_id):
+        """获取任务结果，压缩过的结果从磁盘读取"""
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task:
+                task_result = {
                     "task_id": task.task_id,
                     "status": task.status,
-                    "progress": task.progress,  # 添加进度信息
-                    "created_time": task.created_time.isoformat() if task.created_time else None,
-                    "start_time": task.start_time.isoformat() if task.start_time else None,
-                    "end_time": task.end_time.isoformat() if task.end_time else None,
+                    "result": task.result,
+                    "error": task.error,
                 }
-                return result
-            return None
 
-    def get_task_result(self, task_id):
-        """获取任务结果"""
+        if not task:
+            record = self.task_store.get(task_id)
+            if not record:
+                return None
+            task_result = {
+                "task_id": task_id,
+                "status": record["status"],
+                "result": record["result"],
+                "error": record["error"],
+            }
+
+        task_result["result"] = self._load_result(task_result["result"])
+        return task_result
+
+    def cancel_task(self, task_id):
+        """
+        取消任务，运行中的任务在处理完当前条目后停止，并保留已完成部分的结果
+        :return: None-任务不存在，False-任务已结束，True-已请求取消
+        """
         with self._lock:
-            if task_id in self.tasks:
-                task = self.tasks[task_id]
-                return {"task_id": task.task_id, "status": task.status, "result": task.result, "error": task.error}
+            task = self.tasks.get(task_id)
+            if task is None:
+                return self._request_remote_control(task_id, "cancel")
+            if task.status not in ACTIVE_STATUSES:
+                return False
+            task.cancel_event.set()
+            task.resume_event.set()  # 唤醒暂停中的任务
+            if task.status == "pending":
+                # 排队中的任务立即结束，不再等待工作线程
+                task.status = "cancelled"
+                task.end_time = task.updated_time = datetime.now()
+                if task.dedup_key and self._inflight.get(task.dedup_key) == task_id:
+                    self._inflight.pop(task.dedup_key)
+        self._save_task(task)
+        if task.status == "cancelled":
+            self._publish_progress(task, event="done")
+        logger.info(f"任务 {task_id} 已请求取消")
+        return True
+
+    def pause_task(self, task_id):
+        """
+        暂停任务，运行中的任务在处理完当前条目后暂停
+        :return: None-任务不存在，False-任务已结束，True-已请求暂停
+        """
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return self._request_remote_control(task_id, "pause")
+            if task.status not in ACTIVE_STATUSES or task.cancel_event.is_set():
+                return False
+            task.resume_event.clear()
+        logger.info(f"任务 {task_id} 已请求暂停")
+        return True
+
+    def resume_task(self, task_id):
+        """
+        恢复已暂停的任务
+        :return: None-任务不存在，False-任务已结束，True-已恢复
+        """
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return self._request_remote_control(task_id, "resume")
+            if task.status not in ACTIVE_STATUSES:
+                return False
+            task.resume_event.set()
+        return True
+
+    def _request_remote_control(self, task_id, control):
+        """
+        任务不在当前实例（由其他 worker 执行）时，将控制请求写入任务存储，由任务所在实例在条目之间执行
+        :return: None-任务不存在，False-任务已结束，True-已写入控制请求
+        """
+        record = self.task_store.get(task_id)
+        if record is None:
             return None
+        if record["status"] not in ACTIVE_STATUSES:
+            return False
+        self.task_store.set_control(task_id, control)
+        logger.info(f"任务 {task_id} 由其他实例执行，已写入控制请求: {control}")
+        return True
 
-    def shutdown(self, wait=True):
-        """关闭线程池"""
-        self.executor.shutdown(wait=wait)
+    def is_local_task(self, task_id):
+        """任务是否由当前实例执行（事件推送只对当前实例的任务有效）"""
+        with self._lock:
+            return task_id in self.tasks
+
+    def _heartbeat(self):
+        try:
+            self.task_store.heartbeat(self.instance_id, datetime.now().isoformat())
+        except Exception as e:
+            logger.error(f"实例心跳写入失败: {e}")
+
+    def _heartbeat_loop(self):
+        while not self._stopping.wait(self.heartbeat_interval):
+            self._heartbeat()
+            try:
+                # 接管已退出实例遗留的任务
+                self.resume_interrupted_tasks()
+            except Exception as e:
+                logger.error(f"恢复中断任务失败: {e}")
+
+    def start_heartbeat(self, interval=None):
+        """
+        启动实例心跳（多 worker 部署时在每个 worker 中调用，重复调用无副作用）
+        心跳线程定期接管已退出实例的未完成任务
+        :param interval: 心跳间隔（秒）
+        :return: 本次启动时恢复的 task_id 列表
+        """
+        with self._lock:
+            if self._heartbeat_thread is not None:
+                return []
+            if interval:
+                self.heartbeat_interval = interval
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="task-heartbeat", daemon=True)
+        self._heartbeat()
+        resumed = self.resume_interrupted_tasks()
+        self._heartbeat_thread.start()
+        return resumed
+
+    def shutdown(self, wait=True, interrupt=False):
+        """
+        关闭所有任务队列
+        :param wait: 是否等待工作线程退出
+        :param interrupt: 是否中断未完成的任务；中断的任务在当前条目结束后停止并保留断点，
+                          由其他 worker 或重启后的实例继续执行，否则等待排队中的任务全部执行完
+        """
+        if interrupt:
+            self._stopping.set()
+        for task_queue in self.queues.values():
+            task_queue.shutdown(wait=wait)
+        self._stopping.set()
+        try:
+            # 移除心跳，其他实例可立即接管中断的任务
+            self.task_store.remove_owner(self.instance_id)
+        except Exception as e:
+            logger.error(f"移除实例心跳失败: {e}")
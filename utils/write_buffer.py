@@ -0,0 +1,131 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/19 21:40
+# @Author : Xumh
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from utils.coalescing_queue import CoalescingQueue
+from utils.log_utils import logger
+
+# 合并窗口（秒）：同一工作项在窗口内的多次更新合并为一次请求
+WRITE_BEHIND_WINDOW = 2
+# 同时发出的更新请求数上限
+WRITE_BEHIND_WORKERS = 4
+# 单次 flush 的最大工作项数量
+WRITE_BEHIND_BATCH = 100
+
+
+def merge_update_fields(old_fields, new_fields):
+    """
+    按 field_key 合并 update_fields，同一字段以后提交的值为准，字段顺序保持首次出现的顺序
+    :return: 合并后的 update_fields
+    """
+    merged = {field["field_key"]: field for field in old_fields}
+    for field in new_fields:
+        merged[field["field_key"]] = field
+    return list(merged.values())
+
+
+class WorkItemWriteBuffer:
+    """
+    飞书工作项更新的写缓冲（write-behind）：
+    - 按 (work_item_type_key, work_item_id) 合并窗口内的多次 update_work_item，update_fields 按 field_key 合并
+    - 窗口结束后以有限并发批量发出请求，每次提交返回 Future，合并后的请求结果会返回给所有提交方
+    """
+
+    def __init__(self, window=WRITE_BEHIND_WINDOW, max_workers=WRITE_BEHIND_WORKERS, max_batch=WRITE_BEHIND_BATCH):
+        """
+        :param window: 合并窗口（秒）
+        :param max_workers: 并发请求数上限
+        :param max_batch: 单次 flush 的最大工作项数量
+        """
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="feishu-write")
+        self._queue = CoalescingQueue(
+            self._flush, window=window, max_batch=max_batch, merge_func=self._merge, name="feishu-write-buffer"
+        )
+        self.request_count = 0  # 实际发出的更新请求数
+
+    @staticmethod
+    def _merge(old, new):
+        return {
+            "client": new["client"],
+            "update_fields": merge_update_fields(old["update_fields"], new["update_fields"]),
+            "futures": old["futures"] + new["futures"],
+            "context": new["context"],
+        }
+
+    def update(self, client, work_item_type_key, work_item_id, request_data):
+        """
+        提交工作项更新
+        :param client: FeiShuProjectUtils 实例，flush 时使用最后一次提交的 client 发出请求
+        :param request_data: {"update_fields": [{"field_key": ..., "field_value": ...}]}
+        :return: Future，结果为 update_work_item 的返回值
+        """
+        future = Future()
+        value = {
+            "client": client,
+            "update_fields": list(request_data.get("update_fields", [])),
+            "futures": [future],
+            # 在提交方的上下文中发出请求，请求统计计入提交的任务（合并的更新计入最后一次提交的任务）
+            "context": contextvars.copy_context(),
+        }
+        if not self._queue.put((work_item_type_key, work_item_id), value):
+            logger.debug(f"工作项 {work_item_id} 的更新已与排队中的更新合并")
+        return future
+
+    def _send(self, key, value):
+        work_item_type_key, work_item_id = key
+        try:
+            res = value["context"].run(
+                value["client"].update_work_item,
+                work_item_type_key,
+                work_item_id,
+                {"update_fields": value["update_fields"]},
+            )
+        except Exception as e:
+            for future in value["futures"]:
+                future.set_exception(e)
+            return
+        for future in value["futures"]:
+            future.set_result(res)
+
+    def _flush(self, batch):
+        self.request_count += len(batch)
+        # 等待本批请求全部结束后再处理下一批，避免请求堆积
+        list(self._executor.map(lambda item: self._send(*item), batch.items()))
+
+    def flush(self):
+        """立即发出所有排队中的更新"""
+        self._queue.flush()
+
+    def stats(self):
+        return dict(self._queue.stats(), request_count=self.request_count, max_workers=self.max_workers)
+
+    def stop(self):
+        """发出剩余的更新并停止"""
+        self._queue.stop(flush=True)
+        self._executor.shutdown(wait=True)
+
+
+_write_buffer = None
+_write_buffer_lock = threading.Lock()
+
+
+def get_write_buffer():
+    """进程内共享的写缓冲，多个同步任务对同一工作项的更新可以互相合并"""
+    global _write_buffer
+    with _write_buffer_lock:
+        if _write_buffer is None:
+            _write_buffer = WorkItemWriteBuffer()
+        return _write_buffer
+
+
+def stop_write_buffer():
+    """进程退出前发出剩余的更新"""
+    global _write_buffer
+    with _write_buffer_lock:
+        if _write_buffer is not None:
+            _write_buffer.stop()
+            _write_buffer = None
@@ -0,0 +1,7 @@
+# --*-- coding:utf-8 --*--
+# @Time : 2026/10/19 14:20
+# @Author : Xumh
+# WSGI 入口：gunicorn -c gunicorn.conf.py wsgi:app
+from flask_app.sync_bugs_app import app, scheduler, start_background_services, stop_background_services, thread_utils
+
+__all__ = ["app", "scheduler", "start_background_services", "stop_background_services", "thread_utils"]